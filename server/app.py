@@ -1,14 +1,31 @@
-from flask import Flask
+from flask import Flask, Request, Response, send_file, abort
 from flask_cors import CORS
 from flask_jwt_extended import JWTManager
 from database import initialize_db
 from services.cloudinary_service import cloudinary
+from services.metrics import registry as metrics_registry
+from services.hash_filter import issued_hashes
+from services.storage import get_storage, LocalStorage
 import config
 import dotenv
 import os
 dotenv.load_dotenv()
 
+# Endpoints whose request body is a whole bundle of documents
+BUNDLE_ENDPOINTS = {"issuer.issuer_bulk_upload", "verifier.verifier_batch_upload"}
+
+class DocValidatorRequest(Request):
+    """Request with a larger body limit on the bundle endpoints"""
+
+    @property
+    def max_content_length(self):
+        # url_rule is matched before the body is parsed
+        if self.url_rule is not None and self.url_rule.endpoint in BUNDLE_ENDPOINTS:
+            return config.BUNDLE_MAX_CONTENT_LENGTH
+        return super().max_content_length
+
 app = Flask(__name__)
+app.request_class = DocValidatorRequest
 app.config["MONGO_URI"] = config.MONGO_URI
 app.config["CLOUDINARY_CLOUD_NAME"] = config.CLOUDINARY_CLOUD_NAME
 app.config["CLOUDINARY_API_KEY"] = config.CLOUDINARY_API_KEY
@@ -20,16 +37,52 @@ app.config['JWT_SECRET_KEY'] = 'your-secret-string'  # Change this in production
 jwt = JWTManager(app)
 
 # File upload configuration
-app.config['MAX_CONTENT_LENGTH'] = 16 * 1024 * 1024  # 16MB max file size
+app.config['MAX_CONTENT_LENGTH'] = config.MAX_CONTENT_LENGTH  # 16MB by default (MAX_UPLOAD_MB)
+# Bulk issuance and batch verification: BUNDLE_MAX_UPLOAD_MB (see DocValidatorRequest)
 
-# Initialize Cloudinary configuration
-print("📸 Cloudinary configured for document storage")
+# Initialize document storage (Cloudinary, or local disk with STORAGE_BACKEND=local)
+storage = get_storage()
 
 CORS(app, origins="*", methods=["GET", "POST", "PUT", "DELETE", "OPTIONS"], 
      allow_headers=["Content-Type", "Authorization"])
 # Initialize database
 initialize_db(app)
 
+# Stats counters of deployments that predate them are built once from the documents
+from database import mongo
+from models.stats_model import ensure_stats
+try:
+    ensure_stats(mongo)
+except Exception as e:
+    print(f"⚠️ Could not build stats counters (run flask db rebuild-stats): {e}")
+
+# Near-duplicate index over the page fingerprints of issued documents
+if config.PHASH_ENABLED:
+    from services.perceptual_hash import perceptual_index
+    try:
+        perceptual_index.rebuild(mongo)
+    except Exception as e:
+        print(f"⚠️ Could not build perceptual index: {e}")
+
+# Bloom filter of issued hashes: definite misses skip the documents.hash query
+if config.HASH_FILTER_ENABLED:
+    try:
+        issued_hashes.build(mongo)
+    except Exception as e:
+        print(f"⚠️ Could not build issued-hash filter (lookups go to the database): {e}")
+
+# LSH index over the OCR text signatures of issued documents
+if config.MINHASH_ENABLED:
+    from services.text_similarity import text_index
+    try:
+        text_index.rebuild(mongo)
+    except Exception as e:
+        print(f"⚠️ Could not build text index: {e}")
+
+# Maintenance CLI (flask --app app db ensure-indexes / check-indexes)
+from cli import register_cli
+register_cli(app)
+
 # Health check routes
 @app.route('/')
 def home(): 
@@ -39,16 +92,35 @@ def home():
 def health_check():
     return {
         "status": "healthy",
-        "storage": "Cloudinary",
+        "storage": storage.name,
+        "storage_circuit": storage.breaker.state if hasattr(storage, "breaker") else None,
         "max_file_size": f"{app.config['MAX_CONTENT_LENGTH'] / (1024*1024)}MB",
+        "issued_hash_filter": issued_hashes.stats(),
         "endpoints": {
             "issuer_upload": "/api/issuer/upload",
             "verifier_upload": "/api/verifier/upload"
         }
     }
 
-# File serving is now handled by Cloudinary URLs
-# No need for local file serving endpoint
+@app.route('/metrics')
+def metrics():
+    # Prometheus scrape endpoint: stage latency histograms, pipeline runs,
+    # OCR pages, hashed bytes and OCR cache counters (per process)
+    return Response(metrics_registry.render(), mimetype="text/plain; version=0.0.4; charset=utf-8")
+
+# File serving is handled by Cloudinary URLs; with the local storage backend
+# the stored documents are served from here
+@app.route('/storage/<path:public_id>')
+def serve_stored_document(public_id):
+    if not isinstance(storage, LocalStorage):
+        abort(404)
+    try:
+        path = storage.ref_path(public_id)
+    except Exception:
+        abort(404)
+    if not os.path.isfile(path):
+        abort(404)
+    return send_file(path)
 
 #Import and register routes
 from routes.document_routes import doc_bp
@@ -0,0 +1,126 @@
+import json
+import click
+from flask.cli import AppGroup
+from database import mongo, ensure_indexes, check_indexes
+from models.ocr_text_model import migrate_inline_ocr_text, load_ocr_text
+from models.issuer_model import strip_document_arrays as strip_issuer_documents
+from models.verifier_model import strip_document_arrays as strip_verifier_documents
+from models.stats_model import rebuild_stats
+from models.issuer_model import get_issuer
+from services.issuance import load_manifest, BulkIssuance, sign_issued_text
+from services.bundle import iter_path_files
+from services.document_context import DocumentContext
+from services.perceptual_hash import page_fingerprints
+
+# Maintenance commands, run with: flask --app app db <command>
+db_cli = AppGroup("db", help="Database maintenance commands")
+
+@db_cli.command("ensure-indexes")
+def ensure_indexes_command():
+    """Create all registered indexes (idempotent)"""
+    report = ensure_indexes(mongo.db)
+    if report["failed"]:
+        raise click.ClickException(f"Failed indexes: {', '.join(report['failed'])}")
+
+@db_cli.command("check-indexes")
+def check_indexes_command():
+    """Report missing, unregistered and unused indexes"""
+    report = check_indexes(mongo.db)
+    click.echo(json.dumps(report, indent=2))
+
+@db_cli.command("migrate-ocr-text")
+@click.option("--batch-size", default=500, show_default=True)
+def migrate_ocr_text_command(batch_size):
+    """Move inline ocr_data.extracted_text into compressed side storage"""
+    migrate_inline_ocr_text(mongo, batch_size=batch_size)
+
+@db_cli.command("strip-document-arrays")
+def strip_document_arrays_command():
+    """Drop the legacy documents arrays from issuer and verifier records"""
+    issuers = strip_issuer_documents(mongo)
+    verifiers = strip_verifier_documents(mongo)
+    click.echo(f"Stripped documents arrays from {issuers} issuers and {verifiers} verifiers")
+
+@db_cli.command("rebuild-stats")
+def rebuild_stats_command():
+    """Recompute the issuer/verifier/global stats counters from scratch"""
+    count = rebuild_stats(mongo)
+    click.echo(f"Rebuilt {count} stats documents")
+
+@db_cli.command("backfill-phash")
+@click.option("--limit", default=0, help="Stop after this many documents (0 = all)")
+def backfill_phash_command(limit):
+    """Compute page fingerprints for issued documents that have none"""
+    query = {"metaData.upload_method": "issuer_upload", "perceptual_hashes.0": {"$exists": False}}
+    cursor = mongo.db.documents.find(query, {"source": 1}).limit(limit)
+    done = failed = 0
+    for doc in cursor:
+        try:
+            with DocumentContext.from_url(doc["source"]) as ctx:
+                fingerprints = page_fingerprints(ctx)
+            mongo.db.documents.update_one({"_id": doc["_id"]}, {"$set": {"perceptual_hashes": fingerprints}})
+            done += 1
+        except Exception as e:
+            print(f"⚠️ Could not fingerprint {doc['_id']}: {e}")
+            failed += 1
+    click.echo(f"Fingerprinted {done} documents ({failed} failed); restart the app to reload the index")
+
+@db_cli.command("backfill-minhash")
+@click.option("--all", "recompute", is_flag=True, help="Recompute every signature (after changing MINHASH_PERMUTATIONS)")
+def backfill_minhash_command(recompute):
+    """Compute OCR text signatures for issued documents (from the stored text)"""
+    query = {"metaData.upload_method": "issuer_upload"}
+    if not recompute:
+        query["text_minhash"] = {"$not": {"$type": "binData"}}
+    done = failed = 0
+    for doc in mongo.db.documents.find(query, {"ocr_data": 1, "source": 1}):
+        ocr_data = doc.get("ocr_data") or {}
+        # Profile records from before text_scope hold only their field text
+        ocr_result = {
+            "text": load_ocr_text(mongo, ocr_data),
+            "text_scope": ocr_data.get("text_scope", "regions" if ocr_data.get("fields") else "full")
+        }
+        try:
+            if ocr_result["text_scope"] == "regions":
+                # Only the field regions were read: OCR the stored file in full
+                with DocumentContext.from_url(doc["source"]) as ctx:
+                    signature = sign_issued_text(ctx, ocr_result, "backfill_minhash")
+            else:
+                signature = sign_issued_text(None, ocr_result, "backfill_minhash")
+            mongo.db.documents.update_one({"_id": doc["_id"]}, {"$set": {"text_minhash": signature}})
+            done += 1
+        except Exception as e:
+            print(f"⚠️ Could not sign {doc['_id']}: {e}")
+            failed += 1
+    click.echo(f"Signed {done} documents ({failed} failed); restart the app to reload the index")
+
+# Issuer operations, run with: flask --app app issuer <command>
+issuer_cli = AppGroup("issuer", help="Issuer bulk operations")
+
+@issuer_cli.command("bulk-issue")
+@click.argument("source", type=click.Path(exists=True))
+@click.option("--issuer-id", required=True, help="Issuer account the documents are issued by")
+@click.option("--manifest", "manifest_path", required=True, type=click.Path(exists=True, dir_okay=False),
+              help="CSV with a filename column (plus document_type and metadata columns)")
+@click.option("--report", "report_path", type=click.Path(dir_okay=False), help="Write the per-file report as JSON")
+def bulk_issue_command(source, issuer_id, manifest_path, report_path):
+    """Issue every document of a directory or zip SOURCE (safe to re-run)"""
+    issuer = get_issuer(mongo, issuer_id)
+    if not issuer:
+        raise click.ClickException(f"Issuer {issuer_id} not found")
+    with open(manifest_path, "rb") as manifest_file:
+        try:
+            manifest = load_manifest(manifest_file)
+        except ValueError as e:
+            raise click.ClickException(str(e))
+    
+    report = BulkIssuance(issuer_id, issuer, manifest).run(iter_path_files(source))
+    click.echo(json.dumps(report["summary"], indent=2))
+    if report_path:
+        with open(report_path, "w") as report_file:
+            json.dump(report, report_file, indent=2, default=str)
+
+def register_cli(app):
+    """Attach the maintenance commands to the Flask app"""
+    app.cli.add_command(db_cli)
+    app.cli.add_command(issuer_cli)
@@ -11,6 +11,152 @@ CLOUDINARY_CLOUD_NAME = os.environ.get('CLOUDINARY_CLOUD_NAME')
 CLOUDINARY_API_KEY = os.environ.get('CLOUDINARY_API_KEY')
 CLOUDINARY_API_SECRET = os.environ.get('CLOUDINARY_API_SECRET')
 
+# OCR settings
+# OCR backend: "pytesseract" (spawns the tesseract binary per call) or
+# "tesserocr" (keeps libtesseract and its language models loaded in-process)
+OCR_ENGINE = os.environ.get('OCR_ENGINE', 'pytesseract')
+# Path to the tesseract binary if it is not in PATH (Windows default install location)
+TESSERACT_CMD = os.environ.get(
+    'TESSERACT_CMD',
+    r'C:\Program Files\Tesseract-OCR\tesseract.exe' if os.name == 'nt' else ''
+)
+TESSDATA_PATH = os.environ.get('TESSDATA_PATH')  # tessdata directory for the tesserocr engine
+# Parallel mode OCRs the pages of a multi-page PDF in a bounded process pool
+OCR_PARALLEL = os.environ.get('OCR_PARALLEL', 'true').lower() == 'true'
+OCR_WORKERS = int(os.environ.get('OCR_WORKERS', os.cpu_count() or 1))
+OCR_PARALLEL_MIN_PAGES = int(os.environ.get('OCR_PARALLEL_MIN_PAGES', 2))
+OCR_LANG = os.environ.get('OCR_LANG', 'eng')
+OCR_DPI = int(os.environ.get('OCR_DPI', 300))
+OCR_IMAGE_PSM = int(os.environ.get('OCR_IMAGE_PSM', 6))
+# Adaptive DPI: scanned pages start at the lowest tier and are re-rendered at the
+# next tier only while Tesseract's mean word confidence is below OCR_MIN_CONFIDENCE
+OCR_ADAPTIVE_DPI = os.environ.get('OCR_ADAPTIVE_DPI', 'true').lower() == 'true'
+OCR_DPI_TIERS = [int(dpi) for dpi in os.environ.get('OCR_DPI_TIERS', '200,300,400').split(',') if dpi.strip()]
+OCR_MIN_CONFIDENCE = float(os.environ.get('OCR_MIN_CONFIDENCE', 75))
+# Pages whose embedded text layer has at least this many characters skip OCR
+OCR_USE_TEXT_LAYER = os.environ.get('OCR_USE_TEXT_LAYER', 'true').lower() == 'true'
+OCR_TEXT_LAYER_MIN_CHARS = int(os.environ.get('OCR_TEXT_LAYER_MIN_CHARS', 25))
+# OCR result cache: in-process LRU plus an optional on-disk store
+OCR_CACHE_ENABLED = os.environ.get('OCR_CACHE_ENABLED', 'true').lower() == 'true'
+OCR_CACHE_MAX_ENTRIES = int(os.environ.get('OCR_CACHE_MAX_ENTRIES', 256))
+OCR_CACHE_DIR = os.environ.get('OCR_CACHE_DIR', 'ocr_cache')
+
+# Upload ingest: uploads are streamed in chunks and spooled in memory up to
+# INGEST_SPOOL_MAX_BYTES, then to a temp file on disk
+INGEST_CHUNK_SIZE = int(os.environ.get('INGEST_CHUNK_SIZE', 1024 * 1024))
+INGEST_SPOOL_MAX_BYTES = int(os.environ.get('INGEST_SPOOL_MAX_BYTES', 4 * 1024 * 1024))
+
+# Verifier uploads whose hash matches an issued document reuse its OCR data
+# instead of running OCR again (can be overridden per request with short_circuit=false)
+VERIFIER_SHORT_CIRCUIT = os.environ.get('VERIFIER_SHORT_CIRCUIT', 'true').lower() == 'true'
+
+# HMAC keys: documents are hashed with their institute's secret_key; this default
+# key is used for issuers without a registered key and is always checked on verify
+DEFAULT_INSTITUTE_SECRET = os.environ.get('DEFAULT_INSTITUTE_SECRET', 'supersecretkey')
+INSTITUTE_KEYS_TTL = int(os.environ.get('INSTITUTE_KEYS_TTL', 300))  # seconds between key reloads
+
+# Create the registered MongoDB indexes when the app starts (idempotent)
+ENSURE_INDEXES_ON_STARTUP = os.environ.get('ENSURE_INDEXES_ON_STARTUP', 'true').lower() == 'true'
+
+# Document listing pagination
+LIST_PAGE_SIZE_DEFAULT = int(os.environ.get('LIST_PAGE_SIZE_DEFAULT', 50))
+LIST_PAGE_SIZE_MAX = int(os.environ.get('LIST_PAGE_SIZE_MAX', 200))
+
+# Full OCR text is stored compressed in the ocr_texts collection ("zlib", or "zstd"
+# if the zstandard package is installed); documents keep only a preview
+OCR_TEXT_CODEC = os.environ.get('OCR_TEXT_CODEC', 'zlib')
+OCR_PREVIEW_CHARS = int(os.environ.get('OCR_PREVIEW_CHARS', 200))
+
+# Asynchronous verification: uploads with async=true return 202 and a job id;
+# jobs run on an in-process pool with at most VERIFY_JOB_MAX_PENDING queued
+VERIFY_ASYNC_DEFAULT = os.environ.get('VERIFY_ASYNC_DEFAULT', 'false').lower() == 'true'
+VERIFY_JOB_WORKERS = int(os.environ.get('VERIFY_JOB_WORKERS', 2))
+VERIFY_JOB_MAX_PENDING = int(os.environ.get('VERIFY_JOB_MAX_PENDING', 64))
+# Finished job records are removed by a TTL index after this many seconds
+JOB_TTL_SECONDS = int(os.environ.get('JOB_TTL_SECONDS', 7 * 24 * 3600))
+
+# Largest accepted request body of single-document uploads
+MAX_CONTENT_LENGTH = int(os.environ.get('MAX_UPLOAD_MB', 16)) * 1024 * 1024
+# Bundle endpoints (bulk issuance, batch verification) carry many documents
+# in one body and get their own limit
+BUNDLE_MAX_CONTENT_LENGTH = int(os.environ.get('BUNDLE_MAX_UPLOAD_MB', 1024)) * 1024 * 1024
+
+# Batch verification: documents of a zip/multipart batch are verified on a
+# shared pool of BATCH_WORKERS threads; larger batches are cut at BATCH_MAX_FILES
+BATCH_WORKERS = int(os.environ.get('BATCH_WORKERS', 4))
+BATCH_MAX_FILES = int(os.environ.get('BATCH_MAX_FILES', 500))
+
+# Bulk issuance: files are hashed/OCR'd on BULK_ISSUE_WORKERS threads, at most
+# BULK_UPLOAD_CONCURRENCY storage uploads run at once and records are inserted
+# BULK_INSERT_BATCH_SIZE at a time
+BULK_ISSUE_WORKERS = int(os.environ.get('BULK_ISSUE_WORKERS', 4))
+BULK_UPLOAD_CONCURRENCY = int(os.environ.get('BULK_UPLOAD_CONCURRENCY', 4))
+BULK_INSERT_BATCH_SIZE = int(os.environ.get('BULK_INSERT_BATCH_SIZE', 50))
+BULK_ISSUE_MAX_FILES = int(os.environ.get('BULK_ISSUE_MAX_FILES', 2000))
+
+# Include the per-stage timing breakdown in upload responses by default
+# (otherwise only when the request has debug=true)
+STAGE_TIMINGS_IN_RESPONSE = os.environ.get('STAGE_TIMINGS_IN_RESPONSE', 'false').lower() == 'true'
+
+# Perceptual near-duplicate matching: issued documents store a pHash/dHash per
+# page (first PHASH_MAX_PAGES pages); verifier uploads without a hash match are
+# compared against them and pages within PHASH_MAX_DISTANCE bits (of 64) match.
+# Whole-page hashes of one template's certificates differ by only a few bits,
+# so a match names a document only when it stands out from the other hits
+PHASH_ENABLED = os.environ.get('PHASH_ENABLED', 'true').lower() == 'true'
+PHASH_MAX_DISTANCE = int(os.environ.get('PHASH_MAX_DISTANCE', 4))
+PHASH_MAX_PAGES = int(os.environ.get('PHASH_MAX_PAGES', 3))
+PHASH_DPI = int(os.environ.get('PHASH_DPI', 72))
+
+# Fuzzy text matching: issued documents store a MinHash signature of their OCR
+# text (MINHASH_SHINGLE_WORDS-word shingles), indexed with MINHASH_BANDS LSH
+# bands; verifier uploads without a hash match are diffed against the most
+# similar issued text
+MINHASH_ENABLED = os.environ.get('MINHASH_ENABLED', 'true').lower() == 'true'
+MINHASH_PERMUTATIONS = int(os.environ.get('MINHASH_PERMUTATIONS', 128))
+MINHASH_BANDS = int(os.environ.get('MINHASH_BANDS', 32))
+MINHASH_SHINGLE_WORDS = int(os.environ.get('MINHASH_SHINGLE_WORDS', 3))
+MINHASH_MIN_SIMILARITY = float(os.environ.get('MINHASH_MIN_SIMILARITY', 0.4))
+# Diff against the matched issued document: field values and changed lines
+# that read at least this alike are put down to OCR noise, not alteration
+TEXT_FIELD_MIN_SIMILARITY = float(os.environ.get('TEXT_FIELD_MIN_SIMILARITY', 0.85))
+TEXT_LINE_MIN_SIMILARITY = float(os.environ.get('TEXT_LINE_MIN_SIMILARITY', 0.8))
+
+# The perceptual and text indexes pick up documents issued by other processes
+# at most every INDEX_REFRESH_SECONDS
+INDEX_REFRESH_SECONDS = float(os.environ.get('INDEX_REFRESH_SECONDS', 5))
+
+# In-process Bloom filter of issued hashes: verifier uploads that were never
+# issued skip the documents.hash query. Sized for HASH_FILTER_CAPACITY hashes
+# (or twice the issued count) at HASH_FILTER_FP_RATE; hashes issued by other
+# processes are picked up every HASH_FILTER_REFRESH_SECONDS
+HASH_FILTER_ENABLED = os.environ.get('HASH_FILTER_ENABLED', 'true').lower() == 'true'
+HASH_FILTER_FP_RATE = float(os.environ.get('HASH_FILTER_FP_RATE', 0.001))
+HASH_FILTER_CAPACITY = int(os.environ.get('HASH_FILTER_CAPACITY', 1000000))
+HASH_FILTER_REFRESH_SECONDS = float(os.environ.get('HASH_FILTER_REFRESH_SECONDS', 5))
+
+# Storage uploads run on a background pool, overlapping hashing and OCR
+STORAGE_UPLOAD_WORKERS = int(os.environ.get('STORAGE_UPLOAD_WORKERS', 8))
+
+# Document storage backend: "cloudinary", or "local" for a content-addressed
+# directory served by this app under /storage (offline runs, benchmarks)
+STORAGE_BACKEND = os.environ.get('STORAGE_BACKEND', 'cloudinary').lower()
+LOCAL_STORAGE_ROOT = os.environ.get('LOCAL_STORAGE_ROOT', 'storage')
+LOCAL_STORAGE_BASE_URL = os.environ.get('LOCAL_STORAGE_BASE_URL', f"http://localhost:{os.environ.get('PORT', 5000)}/storage")
+
+# Storage calls: files above STORAGE_CHUNKED_UPLOAD_MB are uploaded in
+# STORAGE_CHUNK_SIZE chunks; failed calls are retried with exponential backoff
+# and STORAGE_BREAKER_FAILURES consecutive failures open a circuit breaker
+# that fails uploads fast for STORAGE_BREAKER_RESET_SECONDS
+STORAGE_CHUNKED_UPLOAD_MB = float(os.environ.get('STORAGE_CHUNKED_UPLOAD_MB', 20))
+STORAGE_CHUNK_SIZE = int(float(os.environ.get('STORAGE_CHUNK_SIZE_MB', 6)) * 1024 * 1024)
+STORAGE_TIMEOUT_SECONDS = float(os.environ.get('STORAGE_TIMEOUT_SECONDS', 60))
+STORAGE_RETRY_ATTEMPTS = int(os.environ.get('STORAGE_RETRY_ATTEMPTS', 3))
+STORAGE_RETRY_BASE_SECONDS = float(os.environ.get('STORAGE_RETRY_BASE_SECONDS', 0.5))
+STORAGE_RETRY_MAX_SECONDS = float(os.environ.get('STORAGE_RETRY_MAX_SECONDS', 8))
+STORAGE_BREAKER_FAILURES = int(os.environ.get('STORAGE_BREAKER_FAILURES', 5))
+STORAGE_BREAKER_RESET_SECONDS = float(os.environ.get('STORAGE_BREAKER_RESET_SECONDS', 30))
+
 # Server port
 PORT = int(os.environ.get('PORT', 5000))  # Default to 5000 if not set
 
@@ -18,4 +164,5 @@ PORT = int(os.environ.get('PORT', 5000))  # Default to 5000 if not set
 print(f"🔧 Config loaded:")
 print(f"   MONGO_URI: {'✅ Set' if MONGO_URI else '❌ Missing'}")
 print(f"   CLOUDINARY: {'✅ Set' if CLOUDINARY_CLOUD_NAME else '❌ Missing'}")
+print(f"   OCR: {OCR_ENGINE}, {'parallel' if OCR_PARALLEL else 'sequential'} ({OCR_WORKERS} workers)")
 print(f"   PORT: {PORT}") 
\ No newline at end of file
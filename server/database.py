@@ -1,7 +1,112 @@
 from flask_pymongo import PyMongo
+from pymongo import ASCENDING, DESCENDING
+from pymongo.errors import OperationFailure
+import config
 
 mongo = PyMongo()
 
+# Declarative index registry: collection -> list of index specs.
+# Every spec needs "keys" and "name"; other entries are passed to create_index.
+INDEXES = {
+    "documents": [
+        # Verifier hash lookups (also $in lookups across institute keys)
+        {"keys": [("hash", ASCENDING)], "name": "hash_1"},
+        # One issued record per hash; verifier re-uploads of the same file may repeat it
+        {
+            "keys": [("hash", ASCENDING), ("metaData.upload_method", ASCENDING)],
+            "name": "issued_hash_unique",
+            "unique": True,
+            "partialFilterExpression": {
+                "metaData.upload_method": "issuer_upload",
+                "hash": {"$type": "string"}
+            }
+        },
+        # Issuer / verifier listing routes (newest first)
+        {"keys": [("issuer_id", ASCENDING), ("_id", DESCENDING)], "name": "issuer_id_1__id_-1"},
+        {"keys": [("verified_by", ASCENDING), ("_id", DESCENDING)], "name": "verified_by_1__id_-1"},
+        # Status breakdowns per verifier and globally
+        {"keys": [("verified_by", ASCENDING), ("status", ASCENDING)], "name": "verified_by_1_status_1"},
+        {"keys": [("status", ASCENDING)], "name": "status_1"},
+    ],
+    "issuers": [
+        {"keys": [("email", ASCENDING)], "name": "email_1", "unique": True},
+    ],
+    "verifiers": [
+        {"keys": [("email", ASCENDING)], "name": "email_1", "unique": True},
+    ],
+    "institutes": [
+        {"keys": [("name", ASCENDING)], "name": "name_1", "unique": True},
+    ],
+    "jobs": [
+        # Expire old job records (created_at + JOB_TTL_SECONDS)
+        {"keys": [("created_at", ASCENDING)], "name": "created_at_ttl",
+         "expireAfterSeconds": config.JOB_TTL_SECONDS},
+    ],
+    "ocr_profiles": [
+        {"keys": [("institute", ASCENDING), ("document_type", ASCENDING)],
+         "name": "institute_1_document_type_1", "unique": True},
+        {"keys": [("institute_id", ASCENDING)], "name": "institute_id_1"},
+    ],
+}
+
+def ensure_indexes(db, registry=INDEXES):
+    """
+    Create every index in the registry (safe to run repeatedly)
+
+    Args:
+        db: pymongo Database
+        registry: Collection -> index specs mapping
+
+    Returns:
+        dict: {"created": [...], "failed": [...]} as "collection.index" names
+    """
+    report = {"created": [], "failed": []}
+    for collection, specs in registry.items():
+        for spec in specs:
+            options = {k: v for k, v in spec.items() if k != "keys"}
+            label = f"{collection}.{spec['name']}"
+            try:
+                db[collection].create_index(spec["keys"], **options)
+                report["created"].append(label)
+            except OperationFailure as e:
+                # e.g. duplicate values blocking a unique index, or a same-named
+                # index with different options that needs a manual migration
+                print(f"⚠️ Could not create index {label}: {e}")
+                report["failed"].append(label)
+    print(f"🗂️ Indexes ensured: {len(report['created'])} ok, {len(report['failed'])} failed")
+    return report
+
+def check_indexes(db, registry=INDEXES):
+    """
+    Compare the live indexes with the registry and report usage
+
+    Returns:
+        dict: Per collection, "missing" registry indexes, "unregistered" live
+              indexes and "unused" indexes with zero accesses since the last
+              server restart (from $indexStats)
+    """
+    report = {}
+    collections = set(registry) | set(db.list_collection_names())
+    for collection in sorted(collections):
+        expected = {spec["name"] for spec in registry.get(collection, [])}
+        live = set(db[collection].index_information()) - {"_id_"}
+
+        unused = []
+        try:
+            for stats in db[collection].aggregate([{"$indexStats": {}}]):
+                if stats["name"] != "_id_" and stats.get("accesses", {}).get("ops", 0) == 0:
+                    unused.append(stats["name"])
+        except OperationFailure as e:
+            print(f"⚠️ $indexStats unavailable for {collection}: {e}")
+
+        if expected or live:
+            report[collection] = {
+                "missing": sorted(expected - live),
+                "unregistered": sorted(live - expected),
+                "unused": sorted(unused)
+            }
+    return report
+
 def initialize_db(app):
     try:
         print(f"Connecting to MongoDB ")
@@ -14,6 +119,9 @@ def initialize_db(app):
             print("✅ Database initialized and connected successfully!")
             print(f"Database name: {mongo.db.name}")
             
+            if config.ENSURE_INDEXES_ON_STARTUP:
+                ensure_indexes(mongo.db)
+            
     except Exception as e:
         print(f"❌ Error initializing database: {e}")
         print("Make sure MongoDB is running and the connection string is correct.")
@@ -1,5 +1,27 @@
 from datetime import datetime
 from bson import ObjectId
+from pymongo import ReturnDocument
+from pymongo.errors import BulkWriteError
+from models.ocr_text_model import split_ocr_data
+from services.hash_filter import issued_hashes
+from models.stats_model import record_document_added, record_documents_added, record_status_change, record_ai_score_change
+
+def _build_document(mongo, data):
+    return {
+        "source": data.get("source"),             # URL or public link
+        "status": data.get("status", "pending"), # e.g., pending, verified, invalid
+        "issuer_id": data.get("issuer_id"),
+        "verified_by": data.get("verified_by", []),  # List of verifier IDs
+        "issue_time": data.get("issue_time", datetime.utcnow()),  # Fixed datetime call
+        "ocr_data": split_ocr_data(mongo, data.get("ocr_data", {})),  # OCR preview + ref to full text
+        "ai_score": data.get("ai_score", 0.0),   # anomaly detection score
+        "metaData": data.get("metaData", {}),    # watermark info, metadata
+        "hash": data.get("hash"),                 # optional HMAC hash
+        "perceptual_hashes": data.get("perceptual_hashes", []),  # per-page pHash/dHash (issued documents)
+        "text_minhash": data.get("text_minhash"),  # MinHash of the OCR text (issued documents)
+        "created_at": datetime.utcnow(),
+        "updated_at": datetime.utcnow()
+    }
 
 def create_document(mongo, data):
     """
@@ -13,26 +35,46 @@ def create_document(mongo, data):
         ObjectId: The ID of the created document
     """
     try:
-        document = {
-            "source": data.get("source"),             # URL or public link
-            "status": data.get("status", "pending"), # e.g., pending, verified, invalid
-            "issuer_id": data.get("issuer_id"),
-            "verified_by": data.get("verified_by", []),  # List of verifier IDs
-            "issue_time": data.get("issue_time", datetime.utcnow()),  # Fixed datetime call
-            "ocr_data": data.get("ocr_data", {}),     # text extracted by OCR
-            "ai_score": data.get("ai_score", 0.0),   # anomaly detection score
-            "metaData": data.get("metaData", {}),    # watermark info, metadata
-            "hash": data.get("hash"),                 # optional HMAC hash
-            "created_at": datetime.utcnow(),
-            "updated_at": datetime.utcnow()
-        }
+        document = _build_document(mongo, data)
         result = mongo.db.documents.insert_one(document)
         print(f"✅ Document created with ID: {result.inserted_id}")
+        _track_issued_hash(document)
+        _update_stats(record_document_added, mongo, document)
         return result.inserted_id
     except Exception as e:
         print(f"❌ Error creating document: {str(e)}")
         raise e
 
+def create_documents(mongo, items):
+    """
+    Create many documents with a single unordered insert_many
+    
+    Args:
+        mongo: Database connection
+        items: List of document data dictionaries (as for create_document)
+    
+    Returns:
+        tuple: (list of ObjectId, or None where the insert was rejected,
+                dict index -> {"code", "message"} for the rejected items;
+                code 11000 means the issued hash already exists)
+    """
+    if not items:
+        return [], {}
+    documents = [_build_document(mongo, data) for data in items]
+    errors = {}
+    try:
+        mongo.db.documents.insert_many(documents, ordered=False)
+    except BulkWriteError as e:
+        for error in e.details.get("writeErrors", []):
+            errors[error["index"]] = {"code": error.get("code"), "message": error.get("errmsg", "")}
+    
+    inserted = [document for index, document in enumerate(documents) if index not in errors]
+    for document in inserted:
+        _track_issued_hash(document)
+    _update_stats(record_documents_added, mongo, inserted)
+    print(f"✅ Created {len(inserted)} documents ({len(errors)} rejected)")
+    return [None if index in errors else document["_id"] for index, document in enumerate(documents)], errors
+
 def get_document(mongo, doc_id):
     """
     Retrieve a document by ID
@@ -140,16 +182,128 @@ def update_document_status(mongo, document_id, new_status):
         if isinstance(document_id, str):
             document_id = ObjectId(document_id)
         
-        result = mongo.db.documents.update_one(
+        # Return the previous version so the stats can move the status bucket
+        previous = mongo.db.documents.find_one_and_update(
             {"_id": document_id},
             {
                 "$set": {
                     "status": new_status,
                     "updated_at": datetime.utcnow()
                 }
-            }
+            },
+            projection={"status": 1, "issuer_id": 1, "verified_by": 1},
+            return_document=ReturnDocument.BEFORE
         )
-        return result.modified_count > 0
+        if previous is None:
+            return False
+        _update_stats(record_status_change, mongo, previous, previous.get("status"), new_status)
+        return previous.get("status") != new_status
     except Exception as e:
         print(f"❌ Error updating document status: {str(e)}")
         return False
+
+def add_document_verification(mongo, document_id, verifier_id, ai_score):
+    """
+    Record a (re-)verification: link the verifier and store the new ai_score
+    
+    Args:
+        mongo: Database connection
+        document_id: String or ObjectId of the document
+        verifier_id: String or ObjectId of the verifier
+        ai_score: New suspicion score
+    
+    Returns:
+        bool: True if the document exists, False otherwise
+    """
+    if isinstance(document_id, str):
+        document_id = ObjectId(document_id)
+    if isinstance(verifier_id, str):
+        verifier_id = ObjectId(verifier_id)
+    
+    previous = mongo.db.documents.find_one_and_update(
+        {"_id": document_id},
+        {
+            "$addToSet": {"verified_by": verifier_id},
+            "$set": {"ai_score": ai_score, "updated_at": datetime.utcnow()}
+        },
+        projection={"status": 1, "issuer_id": 1, "verified_by": 1, "ai_score": 1},
+        return_document=ReturnDocument.BEFORE
+    )
+    if previous is None:
+        return False
+    
+    # Existing scopes only see the score change; a new verifier gets the whole document
+    _update_stats(record_ai_score_change, mongo, previous, previous.get("ai_score"), ai_score)
+    if verifier_id not in (previous.get("verified_by") or []):
+        updated = {**previous, "ai_score": ai_score}
+        _update_stats(record_document_added, mongo, updated, keys=[f"verifier:{verifier_id}"])
+    return True
+
+def _track_issued_hash(document):
+    # Keep the in-process issued-hash filter current so this document is not
+    # ruled out by verifier lookups before the next refresh
+    if document["metaData"].get("upload_method") == "issuer_upload":
+        issued_hashes.add(document.get("hash"))
+
+def _update_stats(recorder, mongo, *args, **kwargs):
+    # The document write already succeeded; a failed counter update is
+    # logged and left for `flask db rebuild-stats` to reconcile
+    try:
+        recorder(mongo, *args, **kwargs)
+    except Exception as e:
+        print(f"⚠️ Error updating document stats: {str(e)}")
+
+# Fields the issuer/verifier listing routes need; the OCR text itself is
+# reduced to a 100-character preview on the server
+LISTING_PROJECTION = {
+    "status": 1,
+    "issue_time": 1,
+    "ai_score": 1,
+    "metaData.original_filename": 1,
+    "metaData.document_type": 1,
+    "metaData.upload_method": 1,
+    # Stored preview, or the inline text of records not yet migrated
+    "ocr_preview": {"$substrCP": [
+        {"$ifNull": ["$ocr_data.preview", {"$ifNull": ["$ocr_data.extracted_text", ""]}]}, 0, 100
+    ]}
+}
+
+def list_documents_page(mongo, query, limit, cursor=None):
+    """
+    Get one page of documents, newest first, using keyset pagination
+    
+    Args:
+        mongo: Database connection
+        query: Filter (e.g. {"issuer_id": ObjectId(...)})
+        limit: Page size
+        cursor: String _id of the last document of the previous page
+    
+    Returns:
+        tuple: (list of projected documents, next cursor or None)
+    """
+    if cursor:
+        query = {**query, "_id": {"$lt": ObjectId(cursor)}}
+    
+    # Fetch one extra document to know whether another page exists
+    documents = list(
+        mongo.db.documents.find(query, LISTING_PROJECTION)
+        .sort("_id", -1)
+        .limit(limit + 1)
+    )
+    has_more = len(documents) > limit
+    documents = documents[:limit]
+    next_cursor = str(documents[-1]["_id"]) if has_more and documents else None
+    return documents, next_cursor
+
+def clamp_page_size(raw_limit, default, maximum):
+    """
+    Parse a ?limit= value and keep it within 1..maximum
+    
+    Returns:
+        int: Page size to use
+    """
+    try:
+        limit = int(raw_limit) if raw_limit is not None else default
+    except (TypeError, ValueError):
+        limit = default
+    return max(1, min(limit, maximum))
@@ -7,14 +7,28 @@ def create_issuer(mongo, data):
         "email": data.get("email"),
         "password": data.get("password"),  # hashed later in route
         "institution": data.get("institution"),
-        "documents": [],                   # List of document IDs issued
         "role": "issuer",
         "created_at": datetime.utcnow()
     }
     return mongo.db.issuers.insert_one(issuer).inserted_id
 
 def get_issuer(mongo, issuer_id):
-    return mongo.db.issuers.find_one({"_id": ObjectId(issuer_id)})
+    # Documents are looked up by owner on the documents collection; never
+    # load a legacy embedded array if one is still present
+    return mongo.db.issuers.find_one({"_id": ObjectId(issuer_id)}, {"documents": 0})
 
 def get_issuer_by_email(mongo, email):
     return mongo.db.issuers.find_one({"email": email})
+
+def strip_document_arrays(mongo):
+    """
+    Remove the legacy embedded "documents" arrays from issuer records
+
+    Returns:
+        int: Number of issuers updated
+    """
+    result = mongo.db.issuers.update_many(
+        {"documents": {"$exists": True}},
+        {"$unset": {"documents": ""}}
+    )
+    return result.modified_count
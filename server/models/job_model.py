@@ -0,0 +1,55 @@
+from datetime import datetime
+from bson import ObjectId
+
+# Job lifecycle: queued -> running -> succeeded | failed
+
+def create_job(mongo, kind, data=None):
+    """
+    Record a new queued background job
+
+    Args:
+        mongo: Database connection
+        kind: Job type (e.g. "verification")
+        data: Extra fields to store with the job (owner, filename, ...)
+
+    Returns:
+        ObjectId: The job ID
+    """
+    job = {
+        "kind": kind,
+        "status": "queued",
+        **(data or {}),
+        "result": None,
+        "error": None,
+        "created_at": datetime.utcnow(),
+        "started_at": None,
+        "finished_at": None
+    }
+    return mongo.db.jobs.insert_one(job).inserted_id
+
+def mark_job_running(mongo, job_id):
+    mongo.db.jobs.update_one(
+        {"_id": ObjectId(job_id)},
+        {"$set": {"status": "running", "started_at": datetime.utcnow()}}
+    )
+
+def complete_job(mongo, job_id, result):
+    mongo.db.jobs.update_one(
+        {"_id": ObjectId(job_id)},
+        {"$set": {"status": "succeeded", "result": result, "finished_at": datetime.utcnow()}}
+    )
+
+def fail_job(mongo, job_id, error):
+    mongo.db.jobs.update_one(
+        {"_id": ObjectId(job_id)},
+        {"$set": {"status": "failed", "error": error, "finished_at": datetime.utcnow()}}
+    )
+
+def get_job(mongo, job_id):
+    """
+    Retrieve a job by ID
+
+    Returns:
+        dict: Job record or None if not found
+    """
+    return mongo.db.jobs.find_one({"_id": ObjectId(job_id)})
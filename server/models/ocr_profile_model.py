@@ -0,0 +1,131 @@
+from datetime import datetime
+from bson import ObjectId
+
+def create_ocr_profile(mongo, data):
+    """
+    Create or replace the OCR profile for an institute + document type
+
+    Args:
+        mongo: Database connection
+        data: Dictionary with institute_id, institute, document_type, dpi and fields.
+              Each field is {"name", "box": [x0, y0, x1, y1] (0-1, relative to
+              the page), "page", "psm", "whitelist"}
+
+    Returns:
+        ObjectId: The ID of the stored profile
+    """
+    try:
+        profile = {
+            "institute_id": data.get("institute_id"),
+            "institute": data.get("institute"),            # institute name, matches issuer.institution
+            "document_type": data.get("document_type", "certificate"),
+            "dpi": data.get("dpi"),                         # optional render DPI for ROI crops
+            "fields": data.get("fields", []),
+            "updated_at": datetime.utcnow()
+        }
+        result = mongo.db.ocr_profiles.find_one_and_update(
+            {"institute": profile["institute"], "document_type": profile["document_type"]},
+            {"$set": profile, "$setOnInsert": {"created_at": datetime.utcnow()}},
+            upsert=True,
+            return_document=True
+        )
+        print(f"✅ OCR profile saved for {profile['institute']} / {profile['document_type']}")
+        return result["_id"]
+    except Exception as e:
+        print(f"❌ Error saving OCR profile: {str(e)}")
+        raise e
+
+def get_ocr_profile(mongo, institute, document_type):
+    """
+    Find the OCR profile for an institute name + document type
+
+    Returns:
+        dict: Profile or None if this layout has no profile
+    """
+    try:
+        if not institute or not document_type:
+            return None
+        return mongo.db.ocr_profiles.find_one({"institute": institute, "document_type": document_type})
+    except Exception as e:
+        print(f"❌ Error retrieving OCR profile: {str(e)}")
+        return None
+
+def get_ocr_profiles_by_institute(mongo, institute_id):
+    """
+    Get all OCR profiles registered for an institute
+
+    Returns:
+        list: List of profiles
+    """
+    try:
+        if isinstance(institute_id, str):
+            institute_id = ObjectId(institute_id)
+        return list(mongo.db.ocr_profiles.find({"institute_id": institute_id}))
+    except Exception as e:
+        print(f"❌ Error retrieving OCR profiles: {str(e)}")
+        return []
+
+def validate_ocr_profile_fields(fields):
+    """
+    Check and normalise the ROI fields of an OCR profile
+
+    Args:
+        fields: List of field dicts from the request body
+
+    Returns:
+        tuple: (normalised fields list, error message or None)
+    """
+    if not isinstance(fields, list) or not fields:
+        return None, "At least one field is required"
+
+    normalised = []
+    for field in fields:
+        if not isinstance(field, dict):
+            return None, "Every field must be an object"
+        name = str(field.get("name", "")).strip()
+        if not name:
+            return None, "Every field needs a name"
+        box = field.get("box")
+        try:
+            x0, y0, x1, y1 = [float(v) for v in box]
+        except (TypeError, ValueError):
+            return None, f"Field '{name}': box must be [x0, y0, x1, y1]"
+        if not (0 <= x0 < x1 <= 1 and 0 <= y0 < y1 <= 1):
+            return None, f"Field '{name}': box coordinates must be fractions of the page (0-1)"
+        try:
+            page = int(field.get("page", 0))
+            psm = int(field.get("psm", 7))
+        except (TypeError, ValueError):
+            return None, f"Field '{name}': page and psm must be integers"
+        if page < 0:
+            return None, f"Field '{name}': page must be 0 or greater"
+        if not 0 <= psm <= 13:
+            return None, f"Field '{name}': psm must be a Tesseract page segmentation mode (0-13)"
+        normalised.append({
+            "name": name,
+            "box": [x0, y0, x1, y1],
+            "page": page,
+            "psm": psm,                                               # 7 = single text line
+            "whitelist": "".join(str(field.get("whitelist", "")).split())  # Tesseract config can't carry spaces
+        })
+    return normalised, None
+
+def validate_ocr_profile_dpi(dpi):
+    """
+    Check the optional render DPI of an OCR profile
+
+    Args:
+        dpi: Value from the request body (None or "" for config.OCR_DPI)
+
+    Returns:
+        tuple: (dpi int or None, error message or None)
+    """
+    if dpi is None or dpi == "":
+        return None, None
+    try:
+        dpi = int(dpi)
+    except (TypeError, ValueError):
+        return None, "dpi must be an integer"
+    if not 72 <= dpi <= 600:
+        return None, "dpi must be between 72 and 600"
+    return dpi, None
@@ -0,0 +1,122 @@
+import zlib
+import hashlib
+from datetime import datetime
+from bson import Binary
+import config
+
+try:
+    import zstandard
+except ImportError:  # optional, zlib is always available
+    zstandard = None
+
+def _compress(text):
+    raw = text.encode('utf-8')
+    if config.OCR_TEXT_CODEC == "zstd" and zstandard is not None:
+        return "zstd", zstandard.ZstdCompressor(level=3).compress(raw)
+    return "zlib", zlib.compress(raw, 6)
+
+def _decompress(codec, data):
+    if codec == "zstd":
+        if zstandard is None:
+            raise RuntimeError("OCR text was stored with zstd but the zstandard package is not installed")
+        raw = zstandard.ZstdDecompressor().decompress(data)
+    else:
+        raw = zlib.decompress(data)
+    return raw.decode('utf-8')
+
+def store_ocr_text(mongo, text):
+    """
+    Store full OCR text compressed in the ocr_texts side collection
+
+    Texts are content-addressed (SHA-256 of the text), so identical OCR
+    output - e.g. a verifier re-upload of an issued certificate - is
+    stored once.
+
+    Args:
+        mongo: Database connection
+        text: Full extracted text
+
+    Returns:
+        str: Reference (_id in ocr_texts)
+    """
+    text_ref = hashlib.sha256(text.encode('utf-8')).hexdigest()
+    codec, data = _compress(text)
+    mongo.db.ocr_texts.update_one(
+        {"_id": text_ref},
+        {"$setOnInsert": {
+            "codec": codec,
+            "data": Binary(data),
+            "length": len(text),
+            "created_at": datetime.utcnow()
+        }},
+        upsert=True
+    )
+    return text_ref
+
+def split_ocr_data(mongo, ocr_data):
+    """
+    Move the bulky extracted_text of an ocr_data dict to side storage
+
+    Args:
+        mongo: Database connection
+        ocr_data: ocr_data as built by the upload routes
+
+    Returns:
+        dict: ocr_data with preview, text_length and text_ref instead of the full text
+    """
+    if not ocr_data or "extracted_text" not in ocr_data:
+        return ocr_data
+    slim = dict(ocr_data)
+    text = slim.pop("extracted_text") or ""
+    slim["preview"] = text[:config.OCR_PREVIEW_CHARS]
+    slim["text_length"] = len(text)
+    slim["text_ref"] = store_ocr_text(mongo, text) if text else None
+    return slim
+
+def load_ocr_text(mongo, ocr_data):
+    """
+    Get the full OCR text of a document, loading it from side storage if needed
+
+    Args:
+        mongo: Database connection
+        ocr_data: ocr_data of a document record (new or legacy layout)
+
+    Returns:
+        str: Full extracted text ("" if none)
+    """
+    ocr_data = ocr_data or {}
+    if "extracted_text" in ocr_data:          # legacy records keep it inline
+        return ocr_data["extracted_text"] or ""
+    text_ref = ocr_data.get("text_ref")
+    if not text_ref:
+        return ocr_data.get("preview", "")
+    try:
+        stored = mongo.db.ocr_texts.find_one({"_id": text_ref})
+        if not stored:
+            print(f"⚠️ OCR text {text_ref[:12]} missing from side storage")
+            return ocr_data.get("preview", "")
+        return _decompress(stored.get("codec", "zlib"), stored["data"])
+    except Exception as e:
+        print(f"❌ Error loading OCR text: {str(e)}")
+        return ocr_data.get("preview", "")
+
+def migrate_inline_ocr_text(mongo, batch_size=500):
+    """
+    Move extracted_text of existing documents into side storage
+
+    Returns:
+        int: Number of documents migrated
+    """
+    migrated = 0
+    cursor = mongo.db.documents.find(
+        {"ocr_data.extracted_text": {"$exists": True}},
+        {"ocr_data": 1}
+    ).batch_size(batch_size)
+    for doc in cursor:
+        mongo.db.documents.update_one(
+            {"_id": doc["_id"]},
+            {"$set": {"ocr_data": split_ocr_data(mongo, doc.get("ocr_data"))}}
+        )
+        migrated += 1
+    print(f"✅ Moved OCR text of {migrated} documents to side storage")
+    return migrated
@@ -0,0 +1,180 @@
+from datetime import datetime
+from bson import ObjectId
+from pymongo import UpdateOne
+
+# Counter documents in the "stats" collection, one per scope:
+#   "global", "issuer:<issuer_id>" and "verifier:<verifier_id>"
+# Each holds total, by_status.<status>, ai_score_sum and ai_score_count,
+# kept current with $inc by the document model so summaries never scan.
+
+def _numeric(value):
+    return isinstance(value, (int, float)) and not isinstance(value, bool)
+
+def stats_keys(document):
+    """
+    Stats scopes a document counts towards
+
+    Args:
+        document: Document record (needs issuer_id and verified_by)
+
+    Returns:
+        list: Stats _id strings
+    """
+    keys = ["global"]
+    if document.get("issuer_id"):
+        keys.append(f"issuer:{document['issuer_id']}")
+    for verifier_id in document.get("verified_by") or []:
+        keys.append(f"verifier:{verifier_id}")
+    return keys
+
+def _document_increments(document, sign):
+    increments = {
+        "total": sign,
+        f"by_status.{document.get('status') or 'unknown'}": sign
+    }
+    if _numeric(document.get("ai_score")):
+        increments["ai_score_sum"] = sign * document["ai_score"]
+        increments["ai_score_count"] = sign
+    return increments
+
+def apply_stats_increments(mongo, keys, increments):
+    """
+    $inc the same counters on several stats documents (upserting them)
+
+    Args:
+        mongo: Database connection
+        keys: Stats _id strings
+        increments: Field -> amount
+    """
+    if not keys or not increments:
+        return
+    now = datetime.utcnow()
+    mongo.db.stats.bulk_write([
+        UpdateOne({"_id": key}, {"$inc": increments, "$set": {"updated_at": now}}, upsert=True)
+        for key in keys
+    ], ordered=False)
+
+def record_document_added(mongo, document, keys=None):
+    """Count a new document (or a document newly linked to some scopes)"""
+    apply_stats_increments(mongo, keys or stats_keys(document), _document_increments(document, 1))
+
+def record_documents_added(mongo, documents):
+    """Count many new documents, one $inc per distinct set of scopes"""
+    grouped = {}
+    for document in documents:
+        totals = grouped.setdefault(tuple(stats_keys(document)), {})
+        for field, amount in _document_increments(document, 1).items():
+            totals[field] = totals.get(field, 0) + amount
+    for keys, increments in grouped.items():
+        apply_stats_increments(mongo, list(keys), increments)
+
+def record_status_change(mongo, document, old_status, new_status):
+    """Move a document from one status bucket to another in all its scopes"""
+    old_status, new_status = old_status or "unknown", new_status or "unknown"
+    if old_status == new_status:
+        return
+    apply_stats_increments(mongo, stats_keys(document), {
+        f"by_status.{old_status}": -1,
+        f"by_status.{new_status}": 1
+    })
+
+def record_ai_score_change(mongo, document, old_score, new_score, keys=None):
+    """Adjust the ai_score sums of all scopes a document already counts towards"""
+    increments = {}
+    if _numeric(old_score):
+        increments["ai_score_sum"] = -old_score
+        increments["ai_score_count"] = -1
+    if _numeric(new_score):
+        increments["ai_score_sum"] = increments.get("ai_score_sum", 0) + new_score
+        increments["ai_score_count"] = increments.get("ai_score_count", 0) + 1
+    increments = {field: amount for field, amount in increments.items() if amount}
+    apply_stats_increments(mongo, keys or stats_keys(document), increments)
+
+def get_stats_summary(mongo, key):
+    """
+    O(1) summary for one scope
+
+    Args:
+        mongo: Database connection
+        key: "global", "issuer:<id>" or "verifier:<id>"
+
+    Returns:
+        dict: total_documents, status_summary, mean_ai_score and updated_at
+    """
+    stats = mongo.db.stats.find_one({"_id": key}) or {}
+    score_count = stats.get("ai_score_count", 0)
+    return {
+        "total_documents": stats.get("total", 0),
+        "status_summary": {status: count for status, count in stats.get("by_status", {}).items() if count},
+        "mean_ai_score": round(stats.get("ai_score_sum", 0.0) / score_count, 4) if score_count else None,
+        "updated_at": stats.get("updated_at")
+    }
+
+def rebuild_stats(mongo):
+    """
+    Recompute every stats document from the documents collection
+
+    Used to reconcile the counters after a crash between a document write
+    and its $inc, or to initialise them for existing data. The new counters
+    are written to a scratch collection and renamed over stats in one step,
+    so readers never see them empty or half written; $inc writes that land
+    while the aggregation runs are still lost, so run it in a quiet period.
+
+    Returns:
+        int: Number of stats documents written
+    """
+    group = {
+        "count": {"$sum": 1},
+        "ai_score_sum": {"$sum": {"$cond": [{"$isNumber": "$ai_score"}, "$ai_score", 0]}},
+        "ai_score_count": {"$sum": {"$cond": [{"$isNumber": "$ai_score"}, 1, 0]}}
+    }
+    pipelines = {
+        "global": [
+            {"$group": {"_id": {"owner": None, "status": "$status"}, **group}}
+        ],
+        "issuer": [
+            {"$match": {"issuer_id": {"$ne": None}}},
+            {"$group": {"_id": {"owner": "$issuer_id", "status": "$status"}, **group}}
+        ],
+        "verifier": [
+            {"$unwind": "$verified_by"},
+            {"$group": {"_id": {"owner": "$verified_by", "status": "$status"}, **group}}
+        ]
+    }
+
+    now = datetime.utcnow()
+    rebuilt = {}
+    for scope, pipeline in pipelines.items():
+        for row in mongo.db.documents.aggregate(pipeline, allowDiskUse=True):
+            owner = row["_id"]["owner"]
+            key = "global" if scope == "global" else f"{scope}:{owner}"
+            stats = rebuilt.setdefault(key, {
+                "_id": key, "total": 0, "by_status": {},
+                "ai_score_sum": 0.0, "ai_score_count": 0, "updated_at": now
+            })
+            status = row["_id"].get("status") or "unknown"
+            stats["total"] += row["count"]
+            stats["by_status"][status] = stats["by_status"].get(status, 0) + row["count"]
+            stats["ai_score_sum"] += row["ai_score_sum"]
+            stats["ai_score_count"] += row["ai_score_count"]
+
+    if rebuilt:
+        scratch = mongo.db[f"stats_rebuild_{ObjectId()}"]
+        scratch.insert_many(list(rebuilt.values()))
+        scratch.rename("stats", dropTarget=True)
+    else:
+        mongo.db.stats.delete_many({})
+    print(f"📊 Rebuilt {len(rebuilt)} stats documents")
+    return len(rebuilt)
+
+def ensure_stats(mongo):
+    """
+    Build the stats counters on deployments that have documents but no stats yet
+
+    Returns:
+        int: Number of stats documents written (0 if they already existed)
+    """
+    if mongo.db.stats.estimated_document_count() or not mongo.db.documents.estimated_document_count():
+        return 0
+    print("📊 Stats collection is empty; building counters from existing documents")
+    return rebuild_stats(mongo)
@@ -7,14 +7,28 @@ def create_verifier(mongo, data):
         "email": data.get("email"),
         "password": data.get("password"),  # hashed later in route
         "institution": data.get("institution"),
-        "documents": [],                   # List of document IDs verified
         "role": "verifier",
         "created_at": datetime.utcnow()
     }
     return mongo.db.verifiers.insert_one(verifier).inserted_id
 
 def get_verifier(mongo, verifier_id):
-    return mongo.db.verifiers.find_one({"_id": ObjectId(verifier_id)})
+    # Documents are looked up by owner on the documents collection; never
+    # load a legacy embedded array if one is still present
+    return mongo.db.verifiers.find_one({"_id": ObjectId(verifier_id)}, {"documents": 0})
 
 def get_verifier_by_email(mongo, email):
     return mongo.db.verifiers.find_one({"email": email})
+
+def strip_document_arrays(mongo):
+    """
+    Remove the legacy embedded "documents" arrays from verifier records
+
+    Returns:
+        int: Number of verifiers updated
+    """
+    result = mongo.db.verifiers.update_many(
+        {"documents": {"$exists": True}},
+        {"$unset": {"documents": ""}}
+    )
+    return result.modified_count
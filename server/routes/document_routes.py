@@ -2,6 +2,8 @@ from flask import Blueprint, request, jsonify
 from models.document_model import create_document, get_document
 from services.ocr import extract_text
 from services.watermark import add_watermark
+from services.ocr_cache import ocr_cache
+from models.stats_model import get_stats_summary
 # from services.process import process_document_complete_flow
 from database import mongo
 import os
@@ -38,6 +40,20 @@ def get_doc(doc_id):
         return jsonify(doc), 200
     return jsonify({"error": "Document not found"}), 404
 
+@doc_bp.route("/ocr-cache/stats", methods=["GET"])
+def ocr_cache_stats():
+    """
+    Hit/miss/eviction counters for the OCR result cache
+    """
+    return jsonify({"success": True, "ocr_cache": ocr_cache.stats()}), 200
+
+@doc_bp.route("/stats/summary", methods=["GET"])
+def global_stats_summary():
+    """
+    Platform-wide document counts from the maintained stats document
+    """
+    return jsonify({"success": True, **get_stats_summary(mongo, "global")}), 200
+
 @doc_bp.route("/verify/<doc_id>", methods=["GET"])
 def verify_doc(doc_id):
     result = verify_document(mongo, doc_id)
@@ -1,7 +1,10 @@
 from database import mongo
 from flask import Blueprint, request, jsonify
 from models.institute_model import create_institute, get_institute
+from services.hmac_hash import institute_keys
+from models.ocr_profile_model import create_ocr_profile, get_ocr_profiles_by_institute, validate_ocr_profile_fields, validate_ocr_profile_dpi
 from datetime import datetime
+from bson import ObjectId
 
 institute_bp = Blueprint("institutes", __name__)
 
@@ -31,6 +34,7 @@ def register_institute():
         }
         
         institute_id = create_institute(mongo, institute)
+        institute_keys.invalidate()  # new secret key must be checked on the next verification
         
         return jsonify({
             "success": True,
@@ -79,6 +83,73 @@ def list_institutes():
             "error": "Failed to fetch institutes"
         }), 500
 
+@institute_bp.route("/<institute_id>/ocr-profiles", methods=["POST"])
+def register_ocr_profile(institute_id):
+    """
+    Register the ROI template for one of an institute's document layouts
+    """
+    try:
+        data = request.json or {}
+        
+        institute = get_institute(mongo, ObjectId(institute_id))
+        if not institute:
+            return jsonify({"success": False, "error": "Institute not found"}), 404
+        
+        document_type = data.get("document_type")
+        if not document_type:
+            return jsonify({"success": False, "error": "Document type is required"}), 400
+        
+        fields, error = validate_ocr_profile_fields(data.get("fields"))
+        if error:
+            return jsonify({"success": False, "error": error}), 400
+        
+        dpi, error = validate_ocr_profile_dpi(data.get("dpi"))
+        if error:
+            return jsonify({"success": False, "error": error}), 400
+        
+        profile_id = create_ocr_profile(mongo, {
+            "institute_id": institute["_id"],
+            "institute": institute["name"],
+            "document_type": document_type,
+            "dpi": dpi,
+            "fields": fields
+        })
+        
+        return jsonify({
+            "success": True,
+            "message": "OCR profile saved",
+            "profile_id": str(profile_id),
+            "institute_name": institute["name"],
+            "document_type": document_type,
+            "fields": [field["name"] for field in fields]
+        }), 201
+        
+    except Exception as e:
+        print(f"❌ Error registering OCR profile: {e}")
+        return jsonify({"success": False, "error": "Failed to register OCR profile"}), 500
+
+@institute_bp.route("/<institute_id>/ocr-profiles", methods=["GET"])
+def list_ocr_profiles(institute_id):
+    """Get the OCR profiles registered for an institute"""
+    try:
+        profiles = get_ocr_profiles_by_institute(mongo, institute_id)
+        return jsonify({
+            "success": True,
+            "profiles": [
+                {
+                    "id": str(profile["_id"]),
+                    "document_type": profile.get("document_type"),
+                    "dpi": profile.get("dpi"),
+                    "fields": profile.get("fields", [])
+                }
+                for profile in profiles
+            ]
+        }), 200
+        
+    except Exception as e:
+        print(f"❌ Error fetching OCR profiles: {e}")
+        return jsonify({"success": False, "error": "Failed to fetch OCR profiles"}), 500
+
 # create_institute(mongo, data = {
 #     "name": "VJTI",
 #     "type": "university",
@@ -1,15 +1,24 @@
 from flask import Blueprint, request, jsonify, current_app
 from werkzeug.utils import secure_filename
-import os
-import tempfile
+import time
 from datetime import datetime
 from models.issuer_model import get_issuer
-from models.document_model import create_document
-from services.ocr import extract_text
-from services.hmac_hash import hash_document
-from services.cloudinary_service import upload_document
+from models.document_model import create_document, list_documents_page, clamp_page_size
+from models.stats_model import get_stats_summary
+from models.ocr_profile_model import get_ocr_profile
+from services.ocr import ocr_document
+from services.hmac_hash import hash_document, institute_keys, find_issued_document
+from services.storage import BackgroundUpload
+from services.ingest import ingest_upload
+from services.issuance import build_issued_record, sign_issued_text, load_manifest, BulkIssuance
+from services.bundle import iter_bundle_files
+from services.metrics import stage, start_breakdown, stop_breakdown, record_run
+from services.perceptual_hash import fingerprint_document, perceptual_index
+from services.text_similarity import text_index
 from database import mongo
+import config
 from bson import ObjectId
+from pymongo.errors import DuplicateKeyError
 
 issuer_bp = Blueprint("issuer", __name__)
 
@@ -25,7 +34,14 @@ def allowed_file(filename):
 def issuer_upload_document():
     """
     Issuer uploads document - OCR extraction with suspicion score = 0
+    
+    With debug=true the response includes the per-stage timings.
     """
+    ctx = None
+    upload = None
+    stage_timings, breakdown_token = start_breakdown()
+    run_start = time.perf_counter()
+    outcome = "rejected"
     try:
         # Check if file is uploaded
         if 'file' not in request.files:
@@ -34,7 +50,7 @@ def issuer_upload_document():
         file = request.files['file']
         if file.filename == '':
             return jsonify({"error": "No file selected"}), 400
-        print("hi")
+        
         # Validate file type
         if not allowed_file(file.filename):
             return jsonify({
@@ -52,10 +68,56 @@ def issuer_upload_document():
         if not issuer:
             return jsonify({"error": "Issuer not found"}), 404
         
-        # Upload document to Cloudinary
-        print(f"� Uploading document to Cloudinary...")
-        cloudinary_result = upload_document(file, folder=f"issuers/{issuer_id}")
+        debug = request.values.get("debug", str(config.STAGE_TIMINGS_IN_RESPONSE)).lower() == "true"
+        outcome = "error"
+        
+        # Stream the upload once: spool it and compute the HMAC with the issuer's
+        # institute key (or the default key) in the same pass
+        institute_secret = institute_keys.secret_for(mongo, issuer.get("institution"))
+        with stage("issuer_upload", "ingest"):
+            ctx = ingest_upload(file, secret_keys=[institute_secret])
         
+        # HMAC hash using institute secret key (computed during ingest)
+        try:
+            document_hash = hash_document(ctx, institute_secret)
+            print(f"🔐 Document hash generated: {document_hash[:16]}...")
+        except Exception as e:
+            print(f"⚠️ Hash generation failed: {e}")
+            document_hash = None
+        
+        # Each document can only be issued once; say so before uploading anything
+        with stage("issuer_upload", "hash_lookup"):
+            existing = find_issued_document(mongo, document_hash)
+        if existing:
+            outcome = "rejected"
+            return jsonify({
+                "error": "Document already issued",
+                "document_id": str(existing["_id"])
+            }), 409
+        
+        # Upload to storage from the spooled copy while OCR runs on it
+        print(f"📸 Uploading document to storage in the background...")
+        upload = BackgroundUpload(ctx, f"issuers/{issuer_id}", "issuer_upload")
+        
+        # Known institute layouts only need their profile's fields OCR'd
+        document_type = request.form.get("document_type", "certificate")
+        ocr_profile = get_ocr_profile(mongo, issuer.get("institution"), document_type)
+        
+        # Extract OCR text from the uploaded bytes
+        print(f"🔤 Extracting OCR text from uploaded document...")
+        with stage("issuer_upload", "ocr"):
+            ocr_result = ocr_document(ctx, profile=ocr_profile)
+        ocr_text = ocr_result["text"]
+        
+        # Page fingerprints let rescans of this document be matched later
+        with stage("issuer_upload", "perceptual_hash"):
+            perceptual_hashes = fingerprint_document(ctx)
+        
+        # Full-page text signature, comparable with verifier uploads
+        text_minhash = sign_issued_text(ctx, ocr_result, "issuer_upload")
+        
+        # Join the upload; without a stored copy the document is not recorded
+        cloudinary_result = upload.result()
         if not cloudinary_result["success"]:
             return jsonify({
                 "error": "Failed to upload document to cloud storage",
@@ -65,69 +127,30 @@ def issuer_upload_document():
         document_url = cloudinary_result["secure_url"]
         public_id = cloudinary_result["public_id"]
         
-        print(f"✅ Document uploaded to Cloudinary: {document_url}")
-        
-        # Create temporary file for OCR processing
-        with tempfile.NamedTemporaryFile(delete=False, suffix=f".{cloudinary_result['format']}") as temp_file:
-            # Reset file pointer and save to temp file
-            file.seek(0)
-            temp_file.write(file.read())
-            temp_filepath = temp_file.name
-        
-        # Extract OCR text from temporary file
-        print(f"🔤 Extracting OCR text from temporary file...")
-        ocr_text = extract_text(temp_filepath)
-        
-        # Generate HMAC hash using institute secret key
-        institute_secret = "supersecretkey"  # Default VJTI secret key
-        try:
-            document_hash = hash_document(temp_filepath, institute_secret)
-            print(f"🔐 Document hash generated: {document_hash[:16]}...")
-        except Exception as e:
-            print(f"⚠️ Hash generation failed: {e}")
-            document_hash = None
-        
-        # Clean up temporary file
-        try:
-            os.unlink(temp_filepath)
-            print(f"🗑️ Temporary file cleaned up")
-        except Exception as e:
-            print(f"⚠️ Failed to clean up temp file: {e}")
+        print(f"✅ Document uploaded to {cloudinary_result['storage']}: {document_url}")
         
         # Prepare document data as per issuer model requirements
-        document_data = {
-            "source": document_url,  # Cloudinary URL
-            "status": "verified",  # Issuer documents are pre-verified
-            "issuer_id": ObjectId(issuer_id),
-            "verified_by": [ObjectId(issuer_id)],  # Self-verified by issuer
-            "issue_time": datetime.utcnow(),
-            "ocr_data": {
-                "extracted_text": ocr_text,
-                "text_length": len(ocr_text),
-                "extraction_method": "tesseract_ocr"
-            },
-            "ai_score": 0.0,  # Suspicion score = 0 for issuer uploads
-            "metaData": {
-                "original_filename": file.filename,
-                "file_size": cloudinary_result.get("bytes", 0),
-                "upload_method": "issuer_upload",
-                "issuer_name": issuer.get("name", ""),
-                "issuer_institution": issuer.get("institution", ""),
-                "document_type": request.form.get("document_type", "certificate"),
-                "cloudinary_public_id": public_id,
-                "storage_type": "cloudinary"
-            },
-            "hash": document_hash  # HMAC hash for document integrity
-        }
+        document_data = build_issued_record(
+            issuer_id, issuer, file.filename, cloudinary_result, ocr_result, ocr_profile,
+            document_hash, institute_secret, document_type,
+            perceptual_hashes=perceptual_hashes, text_minhash=text_minhash
+        )
         
         # Create document in database
-        doc_id = create_document(mongo, document_data)
-        
-        # Update issuer's documents list
-        mongo.db.issuers.update_one(
-            {"_id": ObjectId(issuer_id)},
-            {"$push": {"documents": doc_id}}
-        )
+        try:
+            with stage("issuer_upload", "db_write"):
+                doc_id = create_document(mongo, document_data)
+        except DuplicateKeyError:
+            # Issued concurrently by another request; the upload is discarded below
+            outcome = "rejected"
+            existing = find_issued_document(mongo, document_hash)
+            return jsonify({
+                "error": "Document already issued",
+                "document_id": str(existing["_id"]) if existing else None
+            }), 409
+        upload = None  # recorded: the stored copy belongs to the document now
+        perceptual_index.add(doc_id, perceptual_hashes)
+        text_index.add(doc_id, document_data["text_minhash"])
         
         # Simplified response
         response_data = {
@@ -140,10 +163,22 @@ def issuer_upload_document():
             "suspicion_score": 0.0,
             "status": "verified",
             "upload_timestamp": datetime.utcnow().isoformat(),
-            "ocr_text_preview": ocr_text[:100] + "..." if len(ocr_text) > 100 else ocr_text
+            "ocr_text_preview": ocr_text[:100] + "..." if len(ocr_text) > 100 else ocr_text,
+            "ocr_fields": ocr_result.get("fields"),
+            "ocr_timings": {
+                "mode": ocr_result["mode"],
+                "workers": ocr_result["workers"],
+                "total_seconds": ocr_result["total_seconds"],
+                "cache": ocr_result["cache"],
+                "pages": ocr_result["pages"]
+            }
         }
         
+        if debug:
+            response_data["stage_timings"] = {**stage_timings, "total": round(time.perf_counter() - run_start, 4)}
+        
         print(f"✅ Document uploaded successfully by issuer: {doc_id}")
+        outcome = "success"
         return jsonify(response_data), 201
         
     except Exception as e:
@@ -152,11 +187,69 @@ def issuer_upload_document():
             "error": "Failed to upload document",
             "details": str(e)
         }), 500
+    
+    finally:
+        # An upload still pending here was not recorded (error or rejection)
+        if upload is not None:
+            upload.discard()
+        stop_breakdown(breakdown_token)
+        record_run("issuer_upload", outcome, time.perf_counter() - run_start)
+        # Release cached rasters and any temp file made for OCR workers
+        if ctx is not None:
+            ctx.close()
+
+@issuer_bp.route("/bulk", methods=["POST"])
+def issuer_bulk_upload():
+    """
+    Issue a whole set of documents at once
+    
+    Form fields: issuer_id, manifest (CSV with a filename column, optional
+    document_type and any other metadata columns) and the documents as zip
+    archive(s) and/or files under "files". Re-posting the same bundle is safe:
+    documents whose hash is already issued are reported, not issued twice.
+    """
+    try:
+        # Get issuer ID from request
+        issuer_id = request.form.get('issuer_id')
+        if not issuer_id:
+            return jsonify({"error": "Issuer ID is required"}), 400
+        
+        # Validate issuer exists
+        issuer = get_issuer(mongo, issuer_id)
+        if not issuer:
+            return jsonify({"error": "Issuer not found"}), 404
+        
+        manifest_file = request.files.get('manifest')
+        if not manifest_file or manifest_file.filename == '':
+            return jsonify({"error": "Manifest CSV is required"}), 400
+        try:
+            manifest = load_manifest(manifest_file.stream)
+        except (ValueError, UnicodeDecodeError) as e:
+            return jsonify({"error": "Invalid manifest", "details": str(e)}), 400
+        
+        uploads = request.files.getlist('files') + request.files.getlist('file')
+        if not any(upload.filename for upload in uploads):
+            return jsonify({"error": "No files uploaded"}), 400
+        
+        files = iter_bundle_files(uploads, max_files=config.BULK_ISSUE_MAX_FILES)
+        report = BulkIssuance(issuer_id, issuer, manifest, allowed=allowed_file).run(files)
+        
+        return jsonify({"success": True, "issuer_id": issuer_id, **report}), 200
+        
+    except Exception as e:
+        print(f"❌ Error in bulk issuance: {str(e)}")
+        return jsonify({
+            "error": "Bulk issuance failed",
+            "details": str(e)
+        }), 500
 
 @issuer_bp.route("/documents/<issuer_id>", methods=["GET"])
 def get_issuer_documents(issuer_id):
     """
-    Get all documents uploaded by a specific issuer
+    Get documents uploaded by a specific issuer, newest first
+    
+    Query params: limit (page size, capped at LIST_PAGE_SIZE_MAX) and
+    cursor (next_cursor from the previous page)
     """
     try:
         # Validate issuer exists
@@ -164,8 +257,11 @@ def get_issuer_documents(issuer_id):
         if not issuer:
             return jsonify({"error": "Issuer not found"}), 404
         
-        # Get all documents issued by this issuer
-        documents = list(mongo.db.documents.find({"issuer_id": ObjectId(issuer_id)}))
+        # Get one page of documents issued by this issuer (listing fields only)
+        query = {"issuer_id": ObjectId(issuer_id)}
+        limit = clamp_page_size(request.args.get("limit"), config.LIST_PAGE_SIZE_DEFAULT, config.LIST_PAGE_SIZE_MAX)
+        documents, next_cursor = list_documents_page(mongo, query, limit, request.args.get("cursor"))
+        summary = get_stats_summary(mongo, f"issuer:{issuer_id}")
         
         # Format documents for response
         formatted_docs = []
@@ -176,7 +272,7 @@ def get_issuer_documents(issuer_id):
                 "status": doc.get("status", "unknown"),
                 "issue_time": doc.get("issue_time"),
                 "document_type": doc.get("metaData", {}).get("document_type", "certificate"),
-                "ocr_text_preview": doc.get("ocr_data", {}).get("extracted_text", "")[:100] + "...",
+                "ocr_text_preview": doc.get("ocr_preview", "") + "...",
                 "suspicion_score": doc.get("ai_score", 0.0)
             }
             formatted_docs.append(formatted_doc)
@@ -185,8 +281,12 @@ def get_issuer_documents(issuer_id):
             "issuer_id": issuer_id,
             "issuer_name": issuer.get("name", ""),
             "institution": issuer.get("institution", ""),
-            "total_documents": len(formatted_docs),
-            "documents": formatted_docs
+            "total_documents": summary["total_documents"],
+            "status_summary": summary["status_summary"],
+            "documents": formatted_docs,
+            "page_size": limit,
+            "next_cursor": next_cursor,
+            "has_more": next_cursor is not None
         }), 200
         
     except Exception as e:
@@ -195,3 +295,18 @@ def get_issuer_documents(issuer_id):
             "error": "Failed to retrieve documents",
             "details": str(e)
         }), 500
+
+@issuer_bp.route("/summary/<issuer_id>", methods=["GET"])
+def get_issuer_summary(issuer_id):
+    """
+    Dashboard counts for an issuer, read from the maintained stats document
+    """
+    try:
+        summary = get_stats_summary(mongo, f"issuer:{ObjectId(issuer_id)}")
+        return jsonify({"issuer_id": issuer_id, **summary}), 200
+    except Exception as e:
+        print(f"❌ Error getting issuer summary: {str(e)}")
+        return jsonify({
+            "error": "Failed to retrieve summary",
+            "details": str(e)
+        }), 500
@@ -1,14 +1,22 @@
-from flask import Blueprint, request, jsonify, current_app
+from flask import Blueprint, request, jsonify, current_app, Response, stream_with_context
 from werkzeug.utils import secure_filename
-import os
-import tempfile
+import json
+import time
 from datetime import datetime
 from models.verifier_model import get_verifier
-from models.document_model import create_document
-from services.ocr import extract_text
-from services.hmac_hash import hash_document
-from services.cloudinary_service import upload_document
+from models.ocr_text_model import load_ocr_text
+from models.document_model import list_documents_page, clamp_page_size, add_document_verification
+from models.stats_model import get_stats_summary
+from models.job_model import create_job, fail_job, get_job
+from services.hmac_hash import institute_keys
+from services.ingest import ingest_upload
+from services.verification import run_verification, VerificationError
+from services.job_queue import verification_jobs
+from services.batch_verification import run_batch_verification
+from services.bundle import iter_bundle_files
+from services.metrics import stage, start_breakdown, stop_breakdown, record_run
 from database import mongo
+import config
 from bson import ObjectId
 from services.doc_proccess import process_document
 
@@ -26,7 +34,15 @@ def allowed_file(filename):
 def verifier_upload_document():
     """
     Verifier uploads document - Hash verification first, then analysis
+    
+    With async=true (default: VERIFY_ASYNC_DEFAULT) the upload is spooled,
+    a job is queued and 202 is returned with its id; poll /jobs/<job_id>.
+    With debug=true the response includes the per-stage timings.
     """
+    ctx = None
+    stage_timings, breakdown_token = start_breakdown()
+    run_start = time.perf_counter()
+    outcome = "rejected"
     try:
         # Check if file is uploaded
         if 'file' not in request.files:
@@ -53,173 +69,175 @@ def verifier_upload_document():
         if not verifier:
             return jsonify({"error": "Verifier not found"}), 404
         
-        # Upload document to Cloudinary
-        print(f"📸 Uploading document to Cloudinary...")
-        cloudinary_result = upload_document(file, folder=f"verifiers/{verifier_id}")
-        
-        if not cloudinary_result["success"]:
+        document_type = request.form.get("document_type", "unknown")
+        short_circuit = request.form.get("short_circuit")
+        if short_circuit is not None:
+            short_circuit = short_circuit.lower() == "true"
+        run_async = request.form.get("async", str(config.VERIFY_ASYNC_DEFAULT)).lower() == "true"
+        debug = request.values.get("debug", str(config.STAGE_TIMINGS_IN_RESPONSE)).lower() == "true"
+        outcome = "error"
+        
+        # Step 1: Stream the upload once, computing the HMAC for every registered
+        # institute key in the same pass; OCR and visual analysis reuse the spool.
+        # Async jobs outlive the request, so their upload always goes to disk
+        with stage("verifier_upload", "ingest"):
+            ctx = ingest_upload(
+                file,
+                secret_keys=institute_keys.secret_keys(mongo),
+                spool_max_bytes=0 if run_async else None
+            )
+        
+        if run_async:
+            job_id = create_job(mongo, "verification", {
+                "verifier_id": ObjectId(verifier_id),
+                "filename": file.filename
+            })
+            queued = verification_jobs.submit(
+                job_id, run_verification, ctx, verifier_id, verifier,
+                document_type=document_type, short_circuit=short_circuit,
+                pipeline="verifier_async", cleanup=ctx.close
+            )
+            if not queued:
+                fail_job(mongo, job_id, {"error": "Verification queue is full"})
+                return jsonify({
+                    "error": "Verification queue is full, retry later",
+                    "job_id": str(job_id)
+                }), 503
+            
+            ctx = None  # the job owns the spooled upload now
+            outcome = "queued"
+            print(f"📨 Verification job {job_id} queued for {file.filename}")
             return jsonify({
-                "error": "Failed to upload document to cloud storage",
-                "details": cloudinary_result["error"]
-            }), 500
-        
-        document_url = cloudinary_result["secure_url"]
-        public_id = cloudinary_result["public_id"]
-        
-        print(f"✅ Document uploaded to Cloudinary: {document_url}")
-        
-        # Create temporary file for processing
-        with tempfile.NamedTemporaryFile(delete=False, suffix=f".{cloudinary_result['format']}") as temp_file:
-            # Reset file pointer and save to temp file
-            file.seek(0)
-            temp_file.write(file.read())
-            temp_filepath = temp_file.name
-        
-        # Step 1: Generate HMAC hash using institute secret key for verification
-        institute_secret = "supersecretkey"  # Default VJTI secret key
-        try:
-            document_hash = hash_document(temp_filepath, institute_secret)
-            print(f"🔐 Document hash generated: {document_hash[:16]}...")
-        except Exception as e:
-            print(f"⚠️ Hash generation failed: {e}")
-            document_hash = None
-        
-        # Step 2: Hash verification - Check if document exists in database
-        existing_doc = None
-        verification_status = "new_document"
-        if document_hash:
-            existing_doc = mongo.db.documents.find_one({"hash": document_hash})
-            if existing_doc:
-                verification_status = "hash_verified"
-                print(f"✅ Document hash found in database - issued by: {existing_doc.get('issuer_id')}")
-            else:
-                verification_status = "hash_not_found" 
-                print(f"❌ Document hash not found in database - potentially fraudulent")
+                "success": True,
+                "job_id": str(job_id),
+                "status": "queued",
+                "status_url": f"/api/verifier/jobs/{job_id}"
+            }), 202
+        
+        # Steps 2-5: hash lookup, storage upload, OCR, analysis and record
+        response_data = run_verification(
+            ctx, verifier_id, verifier,
+            document_type=document_type, short_circuit=short_circuit
+        )
+        if debug:
+            response_data["stage_timings"] = {**stage_timings, "total": round(time.perf_counter() - run_start, 4)}
+        outcome = "success"
+        return jsonify(response_data), 201
         
-        # Step 3: Extract OCR text for analysis
-        print(f"🔤 Extracting OCR text from: {document_url}")
-        ocr_text = extract_text(document_url)
+    except VerificationError as e:
+        print(f"❌ Error in verifier document upload: {e.message}")
+        return jsonify({
+            "error": e.message,
+            "details": e.details
+        }), 500
+    
+    except Exception as e:
+        print(f"❌ Error in verifier document upload: {str(e)}")
+        return jsonify({
+            "error": "Failed to upload document",
+            "details": str(e)
+        }), 500
+    
+    finally:
+        stop_breakdown(breakdown_token)
+        record_run("verifier_upload", outcome, time.perf_counter() - run_start)
+        # Release cached rasters and any temp file made for OCR workers
+        if ctx is not None:
+            ctx.close()
+
+@verifier_bp.route("/batch", methods=["POST"])
+def verifier_batch_upload():
+    """
+    Verify a bundle of documents, streaming results as NDJSON
+    
+    Accepts zip archives and/or several documents under "files" (or "file").
+    Each document runs the same pipeline as /upload on a worker pool and one
+    JSON line is written as it completes (not in input order), followed by a
+    summary line. A failing document gets an error line; the batch continues.
+    """
+    try:
+        # Get verifier ID from request
+        verifier_id = request.form.get('verifier_id')
+        if not verifier_id:
+            return jsonify({"error": "Verifier ID is required"}), 400
         
-        # Step 4: Determine verification result based on hash check
-        if verification_status == "hash_verified":
-            # Document exists in DB - GUARANTEED AUTHENTIC
-            suspicion_score = 0.0  # Zero suspicion for hash-verified docs
-            status = "verified"
-            verdict = "authentic"
-            analysis_explanation = f"✅ AUTHENTIC: Document hash verified in database. Originally issued by issuer ID: {existing_doc.get('issuer_id')}"
-            
-        elif verification_status == "hash_not_found":
-            # Hash not found - run detailed analysis
-            print(f"🔍 Hash not found - running detailed analysis: {document_url}")
-            doc_analysis = process_document(document_url, ocr_text)
-            suspicion_score = min(0.8, doc_analysis.get('suspicion_score', 0.5) + 0.3)  # Increase suspicion for unknown hash
-            verdict = "hash_not_verified"
-            analysis_explanation = f"Document hash not found in database. Visual analysis: {doc_analysis.get('explanation', 'Document analyzed')}"
-            
-            # Status based on combined analysis
-            if suspicion_score < 0.4:
-                status = "pending_review"  # Even if analysis looks good, hash missing is concerning
-            else:
-                status = "suspicious"
-                
-        else:
-            # Hash generation failed - run analysis only
-            print(f"🔍 Hash generation failed - running visual analysis only: {temp_filepath}")
-            doc_analysis = process_document(temp_filepath, ocr_text)
-            suspicion_score = doc_analysis.get('suspicion_score', 0.5)
-            verdict = doc_analysis.get('verdict', 'requires_review')
-            analysis_explanation = f"Hash verification unavailable. Visual analysis: {doc_analysis.get('explanation', 'Document analyzed')}"
-            
-            # Standard status determination
-            if verdict == "likely_authentic":
-                status = "pending_review"  # Downgrade since no hash verification
-            elif verdict == "requires_review":
-                status = "pending_review"
-            else:
-                status = "suspicious"
+        # Validate verifier exists
+        verifier = get_verifier(mongo, verifier_id)
+        if not verifier:
+            return jsonify({"error": "Verifier not found"}), 404
         
-        # Prepare document data as per verifier model requirements
-        document_data = {
-            "source": document_url,  # Cloudinary URL
-            "status": status,
-            "issuer_id": None,  # Unknown issuer for verifier uploads
-            "verified_by": [ObjectId(verifier_id)],  # Verified by this verifier
-            "issue_time": datetime.utcnow(),
-            "ocr_data": {
-                "extracted_text": ocr_text,
-                "text_length": len(ocr_text),
-                "extraction_method": "tesseract_ocr"
-            },
-            "ai_score": suspicion_score,  # Suspicion score from analysis
-            "metaData": {
-                "original_filename": file.filename,
-                "file_size": cloudinary_result.get("bytes", 0),
-                "upload_method": "verifier_upload",
-                "verifier_name": verifier.get("name", ""),
-                "verifier_institution": verifier.get("institution", ""),
-                "document_type": request.form.get("document_type", "unknown"),
-                "verification_notes": f"Document uploaded for verification with suspicion score: {suspicion_score}",
-                "cloudinary_public_id": public_id,
-                "storage_type": "cloudinary"
-            },
-            "hash": document_hash  # HMAC hash for document integrity
-        }
+        uploads = request.files.getlist('files') + request.files.getlist('file')
+        if not any(upload.filename for upload in uploads):
+            return jsonify({"error": "No files uploaded"}), 400
         
-        # Create document in database
-        doc_id = create_document(mongo, document_data)
+        document_type = request.form.get("document_type", "unknown")
+        short_circuit = request.form.get("short_circuit")
+        if short_circuit is not None:
+            short_circuit = short_circuit.lower() == "true"
+        secret_keys = institute_keys.secret_keys(mongo)
         
-        # Update verifier's documents list
-        mongo.db.verifiers.update_one(
-            {"_id": ObjectId(verifier_id)},
-            {"$push": {"documents": doc_id}}
+    except Exception as e:
+        print(f"❌ Error in batch verification: {str(e)}")
+        return jsonify({
+            "error": "Failed to start batch verification",
+            "details": str(e)
+        }), 500
+    
+    def generate():
+        results = run_batch_verification(
+            iter_bundle_files(uploads), verifier_id, verifier, secret_keys,
+            allowed=allowed_file, document_type=document_type, short_circuit=short_circuit
         )
-        
-        # Clean up temporary file
         try:
-            os.unlink(temp_filepath)
-            print(f"🗑️ Temporary file cleaned up")
+            for result in results:
+                yield json.dumps(result, default=str) + "\n"
         except Exception as e:
-            print(f"⚠️ Failed to clean up temp file: {e}")
-        
-        # Comprehensive response with verification details
-        response_data = {
-            "success": True,
-            "document_id": str(doc_id),
-            "filename": file.filename,
-            "document_url": document_url,  # Cloudinary URL
-            "cloudinary_public_id": public_id,
-            "hash": document_hash,
-            "verification_status": verification_status,
-            "suspicion_score": suspicion_score,
-            "status": status,
-            "verdict": verdict,
-            "analysis": {
-                "explanation": analysis_explanation,
-                "hash_verified": verification_status == "hash_verified",
-                "existing_issuer": str(existing_doc.get('issuer_id')) if existing_doc else None,
-                "ocr_text_preview": ocr_text[:200] + "..." if len(ocr_text) > 200 else ocr_text
-            },
-            "verdict": verdict,
-            "analysis_explanation": analysis_explanation,
-            "upload_timestamp": datetime.utcnow().isoformat(),
-            "ocr_text_preview": ocr_text[:100] + "..." if len(ocr_text) > 100 else ocr_text,
-            "verification_notes": f"Analysis completed: {analysis_explanation}"
-        }
+            # Headers are already sent; report the failure as the last line
+            print(f"❌ Batch verification aborted: {str(e)}")
+            yield json.dumps({"type": "fatal", "error": str(e)}) + "\n"
+    
+    return Response(stream_with_context(generate()), mimetype="application/x-ndjson")
+
+@verifier_bp.route("/jobs/<job_id>", methods=["GET"])
+def get_verification_job(job_id):
+    """
+    Status of an asynchronous verification (upload with async=true)
+    
+    Returns queued/running/succeeded/failed; a succeeded job carries the
+    same result body the synchronous upload returns.
+    """
+    try:
+        job = get_job(mongo, job_id)
+        if not job:
+            return jsonify({"error": "Job not found"}), 404
         
-        print(f"✅ Document uploaded and analyzed by verifier: {doc_id} (Score: {suspicion_score})")
-        return jsonify(response_data), 201
+        return jsonify({
+            "job_id": job_id,
+            "kind": job.get("kind"),
+            "status": job.get("status"),
+            "verifier_id": str(job["verifier_id"]) if job.get("verifier_id") else None,
+            "filename": job.get("filename"),
+            "result": job.get("result"),
+            "error": job.get("error"),
+            "created_at": job.get("created_at"),
+            "started_at": job.get("started_at"),
+            "finished_at": job.get("finished_at")
+        }), 200
         
     except Exception as e:
-        print(f"❌ Error in verifier document upload: {str(e)}")
+        print(f"❌ Error getting verification job: {str(e)}")
         return jsonify({
-            "error": "Failed to upload document",
+            "error": "Failed to retrieve job",
             "details": str(e)
         }), 500
 
 @verifier_bp.route("/documents/<verifier_id>", methods=["GET"])
 def get_verifier_documents(verifier_id):
     """
-    Get all documents analyzed by a specific verifier
+    Get documents analyzed by a specific verifier, newest first
+    
+    Query params: limit (page size, capped at LIST_PAGE_SIZE_MAX) and
+    cursor (next_cursor from the previous page)
     """
     try:
         # Validate verifier exists
@@ -227,8 +245,10 @@ def get_verifier_documents(verifier_id):
         if not verifier:
             return jsonify({"error": "Verifier not found"}), 404
         
-        # Get all documents verified by this verifier
-        documents = list(mongo.db.documents.find({"verified_by": ObjectId(verifier_id)}))
+        # Get one page of documents verified by this verifier (listing fields only)
+        query = {"verified_by": ObjectId(verifier_id)}
+        limit = clamp_page_size(request.args.get("limit"), config.LIST_PAGE_SIZE_DEFAULT, config.LIST_PAGE_SIZE_MAX)
+        documents, next_cursor = list_documents_page(mongo, query, limit, request.args.get("cursor"))
         
         # Format documents for response
         formatted_docs = []
@@ -239,26 +259,31 @@ def get_verifier_documents(verifier_id):
                 "status": doc.get("status", "unknown"),
                 "verification_time": doc.get("issue_time"),
                 "document_type": doc.get("metaData", {}).get("document_type", "unknown"),
-                "ocr_text_preview": doc.get("ocr_data", {}).get("extracted_text", "")[:100] + "...",
+                "ocr_text_preview": doc.get("ocr_preview", "") + "...",
                 "suspicion_score": doc.get("ai_score", 0.0),
                 "verification_method": doc.get("metaData", {}).get("upload_method", "unknown")
             }
             formatted_docs.append(formatted_doc)
         
-        # Categorize documents by status
+        # Categorize all of the verifier's documents by status (maintained counters)
+        summary = get_stats_summary(mongo, f"verifier:{verifier_id}")
+        status_counts = summary["status_summary"]
         status_summary = {
-            "verified": len([d for d in formatted_docs if d["status"] == "verified"]),
-            "pending_review": len([d for d in formatted_docs if d["status"] == "pending_review"]),
-            "suspicious": len([d for d in formatted_docs if d["status"] == "suspicious"])
+            "verified": status_counts.get("verified", 0),
+            "pending_review": status_counts.get("pending_review", 0),
+            "suspicious": status_counts.get("suspicious", 0)
         }
         
         return jsonify({
             "verifier_id": verifier_id,
             "verifier_name": verifier.get("name", ""),
             "institution": verifier.get("institution", ""),
-            "total_documents": len(formatted_docs),
+            "total_documents": summary["total_documents"],
             "status_summary": status_summary,
-            "documents": formatted_docs
+            "documents": formatted_docs,
+            "page_size": limit,
+            "next_cursor": next_cursor,
+            "has_more": next_cursor is not None
         }), 200
         
     except Exception as e:
@@ -268,6 +293,21 @@ def get_verifier_documents(verifier_id):
             "details": str(e)
         }), 500
 
+@verifier_bp.route("/summary/<verifier_id>", methods=["GET"])
+def get_verifier_summary(verifier_id):
+    """
+    Dashboard counts for a verifier, read from the maintained stats document
+    """
+    try:
+        summary = get_stats_summary(mongo, f"verifier:{ObjectId(verifier_id)}")
+        return jsonify({"verifier_id": verifier_id, **summary}), 200
+    except Exception as e:
+        print(f"❌ Error getting verifier summary: {str(e)}")
+        return jsonify({
+            "error": "Failed to retrieve summary",
+            "details": str(e)
+        }), 500
+
 @verifier_bp.route("/verify/<document_id>", methods=["POST"])
 def verify_document_by_id(document_id):
     """
@@ -291,7 +331,7 @@ def verify_document_by_id(document_id):
         
         # Re-analyze document for new suspicion score
         document_path = document.get('source', '')
-        ocr_text = document.get('ocr_data', {}).get('extracted_text', '')
+        ocr_text = load_ocr_text(mongo, document.get('ocr_data'))
         
         if document_path and ocr_text:
             doc_analysis = process_document(document_path, ocr_text)
@@ -300,20 +340,8 @@ def verify_document_by_id(document_id):
             # Fallback if we can't re-analyze
             new_suspicion_score = 0.5
         
-        # Update document with new verifier
-        mongo.db.documents.update_one(
-            {"_id": ObjectId(document_id)},
-            {
-                "$addToSet": {"verified_by": ObjectId(verifier_id)},
-                "$set": {"ai_score": new_suspicion_score}
-            }
-        )
-        
-        # Update verifier's documents list
-        mongo.db.verifiers.update_one(
-            {"_id": ObjectId(verifier_id)},
-            {"$addToSet": {"documents": ObjectId(document_id)}}
-        )
+        # Update document with new verifier (and its stats counters)
+        add_document_verification(mongo, document_id, verifier_id, new_suspicion_score)
         
         return jsonify({
             "message": "Document re-verified successfully",
@@ -351,7 +379,7 @@ def get_document_analysis(document_id):
             "suspicion_score": document.get("ai_score", 0.0),
             "status": document.get("status", "unknown"),
             "analysis_explanation": document.get("metaData", {}).get("verification_notes", "No analysis available"),
-            "ocr_data": document.get("ocr_data", {}).get("extracted_text", ""),
+            "ocr_data": load_ocr_text(mongo, document.get("ocr_data")),  # full text loaded on demand
             "issue_time": document.get("issue_time"),
             "verified_by": len(document.get("verified_by", [])),
             "existing_issuer": str(document.get("issuer_id")) if document.get("issuer_id") else None,
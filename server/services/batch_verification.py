@@ -0,0 +1,116 @@
+import time
+import threading
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from services.ingest import ingest_stream
+from services.verification import run_verification
+from services.metrics import stage, record_run
+import config
+
+_batch_pool = None
+_batch_pool_lock = threading.Lock()
+
+def get_batch_pool():
+    """
+    Get (or lazily create) the thread pool shared by all batch verifications
+
+    Returns:
+        ThreadPoolExecutor: Pool with config.BATCH_WORKERS threads
+    """
+    global _batch_pool
+    with _batch_pool_lock:
+        if _batch_pool is None:
+            _batch_pool = ThreadPoolExecutor(max_workers=max(1, config.BATCH_WORKERS), thread_name_prefix="batch")
+            print(f"⚙️ Batch verification pool started with {config.BATCH_WORKERS} workers")
+        return _batch_pool
+
+def _verify_one(ctx, verifier_id, verifier, document_type, short_circuit):
+    start = time.perf_counter()
+    outcome = "error"
+    try:
+        result = run_verification(ctx, verifier_id, verifier, document_type=document_type,
+                                  short_circuit=short_circuit, pipeline="verifier_batch")
+        outcome = "success"
+        return result
+    finally:
+        ctx.close()
+        record_run("verifier_batch", outcome, time.perf_counter() - start)
+
+def run_batch_verification(files, verifier_id, verifier, secret_keys, allowed=None,
+                           document_type="unknown", short_circuit=None):
+    """
+    Verify many documents concurrently, yielding each result as it finishes
+
+    Documents are read and hashed one at a time in the calling thread and
+    verified on the shared batch pool; at most 2 x BATCH_WORKERS documents
+    are spooled at once. A failing document produces an error entry and
+    the rest of the batch carries on.
+
+    Args:
+        files: (filename, open_stream, error) tuples from services.bundle
+        verifier_id (str): Verifier performing the checks
+        verifier (dict): Verifier record
+        secret_keys (list): Institute HMAC keys to hash with
+        allowed (callable): Filename filter for supported document types
+        document_type (str): Document type applied to every document
+        short_circuit (bool): Reuse issued records on a hash hit
+
+    Yields:
+        dict: One entry per document (completion order), then a summary entry
+    """
+    pool = get_batch_pool()
+    max_in_flight = max(1, config.BATCH_WORKERS) * 2
+    in_flight = {}
+    totals = {"total": 0, "succeeded": 0, "failed": 0}
+    start_time = time.perf_counter()
+
+    def entry(index, filename, result=None, error=None):
+        totals["total"] += 1
+        totals["succeeded" if error is None else "failed"] += 1
+        if error is not None:
+            return {"type": "error", "index": index, "filename": filename, "success": False, "error": error}
+        return {"type": "result", "index": index, "filename": filename, "success": True, "result": result}
+
+    def finished(block):
+        done, _ = wait(in_flight, return_when=FIRST_COMPLETED, timeout=None if block else 0)
+        for future in done:
+            index, filename = in_flight.pop(future)
+            try:
+                yield entry(index, filename, result=future.result())
+            except Exception as e:
+                print(f"❌ Batch document {filename} failed: {str(e)}")
+                yield entry(index, filename, error=getattr(e, "message", None) or str(e))
+
+    for index, (filename, open_stream, error) in enumerate(files):
+        if error is None and allowed is not None and not allowed(filename):
+            error = "Invalid file type"
+        if error is not None:
+            yield entry(index, filename, error=error)
+            continue
+
+        # Keep the number of spooled documents bounded
+        while len(in_flight) >= max_in_flight:
+            yield from finished(block=True)
+
+        try:
+            with stage("verifier_batch", "ingest"), open_stream() as stream:
+                ctx = ingest_stream(stream, filename, secret_keys)
+        except Exception as e:
+            yield entry(index, filename, error=f"Could not read document: {e}")
+            continue
+
+        try:
+            future = pool.submit(_verify_one, ctx, verifier_id, verifier, document_type, short_circuit)
+        except Exception:
+            ctx.close()
+            raise
+        in_flight[future] = (index, filename)
+
+        # Report anything that already finished before reading the next file
+        yield from finished(block=False)
+
+    while in_flight:
+        yield from finished(block=True)
+
+    totals["total_seconds"] = round(time.perf_counter() - start_time, 3)
+    print(f"📦 Batch verification finished: {totals['succeeded']}/{totals['total']} succeeded")
+    yield {"type": "summary", **totals}
@@ -0,0 +1,89 @@
+import os
+import zipfile
+import config
+
+# Helpers that expand a bundle of documents (zip archive, directory or a
+# multipart upload) into (filename, open_stream, error) tuples. Documents
+# are opened one at a time by the consumer; nothing is extracted up front.
+
+def _is_hidden_member(name):
+    parts = name.replace('\\', '/').split('/')
+    return parts[0] == '__MACOSX' or os.path.basename(name).startswith('.')
+
+def iter_zip_members(fileobj):
+    """
+    Documents inside a zip archive
+
+    Args:
+        fileobj: Seekable binary file object (or path) of the archive
+
+    Yields:
+        tuple: (filename, open_stream callable or None, error or None)
+
+    Raises:
+        zipfile.BadZipFile: If fileobj is not a zip archive
+    """
+    archive = zipfile.ZipFile(fileobj)
+    with archive:
+        for info in archive.infolist():
+            if info.is_dir() or _is_hidden_member(info.filename):
+                continue
+            name = os.path.basename(info.filename)
+            if info.file_size > config.MAX_CONTENT_LENGTH:
+                yield name, None, "Document exceeds the maximum file size"
+                continue
+            yield name, (lambda info=info: archive.open(info)), None
+
+def iter_directory_files(path):
+    """
+    Documents in a directory tree (sorted, hidden files skipped)
+
+    Yields:
+        tuple: (filename, open_stream callable, None)
+    """
+    for root, dirs, names in os.walk(path):
+        dirs[:] = sorted(d for d in dirs if not d.startswith('.'))
+        for name in sorted(names):
+            if name.startswith('.'):
+                continue
+            full_path = os.path.join(root, name)
+            yield name, (lambda full_path=full_path: open(full_path, 'rb')), None
+
+def iter_path_files(path):
+    """Documents of a local zip archive or directory (for CLI commands)"""
+    if os.path.isdir(path):
+        return iter_directory_files(path)
+    return iter_zip_members(path)
+
+def iter_bundle_files(uploads, max_files=None):
+    """
+    Expand uploaded files into individual documents
+
+    Zip archives are opened in place; any other upload is a document itself.
+
+    Args:
+        uploads: FileStorage objects from request.files
+        max_files (int): Stop after this many documents (default: config.BATCH_MAX_FILES)
+
+    Yields:
+        tuple: (filename, open_stream callable or None, error or None)
+    """
+    max_files = max_files or config.BATCH_MAX_FILES
+
+    def expand():
+        for upload in uploads:
+            if not upload or not upload.filename:
+                continue
+            if upload.filename.lower().endswith('.zip'):
+                try:
+                    yield from iter_zip_members(upload.stream)
+                except zipfile.BadZipFile as e:
+                    yield upload.filename, None, f"Invalid zip archive: {e}"
+            else:
+                yield upload.filename, (lambda upload=upload: upload.stream), None
+
+    for count, document in enumerate(expand(), 1):
+        if count > max_files:
+            yield document[0], None, f"Batch limit of {max_files} documents exceeded"
+            return
+        yield document
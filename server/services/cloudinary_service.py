@@ -1,8 +1,12 @@
 import cloudinary
 import cloudinary.uploader
 import cloudinary.api
+import cloudinary.exceptions
+import cloudinary.utils
 from werkzeug.utils import secure_filename
 import os
+import requests
+from services.storage import StorageBackend, StorageError, CircuitBreaker, call_with_retry
 import config
 
 # Configure Cloudinary
@@ -12,75 +16,136 @@ cloudinary.config(
     api_secret=config.CLOUDINARY_API_SECRET
 )
 
-def upload_document(file, folder="documents"):
+# Errors caused by the request itself; retrying them cannot help
+_PERMANENT_ERRORS = (
+    cloudinary.exceptions.BadRequest,
+    cloudinary.exceptions.AuthorizationRequired,
+    cloudinary.exceptions.NotAllowed,
+    cloudinary.exceptions.NotFound,
+    cloudinary.exceptions.AlreadyExists
+)
+
+class CloudinaryStorage(StorageBackend):
     """
-    Upload a document to Cloudinary
-    
-    Args:
-        file: File object from Flask request
-        folder: Folder name in Cloudinary (default: 'documents')
+    Cloudinary document storage
     
-    Returns:
-        dict: Contains secure_url, public_id, and other metadata
+    Files above STORAGE_CHUNKED_UPLOAD_MB go up in STORAGE_CHUNK_SIZE chunks
+    (upload_large). Every call has a timeout and is retried with backoff;
+    after repeated failures a circuit breaker fails uploads immediately
+    instead of holding request threads on a slow CDN.
     """
-    try:
-        # Secure the filename
-        filename = secure_filename(file.filename)
-        
-        # Upload to Cloudinary
-        result = cloudinary.uploader.upload(
-            file,
-            folder=folder,
-            resource_type="auto",  # Automatically detect file type
-            public_id=f"{filename}_{os.urandom(8).hex()}",  # Unique identifier
-            overwrite=False,
-            transformation=[
-                {"quality": "auto"},  # Optimize quality
-                {"fetch_format": "auto"}  # Optimize format
-            ]
-        )
+    
+    name = "cloudinary"
+    
+    def __init__(self):
+        self.breaker = CircuitBreaker("Cloudinary", config.STORAGE_BREAKER_FAILURES,
+                                      config.STORAGE_BREAKER_RESET_SECONDS)
+    
+    def _call(self, func, *args, **kwargs):
+        try:
+            return func(*args, **kwargs)
+        except _PERMANENT_ERRORS as e:
+            raise StorageError(str(e), retryable=False)
+    
+    def _upload_once(self, open_stream, options):
+        with open_stream() as stream:
+            stream.seek(0, os.SEEK_END)
+            size = stream.tell()
+            stream.seek(0)
+            if size > config.STORAGE_CHUNKED_UPLOAD_MB * 1024 * 1024:
+                # upload_large closes the stream when done
+                return self._call(cloudinary.uploader.upload_large, stream,
+                                  chunk_size=config.STORAGE_CHUNK_SIZE, **options)
+            return self._call(cloudinary.uploader.upload, stream, **options)
+    
+    def upload(self, open_stream, folder="documents", filename="document"):
+        """
+        Upload a document to Cloudinary
         
-        return {
-            "success": True,
-            "secure_url": result.get("secure_url"),
-            "public_id": result.get("public_id"),
-            "format": result.get("format"),
-            "resource_type": result.get("resource_type"),
-            "bytes": result.get("bytes"),
-            "width": result.get("width"),
-            "height": result.get("height"),
-            "created_at": result.get("created_at")
-        }
+        Args:
+            open_stream: Callable returning a new binary stream of the document
+            folder: Folder name in Cloudinary (default: 'documents')
+            filename: Original filename
         
-    except Exception as e:
-        print(f"❌ Cloudinary upload error: {e}")
-        return {
-            "success": False,
-            "error": str(e)
-        }
-
-def delete_document(public_id):
-    """
-    Delete a document from Cloudinary
+        Returns:
+            dict: Contains secure_url, public_id, and other metadata
+        """
+        try:
+            # Secure the filename
+            filename = secure_filename(filename or "document")
+            
+            # The public id is fixed up front, so a retry after a lost
+            # response finds the same asset instead of creating a second one
+            options = {
+                "folder": folder,
+                "resource_type": "auto",  # Automatically detect file type
+                "public_id": f"{filename}_{os.urandom(8).hex()}",  # Unique identifier
+                "overwrite": False,
+                "timeout": config.STORAGE_TIMEOUT_SECONDS,
+                "transformation": [
+                    {"quality": "auto"},  # Optimize quality
+                    {"fetch_format": "auto"}  # Optimize format
+                ]
+            }
+            result = call_with_retry(lambda: self._upload_once(open_stream, options), self.breaker)
+            
+            return {
+                "success": True,
+                "secure_url": result.get("secure_url"),
+                "public_id": result.get("public_id"),
+                "format": result.get("format"),
+                "resource_type": result.get("resource_type"),
+                "bytes": result.get("bytes"),
+                "width": result.get("width"),
+                "height": result.get("height"),
+                "created_at": result.get("created_at"),
+                "storage": self.name
+            }
+            
+        except Exception as e:
+            print(f"❌ Cloudinary upload error: {e}")
+            return {
+                "success": False,
+                "error": str(e)
+            }
     
-    Args:
-        public_id: The public ID of the document to delete
+    def fetch(self, public_id):
+        def download():
+            response = requests.get(self.url(public_id), timeout=config.STORAGE_TIMEOUT_SECONDS)
+            if 400 <= response.status_code < 500:
+                raise StorageError(f"Cloudinary returned {response.status_code} for {public_id}", retryable=False)
+            response.raise_for_status()
+            return response.content
+        return call_with_retry(download, self.breaker)
     
-    Returns:
-        dict: Success status and result
-    """
-    try:
-        result = cloudinary.uploader.destroy(public_id)
-        return {
-            "success": True,
-            "result": result
-        }
-    except Exception as e:
-        print(f"❌ Cloudinary delete error: {e}")
-        return {
-            "success": False,
-            "error": str(e)
-        }
+    def delete(self, public_id):
+        """
+        Delete a document from Cloudinary
+        
+        Args:
+            public_id: The public ID of the document to delete
+        
+        Returns:
+            dict: Success status and result
+        """
+        try:
+            result = call_with_retry(
+                lambda: self._call(cloudinary.uploader.destroy, public_id, timeout=config.STORAGE_TIMEOUT_SECONDS),
+                self.breaker
+            )
+            return {
+                "success": True,
+                "result": result
+            }
+        except Exception as e:
+            print(f"❌ Cloudinary delete error: {e}")
+            return {
+                "success": False,
+                "error": str(e)
+            }
+    
+    def url(self, public_id):
+        return cloudinary.utils.cloudinary_url(public_id, secure=True)[0]
 
 def get_document_url(public_id, transformation=None):
     """
@@ -6,21 +6,26 @@ import re
 from datetime import datetime
 from typing import Dict, Any, List
 import json
+from services.document_context import DocumentContext
 
 def analyze_image_quality(image_path):
     """
     Simple image quality analysis for tampering detection
     Returns quality metrics that contribute to suspicion score
+    
+    Accepts a file path, URL or DocumentContext; PDFs are analysed on
+    their first page, reusing the raster OCR already produced.
     """
+    ctx = None
     try:
-        # Load image
-        img = cv2.imread(image_path)
-        if img is None:
+        # Load image (grayscale of the first page)
+        ctx = DocumentContext.from_source(image_path)
+        try:
+            gray = ctx.gray_page(0)
+        except Exception as e:
+            print(f"Could not decode document for quality analysis: {e}")
             return {"error": "Could not load image", "quality_score": 0.8}
         
-        # Convert to grayscale for analysis
-        gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
-        
         # 1. Blur Detection (Laplacian variance)
         blur_score = cv2.Laplacian(gray, cv2.CV_64F).var()
         is_blurry = blur_score < 100  # Lower = more blurry
@@ -55,6 +60,11 @@ def analyze_image_quality(image_path):
     except Exception as e:
         print(f"Image quality analysis error: {e}")
         return {"error": str(e), "quality_score": 0.5}
+    
+    finally:
+        # Only close contexts created here; shared ones belong to the route
+        if ctx is not None and ctx is not image_path:
+            ctx.close()
 
 def analyze_text_patterns(ocr_text):
     """
@@ -186,7 +196,7 @@ def process_document(image_path, ocr_text):
         result = calculate_suspicion_score(image_path, ocr_text)
         return {
             "success": True,
-            "image_path": image_path,
+            "image_path": image_path.source if isinstance(image_path, DocumentContext) else image_path,
             "suspicion_score": result['suspicion_score'],
             "verdict": result['verdict'],
             "explanation": result['explanation'],
@@ -0,0 +1,251 @@
+import os
+import io
+import hashlib
+import tempfile
+import cv2
+import fitz  # PyMuPDF
+import numpy as np
+import requests
+from PIL import Image
+from services.storage import get_storage
+import config
+
+class DocumentContext:
+    """
+    One uploaded document, shared by hashing, OCR and visual analysis
+
+    The raw bytes are read once and page rasters / grayscale arrays are
+    produced lazily and memoised, so every stage of a request works from
+    the same decoded data instead of re-reading the file or re-downloading
+    it from its URL.
+
+    Only the pages in retain_pages (page 0 by default, the one visual
+    analysis looks at) keep their rasters after use; other pages are
+    rendered on demand and released so long PDFs stay memory-bounded.
+    """
+
+    def __init__(self, data=None, path=None, filename=None, source=None, retain_pages=(0,)):
+        self._data = data
+        self._path = path
+        self._temp_path = None
+        self.filename = filename or (os.path.basename(path) if path else "document")
+        self.source = source or path or self.filename
+        self.retain_pages = set(retain_pages)
+        self._sha256 = None
+        self._size = None
+        self.hmac_digests = {}   # secret key -> HMAC-SHA512 hex, filled by ingest
+        self.owns_path = False   # True when _path is a spool file this context must delete
+        self._pdf = None
+        self._rasters = {}       # (page_num, dpi) -> PIL RGB image
+        self._gray = {}          # page_num -> uint8 grayscale array
+
+    @classmethod
+    def from_path(cls, path, filename=None):
+        """Context over a local file (read lazily)"""
+        return cls(path=path, filename=filename or os.path.basename(path))
+
+    @classmethod
+    def from_bytes(cls, data, filename):
+        """Context over bytes already in memory"""
+        return cls(data=data, filename=filename)
+
+    @classmethod
+    def from_upload(cls, file):
+        """Context over a Flask/Werkzeug FileStorage"""
+        file.seek(0)
+        return cls(data=file.read(), filename=file.filename)
+
+    @classmethod
+    def from_url(cls, url, timeout=30):
+        """Context over a remote document, downloaded exactly once"""
+        # Documents in the local storage backend are read from disk
+        local_path = get_storage().local_path(url)
+        if local_path:
+            return cls.from_path(local_path)
+        print(f"🌐 Downloading file from URL: {url}")
+        response = requests.get(url, timeout=timeout)
+        response.raise_for_status()
+        filename = os.path.basename(url.split('?')[0]) or "document"
+        return cls(data=response.content, filename=filename, source=url)
+
+    @classmethod
+    def from_source(cls, source):
+        """Context from a path, URL or an existing context (returned as-is)"""
+        if isinstance(source, DocumentContext):
+            return source
+        if source.startswith(('http://', 'https://')):
+            return cls.from_url(source)
+        return cls.from_path(source)
+
+    # --- raw bytes ---------------------------------------------------------
+
+    @property
+    def ext(self):
+        return os.path.splitext(self.filename)[1].lower()
+
+    @property
+    def is_pdf(self):
+        if self.ext == '.pdf':
+            return True
+        return self.header(5) == b'%PDF-'
+
+    def header(self, length):
+        """First bytes of the document, without loading a disk-backed file"""
+        if self._data is not None:
+            return self._data[:length]
+        with open(self._path, 'rb') as file:
+            return file.read(length)
+
+    def open_stream(self):
+        """Binary file object over the document (memory or disk)"""
+        if self._data is not None:
+            return io.BytesIO(self._data)
+        return open(self._path, 'rb')
+
+    @property
+    def data(self):
+        """Raw file bytes (read from disk on first access)"""
+        if self._data is None:
+            with open(self._path, 'rb') as file:
+                self._data = file.read()
+        return self._data
+
+    @property
+    def size(self):
+        if self._size is None:
+            self._size = len(self._data) if self._data is not None else os.path.getsize(self._path)
+        return self._size
+
+    def set_digests(self, sha256=None, hmac_digests=None, size=None):
+        """Record digests computed while the bytes were streamed in"""
+        if sha256:
+            self._sha256 = sha256
+        if hmac_digests:
+            self.hmac_digests.update(hmac_digests)
+        if size is not None:
+            self._size = size
+
+    @property
+    def sha256(self):
+        if self._sha256 is None:
+            digest = hashlib.sha256()
+            with self.open_stream() as stream:
+                for chunk in iter(lambda: stream.read(1024 * 1024), b''):
+                    digest.update(chunk)
+            self._sha256 = digest.hexdigest()
+        return self._sha256
+
+    @property
+    def path(self):
+        """
+        Local file path for consumers that need one (e.g. OCR pool workers)
+
+        In-memory documents are written to a temp file once, removed by close().
+        """
+        if self._path is None:
+            with tempfile.NamedTemporaryFile(delete=False, suffix=self.ext or ".tmp") as temp_file:
+                temp_file.write(self._data)
+                self._temp_path = self._path = temp_file.name
+        return self._path
+
+    # --- rasters -----------------------------------------------------------
+
+    @property
+    def pdf(self):
+        """The PDF opened with PyMuPDF (opened once, closed by close())"""
+        if self._pdf is None:
+            if self._data is not None:
+                self._pdf = fitz.open(stream=self._data, filetype="pdf")
+            else:
+                self._pdf = fitz.open(self._path)
+        return self._pdf
+
+    @property
+    def page_count(self):
+        return self.pdf.page_count if self.is_pdf else 1
+
+    def page_image(self, page_num=0, dpi=None):
+        """
+        RGB raster of a page
+
+        PDF pages are rendered at `dpi` (default config.OCR_DPI); image files
+        are decoded at their native resolution and `dpi` is ignored.
+
+        Returns:
+            PIL.Image: RGB image
+        """
+        if not self.is_pdf:
+            dpi = "native"
+        dpi = dpi or config.OCR_DPI
+        key = (page_num, dpi)
+        if key in self._rasters:
+            return self._rasters[key]
+
+        if self.is_pdf:
+            # Local import: services.ocr imports this module
+            from services.ocr import render_page
+            image = render_page(self.pdf[page_num], dpi)
+        else:
+            with self.open_stream() as stream:
+                image = Image.open(stream)
+                image.load()
+            if image.mode != 'RGB':
+                image = image.convert('RGB')
+
+        if page_num in self.retain_pages:
+            self._rasters[key] = image
+        return image
+
+    def cached_dpis(self, page_num=0):
+        """DPIs at which a page has already been rendered"""
+        return [dpi for (num, dpi) in self._rasters if num == page_num]
+
+    def gray_page(self, page_num=0):
+        """
+        Grayscale uint8 array of a page for OpenCV analysis
+
+        Reuses whichever raster OCR already produced for the page (highest
+        DPI first) rather than rendering it again.
+
+        Returns:
+            numpy.ndarray: 2-D grayscale image
+        """
+        if page_num in self._gray:
+            return self._gray[page_num]
+
+        cached = self.cached_dpis(page_num)
+        if cached:
+            numeric = [dpi for dpi in cached if dpi != "native"]
+            image = self._rasters[(page_num, max(numeric) if numeric else cached[0])]
+        else:
+            image = self.page_image(page_num)
+
+        gray = cv2.cvtColor(np.asarray(image), cv2.COLOR_RGB2GRAY)
+        if page_num in self.retain_pages:
+            self._gray[page_num] = gray
+        return gray
+
+    # --- lifecycle ---------------------------------------------------------
+
+    def close(self):
+        """Drop cached rasters and remove any temp file this context created"""
+        self._rasters.clear()
+        self._gray.clear()
+        if self._pdf is not None:
+            self._pdf.close()
+            self._pdf = None
+        if self.owns_path and self._temp_path is None:
+            self._temp_path = self._path
+        if self._temp_path:
+            if os.path.exists(self._temp_path):
+                try:
+                    os.unlink(self._temp_path)
+                except Exception as e:
+                    print(f"⚠️ Failed to clean up document temp file: {e}")
+            self._temp_path = self._path = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
@@ -0,0 +1,176 @@
+import math
+import hashlib
+import threading
+from datetime import datetime
+import config
+from services.metrics import registry, Counter, CallbackMetric
+from services.index_refresh import IndexRefresher
+
+# Most verifier uploads were never issued. A Bloom filter of all issued hashes
+# answers those lookups in-process: a negative is definite, so the Mongo query
+# on documents.hash is only made for digests the filter might contain.
+
+HASH_FILTER_CHECKS = registry.register(Counter(
+    "docval_hash_filter_checks_total", "Issued-hash lookups answered by the Bloom filter", labels=("result",)
+))
+
+class BloomFilter:
+    """
+    Bloom filter sized for `capacity` items at false-positive rate `fp_rate`
+
+    Uses m = -n ln p / (ln 2)^2 bits and k = (m / n) ln 2 hash functions,
+    derived from one BLAKE2b digest by double hashing.
+    """
+
+    def __init__(self, capacity, fp_rate):
+        self.capacity = max(1, int(capacity))
+        self.fp_rate = fp_rate
+        self.num_bits = max(8, int(math.ceil(-self.capacity * math.log(fp_rate) / (math.log(2) ** 2))))
+        self.num_hashes = max(1, int(round(self.num_bits / self.capacity * math.log(2))))
+        self.count = 0
+        self.bits_set = 0
+        self._bits = bytearray((self.num_bits + 7) // 8)
+        self._lock = threading.Lock()
+
+    def _positions(self, value):
+        digest = hashlib.blake2b(value.encode('utf-8'), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], 'little')
+        h2 = int.from_bytes(digest[8:], 'little') | 1
+        return [(h1 + i * h2) % self.num_bits for i in range(self.num_hashes)]
+
+    def add(self, value):
+        """
+        Add a value; count only grows for values not (apparently) present yet
+
+        Returns:
+            bool: Whether any bit was newly set
+        """
+        positions = self._positions(value)
+        with self._lock:
+            new_bits = 0
+            for position in positions:
+                byte, mask = position >> 3, 1 << (position & 7)
+                if not self._bits[byte] & mask:
+                    self._bits[byte] |= mask
+                    new_bits += 1
+            self.bits_set += new_bits
+            if new_bits:
+                self.count += 1
+            return new_bits > 0
+
+    def __contains__(self, value):
+        bits = self._bits
+        return all(bits[position >> 3] & (1 << (position & 7)) for position in self._positions(value))
+
+    def stats(self):
+        fill_ratio = self.bits_set / self.num_bits
+        return {
+            "items": self.count,
+            "capacity": self.capacity,
+            "bits": self.num_bits,
+            "hashes": self.num_hashes,
+            "memory_bytes": len(self._bits),
+            "fill_ratio": round(fill_ratio, 4),
+            "target_fp_rate": self.fp_rate,
+            "estimated_fp_rate": round(fill_ratio ** self.num_hashes, 6)
+        }
+
+class IssuedHashFilter:
+    """
+    Bloom filter of the hashes of all issued documents
+
+    Built at startup from the hash field of issued records and extended by
+    create_document. Documents issued by other processes (server workers,
+    the bulk-issue CLI) are picked up by re-reading records created since the
+    last refresh. A definite miss is only reported from a filter refreshed
+    within HASH_FILTER_REFRESH_SECONDS (otherwise the lookup waits for a
+    refresh), which bounds how recently another process may have issued a
+    hash the filter misses; 0 refreshes before every miss. Until the first
+    build succeeds every digest is reported as possibly issued.
+    """
+
+    def __init__(self):
+        self._filter = None
+        self._refresher = IndexRefresher("Issued-hash filter", config.HASH_FILTER_REFRESH_SECONDS)
+
+    @property
+    def ready(self):
+        return self._filter is not None
+
+    def build(self, mongo):
+        """
+        Stream every issued hash into a new filter
+
+        Sized for twice the current number of issued documents (at least
+        HASH_FILTER_CAPACITY) at HASH_FILTER_FP_RATE.
+
+        Returns:
+            dict: stats() of the new filter
+        """
+        started_at = datetime.utcnow()
+        query = {"metaData.upload_method": "issuer_upload", "hash": {"$type": "string"}}
+        issued = mongo.db.documents.count_documents(query)
+        bloom = BloomFilter(max(config.HASH_FILTER_CAPACITY, issued * 2), config.HASH_FILTER_FP_RATE)
+        for doc in mongo.db.documents.find(query, {"hash": 1, "_id": 0}).batch_size(10000):
+            bloom.add(doc["hash"])
+        self._filter = bloom
+        self._refresher.mark_built(started_at)
+        stats = bloom.stats()
+        print(f"🌸 Issued-hash filter built: {stats['items']} hashes, {stats['memory_bytes'] / (1024 * 1024):.1f}MB, "
+              f"fill {stats['fill_ratio']:.1%}")
+        return stats
+
+    def add(self, document_hash):
+        if self._filter is not None and document_hash:
+            self._filter.add(document_hash)
+            if self._filter.count == self._filter.capacity + 1:
+                print(f"⚠️ Issued-hash filter is over capacity ({self._filter.capacity}); "
+                      f"false positives will rise until the next restart")
+
+    def _refresh(self, mongo, wait=False):
+        def read(since):
+            cursor = mongo.db.documents.find(
+                {"_id": {"$gte": since}, "metaData.upload_method": "issuer_upload", "hash": {"$type": "string"}},
+                {"hash": 1, "_id": 0}
+            )
+            for doc in cursor:
+                self.add(doc["hash"])
+        return self._refresher.refresh(read, wait=wait)
+
+    def filter_digests(self, mongo, digests):
+        """
+        Digests that may belong to an issued document
+
+        Args:
+            mongo: Database connection
+            digests: Candidate hashes of one document
+
+        Returns:
+            list: The digests the filter cannot rule out (all of them if not
+                  built, or if it is stale and cannot be refreshed)
+        """
+        if self._filter is None:
+            return list(digests)
+        digests = list(digests)
+        candidates = [digest for digest in digests if digest in self._filter]
+        if not candidates and self._refresher.stale:
+            # Only a fresh filter may rule a document out
+            if not self._refresh(mongo, wait=True):
+                return digests
+            candidates = [digest for digest in digests if digest in self._filter]
+        HASH_FILTER_CHECKS.inc(result="maybe" if candidates else "definite_miss")
+        return candidates
+
+    def stats(self):
+        return self._filter.stats() if self._filter is not None else None
+
+issued_hashes = IssuedHashFilter()
+
+registry.register(CallbackMetric(
+    "docval_hash_filter_memory_bytes", "Memory used by the issued-hash Bloom filter", "gauge",
+    lambda: (issued_hashes.stats() or {}).get("memory_bytes", 0)
+))
+registry.register(CallbackMetric(
+    "docval_hash_filter_fill_ratio", "Fraction of Bloom filter bits set", "gauge",
+    lambda: (issued_hashes.stats() or {}).get("fill_ratio", 0)
+))
@@ -1,14 +1,21 @@
 import hashlib
 import hmac
+import time
+import threading
 import requests
-from typing import Union
+from typing import Union, List, Dict
+import config
+from services.document_context import DocumentContext
+from services.metrics import HASHED_BYTES
+from services.hash_filter import issued_hashes
 
-def hash_document(document_path: str, secret_key: str) -> str:
+def hash_document(document_path: Union[str, DocumentContext], secret_key: str) -> str:
     """
     Calculate HMAC-SHA512 hash for a document.
     
     Args:
-        document_path (str): File path or URL to the document
+        document_path (str | DocumentContext): File path or URL to the document,
+            or a DocumentContext whose bytes are already loaded
         secret_key (str): Secret key for HMAC (string format)
     
     Returns:
@@ -18,6 +25,20 @@ def hash_document(document_path: str, secret_key: str) -> str:
         Exception: If file cannot be read or hash cannot be calculated
     """
     try:
+        # Digest already computed while the upload was streamed in
+        if isinstance(document_path, DocumentContext) and secret_key in document_path.hmac_digests:
+            return document_path.hmac_digests[secret_key]
+        
+        # Stream a context's bytes through the HMAC in chunks
+        if isinstance(document_path, DocumentContext):
+            mac = hmac.new(secret_key.encode('utf-8'), digestmod=hashlib.sha512)
+            with document_path.open_stream() as stream:
+                for chunk in iter(lambda: stream.read(1024 * 1024), b''):
+                    mac.update(chunk)
+                    HASHED_BYTES.inc(len(chunk))
+            document_path.hmac_digests[secret_key] = mac.hexdigest()
+            return document_path.hmac_digests[secret_key]
+        
         # Read document content
         if document_path.startswith(('http://', 'https://')):
             # Handle URL
@@ -28,6 +49,7 @@ def hash_document(document_path: str, secret_key: str) -> str:
             # Handle local file
             with open(document_path, 'rb') as file:
                 document_content = file.read()
+        HASHED_BYTES.inc(len(document_content))
         
         # Convert secret key to bytes
         secret_bytes = secret_key.encode('utf-8')
@@ -44,6 +66,141 @@ def hash_document(document_path: str, secret_key: str) -> str:
     except Exception as e:
         raise Exception(f"Error hashing document: {str(e)}")
 
+def hash_document_multi(document: DocumentContext, secret_keys: List[str]) -> Dict[str, str]:
+    """
+    Calculate HMAC-SHA512 hashes for several secret keys in one pass.
+    
+    Digests already computed during ingest are reused; the remaining keys
+    are all updated from the same chunked read of the document.
+    
+    Args:
+        document (DocumentContext): Document to hash
+        secret_keys (list): Secret keys (string format)
+    
+    Returns:
+        dict: secret key -> HMAC-SHA512 hash in hexadecimal format
+    """
+    missing = [key for key in set(secret_keys) if key and key not in document.hmac_digests]
+    if missing:
+        macs = {key: hmac.new(key.encode('utf-8'), digestmod=hashlib.sha512) for key in missing}
+        with document.open_stream() as stream:
+            for chunk in iter(lambda: stream.read(1024 * 1024), b''):
+                for mac in macs.values():
+                    mac.update(chunk)
+                HASHED_BYTES.inc(len(chunk))
+        document.hmac_digests.update({key: mac.hexdigest() for key, mac in macs.items()})
+    return {key: document.hmac_digests[key] for key in secret_keys if key}
+
+class InstituteKeyRing:
+    """
+    Cached view of every institute's HMAC secret key
+    
+    Keys are loaded with one projected query and reused for ttl_seconds, so
+    verifying against all institutes costs no extra Mongo round trips per
+    upload. The default key is always included so documents hashed before
+    per-institute keys existed still verify.
+    """
+    
+    def __init__(self, default_secret, ttl_seconds=300):
+        self.default_secret = default_secret
+        self.ttl_seconds = ttl_seconds
+        self._entries = None
+        self._loaded_at = 0.0
+        self._lock = threading.Lock()
+    
+    def entries(self, mongo):
+        """
+        Get all institute keys
+        
+        Returns:
+            list: [{"institute_id", "name", "secret_key"}, ...], default key last
+        """
+        with self._lock:
+            if self._entries is None or time.monotonic() - self._loaded_at > self.ttl_seconds:
+                institutes = mongo.db.institutes.find(
+                    {"secret_key": {"$nin": [None, ""]}},
+                    {"name": 1, "secret_key": 1}
+                )
+                entries = [
+                    {"institute_id": str(inst["_id"]), "name": inst.get("name"), "secret_key": inst["secret_key"]}
+                    for inst in institutes
+                ]
+                entries.append({"institute_id": None, "name": "default", "secret_key": self.default_secret})
+                self._entries = entries
+                self._loaded_at = time.monotonic()
+                print(f"🔑 Loaded {len(entries)} institute HMAC keys")
+            return list(self._entries)
+    
+    def secret_keys(self, mongo):
+        """All distinct secret keys, for single-pass multi-key hashing"""
+        return list(dict.fromkeys(entry["secret_key"] for entry in self.entries(mongo)))
+    
+    def secret_for(self, mongo, institute_name):
+        """Secret key of an institute by name, or the default key"""
+        for entry in self.entries(mongo):
+            if entry["name"] == institute_name and entry["institute_id"]:
+                return entry["secret_key"]
+        return self.default_secret
+    
+    def invalidate(self):
+        """Force a reload on next use (call after registering an institute)"""
+        with self._lock:
+            self._entries = None
+
+institute_keys = InstituteKeyRing(config.DEFAULT_INSTITUTE_SECRET, config.INSTITUTE_KEYS_TTL)
+
+def find_issued_by_digests(mongo, document: DocumentContext, key_ring: InstituteKeyRing = institute_keys):
+    """
+    Check a document against every registered institute key at once
+    
+    All HMACs come from one pass over the bytes (usually done at ingest),
+    and the digests the issued-hash filter cannot rule out are resolved
+    with a single $in query (none at all for a definite miss).
+    
+    Args:
+        mongo: Database connection
+        document (DocumentContext): Uploaded document
+        key_ring (InstituteKeyRing): Source of institute keys
+    
+    Returns:
+        tuple: (matching document or None, matched key entry or None,
+                dict of secret key -> digest)
+    """
+    entries = key_ring.entries(mongo)
+    digests = hash_document_multi(document, [entry["secret_key"] for entry in entries])
+    candidates = issued_hashes.filter_digests(mongo, set(digests.values()))
+    if not candidates:
+        return None, None, digests
+    
+    # Only issued records count as a match (verifier uploads store hashes too);
+    # this shape is served by the issued_hash_unique partial index
+    existing_doc = mongo.db.documents.find_one({
+        "hash": {"$in": candidates},
+        "metaData.upload_method": "issuer_upload"
+    })
+    if not existing_doc:
+        return None, None, digests
+    
+    matched = next(
+        (entry for entry in entries if digests.get(entry["secret_key"]) == existing_doc["hash"]),
+        None
+    )
+    return existing_doc, matched, digests
+
+def find_issued_document(mongo, document_hash):
+    """
+    Issued record with exactly this hash (served by the issued_hash_unique index)
+    
+    Returns:
+        dict: {"_id"} of the issued document, or None
+    """
+    if not document_hash or not issued_hashes.filter_digests(mongo, [document_hash]):
+        return None
+    return mongo.db.documents.find_one(
+        {"hash": document_hash, "metaData.upload_method": "issuer_upload"},
+        {"_id": 1}
+    )
+
 # Usage examples:
 if __name__ == "__main__":
     # Example 1: Local file
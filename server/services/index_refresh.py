@@ -0,0 +1,68 @@
+import time
+import threading
+from datetime import datetime, timedelta
+from bson import ObjectId
+
+# The in-process indexes over issued documents (hash filter, perceptual and
+# text indexes) are extended by the process that issues a document. Records
+# written by other processes (server workers, the bulk-issue CLI) are picked
+# up by re-reading the _id range created since the last pass.
+
+class IndexRefresher:
+    """
+    Periodic catch-up of an in-process index with records issued elsewhere
+
+    ObjectIds embed their creation second, so "created since" is an _id
+    range served by the _id index. The range starts a margin before the last
+    pass to cover clock skew between hosts; the reader must therefore ignore
+    records the index already holds.
+    """
+
+    MARGIN = timedelta(seconds=60)
+
+    def __init__(self, name, interval):
+        self.name = name
+        self.interval = interval
+        self._since = None
+        self._last_check = 0.0
+        self._lock = threading.Lock()
+
+    def mark_built(self, started_at):
+        """Record a full build that read every record created before started_at"""
+        self._since = started_at
+        self._last_check = time.monotonic()
+
+    @property
+    def stale(self):
+        """Whether a pass is due (the last one is over `interval` seconds old)"""
+        return self._since is not None and time.monotonic() - self._last_check >= self.interval
+
+    def refresh(self, read, wait=False):
+        """
+        Re-read recently created records, at most every `interval` seconds
+
+        Args:
+            read: Callable taking the lowest ObjectId to re-read
+            wait (bool): Wait for a pass another thread is running (and run
+                         one if it is still due) instead of skipping
+
+        Returns:
+            bool: False if a due pass was skipped or failed
+        """
+        if not self.stale:
+            return True
+        if not self._lock.acquire(blocking=wait):
+            return False
+        try:
+            if not self.stale:
+                return True  # another thread's pass finished while waiting
+            started_at = datetime.utcnow()
+            read(ObjectId.from_datetime(self._since - self.MARGIN))
+            # Fresh only once the pass is complete, so nobody trusts it midway
+            self._since, self._last_check = started_at, time.monotonic()
+            return True
+        except Exception as e:
+            print(f"⚠️ {self.name} refresh failed: {e}")
+            return False
+        finally:
+            self._lock.release()
@@ -0,0 +1,88 @@
+import io
+import os
+import hmac
+import hashlib
+import tempfile
+import config
+from services.document_context import DocumentContext
+from services.metrics import HASHED_BYTES
+
+def ingest_stream(stream, filename, secret_keys=(), chunk_size=None, spool_max_bytes=None):
+    """
+    Read an upload once: spool it and hash it in the same pass
+
+    Chunks are written to memory until spool_max_bytes is exceeded, after
+    which the spool moves to a temp file on disk. Every chunk also updates
+    a plain SHA-256 and one HMAC-SHA512 per secret key, so the document is
+    never held fully in memory nor read a second time just to hash it.
+
+    Args:
+        stream: Readable binary stream (e.g. FileStorage.stream)
+        filename (str): Original filename (used for the type and temp suffix)
+        secret_keys (iterable): HMAC secret keys (strings) to digest with
+        chunk_size (int): Bytes per read (default: config.INGEST_CHUNK_SIZE)
+        spool_max_bytes (int): In-memory limit (default: config.INGEST_SPOOL_MAX_BYTES)
+
+    Returns:
+        DocumentContext: Context with sha256 and hmac_digests already filled in
+    """
+    chunk_size = chunk_size or config.INGEST_CHUNK_SIZE
+    spool_max_bytes = config.INGEST_SPOOL_MAX_BYTES if spool_max_bytes is None else spool_max_bytes
+
+    sha256 = hashlib.sha256()
+    macs = {key: hmac.new(key.encode('utf-8'), digestmod=hashlib.sha512) for key in set(secret_keys) if key}
+
+    buffer = io.BytesIO()
+    spool_file = None
+    size = 0
+    try:
+        for chunk in iter(lambda: stream.read(chunk_size), b''):
+            size += len(chunk)
+            sha256.update(chunk)
+            for mac in macs.values():
+                mac.update(chunk)
+
+            if spool_file is None and size > spool_max_bytes:
+                # Too big for memory: roll the spool over to disk
+                suffix = os.path.splitext(filename or '')[1].lower() or ".tmp"
+                spool_file = tempfile.NamedTemporaryFile(delete=False, suffix=suffix)
+                spool_file.write(buffer.getbuffer())
+                buffer = None
+            (spool_file or buffer).write(chunk)
+    except Exception:
+        if spool_file is not None:
+            spool_file.close()
+            os.unlink(spool_file.name)
+        raise
+
+    if spool_file is not None:
+        spool_file.close()
+        ctx = DocumentContext(path=spool_file.name, filename=filename)
+        ctx.owns_path = True
+        print(f"📥 Ingested {size} bytes (spooled to disk)")
+    else:
+        ctx = DocumentContext(data=buffer.getvalue(), filename=filename)
+        print(f"📥 Ingested {size} bytes (in memory)")
+
+    HASHED_BYTES.inc(size)
+    ctx.set_digests(
+        sha256=sha256.hexdigest(),
+        hmac_digests={key: mac.hexdigest() for key, mac in macs.items()},
+        size=size
+    )
+    return ctx
+
+def ingest_upload(file, secret_keys=(), spool_max_bytes=None):
+    """
+    Streaming ingest of a Flask/Werkzeug FileStorage
+
+    Args:
+        file: FileStorage from request.files
+        secret_keys (iterable): HMAC secret keys to digest with
+        spool_max_bytes (int): In-memory limit (0 always spools to disk)
+
+    Returns:
+        DocumentContext: Spooled, pre-hashed document
+    """
+    file.stream.seek(0)
+    return ingest_stream(file.stream, file.filename, secret_keys, spool_max_bytes=spool_max_bytes)
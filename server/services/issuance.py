@@ -0,0 +1,340 @@
+import io
+import csv
+import time
+import threading
+from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor
+from bson import ObjectId
+from models.document_model import create_documents
+from models.ocr_profile_model import get_ocr_profile
+from services.ocr import ocr_document
+from services.hmac_hash import hash_document, institute_keys
+from services.storage import get_storage
+from services.ingest import ingest_stream
+from services.metrics import stage, record_run
+from services.perceptual_hash import fingerprint_document, perceptual_index
+from services.text_similarity import sign_text, text_index
+from services.hash_filter import issued_hashes
+from database import mongo
+import config
+
+def build_issued_record(issuer_id, issuer, filename, upload_result, ocr_result, ocr_profile,
+                        document_hash, institute_secret, document_type, extra_metadata=None,
+                        perceptual_hashes=None, text_minhash=None):
+    """
+    Document record for an issuer upload (single or bulk)
+
+    Args:
+        issuer_id (str): Issuing account
+        issuer (dict): Issuer record (name, institution)
+        filename (str): Original filename
+        upload_result (dict): Successful StorageBackend.upload() result
+        ocr_result (dict): ocr_document() result
+        ocr_profile (dict): OCR profile used, or None
+        document_hash (str): HMAC of the file with institute_secret
+        institute_secret (str): Key the hash was computed with
+        document_type (str): Document type
+        extra_metadata (dict): Additional metaData fields (e.g. manifest columns)
+        perceptual_hashes (list): page_fingerprints() of the document
+        text_minhash: sign_issued_text() of the document
+
+    Returns:
+        dict: Data for create_document / create_documents
+    """
+    ocr_text = ocr_result["text"]
+    return {
+        "source": upload_result["secure_url"],  # Storage URL
+        "status": "verified",  # Issuer documents are pre-verified
+        "issuer_id": ObjectId(issuer_id),
+        "verified_by": [ObjectId(issuer_id)],  # Self-verified by issuer
+        "issue_time": datetime.utcnow(),
+        "ocr_data": {
+            "extracted_text": ocr_text,
+            "text_length": len(ocr_text),
+            "extraction_method": ocr_result["extraction_method"],
+            "fields": ocr_result.get("fields"),
+            "text_scope": ocr_result.get("text_scope", "full"),  # "regions": only the profile's fields were read
+            "error": ocr_result.get("error"),  # OCR failed: no text stored
+            "ocr_profile_id": ocr_profile["_id"] if ocr_profile else None
+        },
+        "ai_score": 0.0,  # Suspicion score = 0 for issuer uploads
+        "metaData": {
+            "original_filename": filename,
+            "file_size": upload_result.get("bytes", 0),
+            "upload_method": "issuer_upload",
+            "issuer_name": issuer.get("name", ""),
+            "issuer_institution": issuer.get("institution", ""),
+            "hmac_key": "default" if institute_secret == config.DEFAULT_INSTITUTE_SECRET else issuer.get("institution"),
+            "document_type": document_type,
+            "cloudinary_public_id": upload_result["public_id"],  # storage public id (any backend)
+            "storage_type": upload_result["storage"],
+            **(extra_metadata or {})
+        },
+        "hash": document_hash,  # HMAC hash for document integrity
+        "perceptual_hashes": perceptual_hashes or [],
+        "text_minhash": text_minhash  # fuzzy text matching
+    }
+
+def sign_issued_text(ctx, ocr_result, pipeline):
+    """
+    text_minhash of an issued document, over full-page text like the verifier's
+
+    Profile OCR of a scan only reads the field regions, so such documents get
+    one full-page OCR pass for the signature; it is cached by file bytes, so
+    a verifier later presenting the same file does not pay for it again.
+
+    Args:
+        ctx (DocumentContext): The issued document
+        ocr_result (dict): ocr_document() result of the issuance
+        pipeline (str): Label for the stage timing metrics
+
+    Returns:
+        Binary: Encoded signature, or None
+    """
+    if not config.MINHASH_ENABLED or ocr_result.get("error"):
+        return None
+    text = ocr_result["text"]
+    if ocr_result.get("text_scope") == "regions":
+        with stage(pipeline, "signature_ocr"):
+            full_page = ocr_document(ctx)
+        if full_page.get("error"):
+            return None
+        text = full_page["text"]
+    return sign_text(text)
+
+def load_manifest(stream):
+    """
+    Parse a bulk issuance CSV manifest
+
+    The manifest needs a "filename" column; "document_type" is optional and
+    every other column is stored under metaData.manifest of the record.
+
+    Args:
+        stream: Binary file object of the CSV
+
+    Returns:
+        dict: filename -> {column: value} (filename column removed)
+
+    Raises:
+        ValueError: If the manifest has no filename column
+    """
+    reader = csv.DictReader(io.TextIOWrapper(stream, encoding='utf-8-sig', newline=''))
+    if not reader.fieldnames or "filename" not in [name.strip() for name in reader.fieldnames]:
+        raise ValueError("Manifest must have a 'filename' column")
+
+    manifest = {}
+    for row in reader:
+        row = {(key or "").strip(): (value or "").strip() for key, value in row.items() if key}
+        filename = row.pop("filename", "")
+        if filename:
+            manifest[filename.replace('\\', '/').rsplit('/', 1)[-1]] = row
+    return manifest
+
+def _chunks(iterable, size):
+    chunk = []
+    for item in iterable:
+        chunk.append(item)
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+class BulkIssuance:
+    """
+    One bulk issuance run: many files plus a manifest for one issuer
+
+    Files are processed in chunks of BULK_INSERT_BATCH_SIZE:
+      1. read and HMAC-hashed in parallel
+      2. hashes already issued (by an earlier, possibly failed, run) are
+         skipped with one $in query, so re-running a run resumes it
+      3. OCR and storage upload run in parallel, uploads limited to
+         BULK_UPLOAD_CONCURRENCY at a time
+      4. records are written with one insert_many per chunk; a hash that
+         was issued concurrently is rejected by the unique index and its
+         upload removed again
+    """
+
+    def __init__(self, issuer_id, issuer, manifest, allowed=None):
+        self.issuer_id = issuer_id
+        self.issuer = issuer
+        self.manifest = manifest
+        self.allowed = allowed
+        self.institute_secret = institute_keys.secret_for(mongo, issuer.get("institution"))
+        self.upload_slots = threading.BoundedSemaphore(max(1, config.BULK_UPLOAD_CONCURRENCY))
+        self.profiles = {}
+        self.seen_hashes = {}
+        self.items = []
+
+    def run(self, files):
+        """
+        Issue every document of a bundle
+
+        Args:
+            files: (filename, open_stream, error) tuples from services.bundle
+
+        Returns:
+            dict: Counts per outcome, timing and one entry per file
+        """
+        start_time = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=max(1, config.BULK_ISSUE_WORKERS), thread_name_prefix="issue") as pool:
+            for chunk in _chunks(files, max(1, config.BULK_INSERT_BATCH_SIZE)):
+                self._run_chunk(pool, chunk)
+
+        # Manifest rows without a matching file
+        listed = {item["filename"] for item in self.items}
+        for filename in self.manifest:
+            if filename not in listed:
+                self.items.append({"filename": filename, "status": "failed", "error": "File missing from bundle"})
+
+        summary = {status: 0 for status in ("issued", "already_issued", "duplicate", "failed")}
+        for item in self.items:
+            summary[item["status"]] += 1
+        summary["total_seconds"] = round(time.perf_counter() - start_time, 3)
+        record_run("bulk_issue", "success" if not summary["failed"] else "partial", summary["total_seconds"])
+        print(f"📦 Bulk issuance finished: {summary['issued']} issued, {summary['already_issued']} already issued, "
+              f"{summary['failed']} failed")
+        return {"summary": summary, "items": self.items}
+
+    def _run_chunk(self, pool, chunk):
+        items = []
+        for filename, open_stream, error in chunk:
+            item = {"filename": filename, "status": None, "document_id": None, "hash": None, "error": error}
+            if error is None and self.allowed is not None and not self.allowed(filename):
+                item["error"] = "Invalid file type"
+            elif error is None and filename not in self.manifest:
+                item["error"] = "Not listed in the manifest"
+            if item["error"]:
+                item["status"] = "failed"
+            self.items.append(item)
+            items.append((item, open_stream))
+
+        pending = [(item, open_stream) for item, open_stream in items if item["status"] is None]
+        try:
+            # 1. Read and hash in parallel
+            list(pool.map(lambda pair: self._ingest(*pair), pending))
+            pending = [item for item, _ in pending if item["status"] is None]
+
+            # 2. Resume: skip hashes issued before
+            hashes = issued_hashes.filter_digests(mongo, [item["hash"] for item in pending])
+            with stage("bulk_issue", "hash_lookup"):
+                issued = {
+                    doc["hash"]: doc["_id"] for doc in mongo.db.documents.find(
+                        {"hash": {"$in": hashes}, "metaData.upload_method": "issuer_upload"},
+                        {"hash": 1}
+                    )
+                } if hashes else {}
+            fresh = []
+            for item in pending:
+                if item["hash"] in issued:
+                    item.update(status="already_issued", document_id=str(issued[item["hash"]]))
+                elif item["hash"] in self.seen_hashes:
+                    item.update(status="duplicate", error=f"Same content as {self.seen_hashes[item['hash']]}")
+                else:
+                    self.seen_hashes[item["hash"]] = item["filename"]
+                    fresh.append(item)
+
+            # 3. OCR and upload in parallel
+            records = list(pool.map(self._prepare, fresh))
+            prepared = [(item, record) for item, record in zip(fresh, records) if record is not None]
+
+            # 4. One insert_many for the chunk
+            try:
+                with stage("bulk_issue", "db_write"):
+                    ids, errors = create_documents(mongo, [record for _, record in prepared])
+            except Exception as e:
+                print(f"❌ Bulk insert failed: {e}")
+                ids, errors = self._written_after_failure(prepared, e)
+            for index, ((item, record), doc_id) in enumerate(zip(prepared, ids)):
+                if doc_id is not None:
+                    item.update(status="issued", document_id=str(doc_id))
+                    perceptual_index.add(doc_id, record["perceptual_hashes"])
+                    text_index.add(doc_id, record["text_minhash"])
+                    continue
+                # Not recorded: remove the orphaned upload
+                get_storage().delete(record["metaData"]["cloudinary_public_id"])
+                if errors[index]["code"] == 11000:
+                    item.update(status="already_issued", error=None)
+                else:
+                    item.update(status="failed", error=errors[index]["message"])
+        finally:
+            for item, _ in items:
+                ctx = item.pop("_ctx", None)
+                if ctx is not None:
+                    ctx.close()
+
+    def _written_after_failure(self, prepared, error):
+        """
+        Which records of a failed insert_many were written anyway
+
+        An unordered insert interrupted by e.g. AutoReconnect may have stored
+        part of the chunk, so the records are looked up by hash (and upload).
+        If that lookup fails too, every item is marked failed and the uploads
+        are kept: a record might point at them, and a re-run resumes. Stats
+        of records written this way are reconciled by flask db rebuild-stats.
+
+        Returns:
+            tuple: (ids, errors) shaped like create_documents(); ([], {}) when unknown
+        """
+        message = f"Database write failed: {error}"
+        try:
+            written = {
+                doc["metaData"]["cloudinary_public_id"]: doc["_id"] for doc in mongo.db.documents.find(
+                    {"hash": {"$in": [record["hash"] for _, record in prepared]},
+                     "metaData.upload_method": "issuer_upload"},
+                    {"metaData.cloudinary_public_id": 1}
+                )
+            }
+        except Exception as e:
+            print(f"⚠️ Could not check which records were written ({e}); keeping their uploads")
+            for item, _ in prepared:
+                item.update(status="failed", error=message)
+            return [], {}
+        ids = [written.get(record["metaData"]["cloudinary_public_id"]) for _, record in prepared]
+        return ids, {index: {"code": None, "message": message} for index, doc_id in enumerate(ids) if doc_id is None}
+
+    def _ingest(self, item, open_stream):
+        try:
+            with stage("bulk_issue", "ingest"), open_stream() as stream:
+                ctx = ingest_stream(stream, item["filename"], [self.institute_secret])
+            item["hash"] = hash_document(ctx, self.institute_secret)
+            item["_ctx"] = ctx
+        except Exception as e:
+            print(f"❌ Bulk issuance could not read {item['filename']}: {str(e)}")
+            item.update(status="failed", error=f"Could not read document: {e}")
+
+    def _profile(self, document_type):
+        if document_type not in self.profiles:
+            self.profiles[document_type] = get_ocr_profile(mongo, self.issuer.get("institution"), document_type)
+        return self.profiles[document_type]
+
+    def _prepare(self, item):
+        ctx = item["_ctx"]
+        try:
+            row = self.manifest[item["filename"]]
+            document_type = row.get("document_type") or "certificate"
+            ocr_profile = self._profile(document_type)
+            with stage("bulk_issue", "ocr"):
+                ocr_result = ocr_document(ctx, profile=ocr_profile)
+            with stage("bulk_issue", "perceptual_hash"):
+                fingerprints = fingerprint_document(ctx)
+            text_minhash = sign_issued_text(ctx, ocr_result, "bulk_issue")
+
+            with self.upload_slots:
+                with stage("bulk_issue", "storage_upload"):
+                    upload_result = get_storage().upload(ctx.open_stream, folder=f"issuers/{self.issuer_id}",
+                                                         filename=item["filename"])
+            if not upload_result["success"]:
+                raise RuntimeError(f"Failed to upload document to cloud storage: {upload_result['error']}")
+
+            manifest_fields = {key: value for key, value in row.items() if key != "document_type"}
+            return build_issued_record(
+                self.issuer_id, self.issuer, item["filename"], upload_result, ocr_result, ocr_profile,
+                item["hash"], self.institute_secret, document_type,
+                extra_metadata={"manifest": manifest_fields, "bulk_issuance": True},
+                perceptual_hashes=fingerprints, text_minhash=text_minhash
+            )
+        except Exception as e:
+            print(f"❌ Bulk issuance failed for {item['filename']}: {str(e)}")
+            item.update(status="failed", error=str(e))
+            return None
@@ -0,0 +1,77 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from models.job_model import mark_job_running, complete_job, fail_job
+from database import mongo
+import config
+
+class JobQueue:
+    """
+    In-process background job queue with a bounded backlog
+
+    Jobs run on a small thread pool (the heavy OCR work already fans out
+    to the OCR process pool) and their state and result are written to the
+    jobs collection. At most max_pending jobs may be queued or running;
+    submit() refuses more so a burst of uploads cannot grow the backlog,
+    and the spooled files it holds, without limit.
+
+    Jobs live in this process only: queued work is lost on restart.
+    """
+
+    def __init__(self, workers, max_pending, name="jobs"):
+        self.workers = max(1, workers)
+        self.max_pending = max(1, max_pending)
+        self.name = name
+        self._slots = threading.BoundedSemaphore(self.max_pending)
+        self._executor = None
+        self._lock = threading.Lock()
+
+    def _get_executor(self):
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix=self.name)
+                print(f"⚙️ {self.name} queue started with {self.workers} workers")
+            return self._executor
+
+    def submit(self, job_id, func, *args, cleanup=None, **kwargs):
+        """
+        Queue func(*args, **kwargs) as job job_id
+
+        Args:
+            job_id: ID of the job record (see models.job_model.create_job)
+            func: Callable returning a JSON-serialisable result
+            cleanup: Optional callable run after the job, whatever the outcome
+
+        Returns:
+            bool: False if the backlog is full (the job was not queued)
+        """
+        if not self._slots.acquire(blocking=False):
+            return False
+        try:
+            self._get_executor().submit(self._run, job_id, func, args, kwargs, cleanup)
+        except Exception:
+            self._slots.release()
+            raise
+        return True
+
+    def _run(self, job_id, func, args, kwargs, cleanup):
+        try:
+            mark_job_running(mongo, job_id)
+            result = func(*args, **kwargs)
+            complete_job(mongo, job_id, result)
+            print(f"✅ Job {job_id} succeeded")
+        except Exception as e:
+            print(f"❌ Job {job_id} failed: {str(e)}")
+            fail_job(mongo, job_id, {
+                "error": getattr(e, "message", "Job failed"),
+                "details": getattr(e, "details", None) or str(e)
+            })
+        finally:
+            if cleanup is not None:
+                try:
+                    cleanup()
+                except Exception as e:
+                    print(f"⚠️ Job {job_id} cleanup failed: {e}")
+            self._slots.release()
+
+# Shared queue for asynchronous verifier uploads
+verification_jobs = JobQueue(config.VERIFY_JOB_WORKERS, config.VERIFY_JOB_MAX_PENDING, name="verification")
@@ -0,0 +1,175 @@
+import time
+import threading
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+# Minimal in-process metrics in the Prometheus text exposition format.
+# Values are per process: with several server workers each one reports its
+# own series, so scrape each worker (or aggregate by instance).
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+def _format_labels(labels):
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in labels) + "}"
+
+def _format_value(value):
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+class Counter:
+    """Monotonic counter with optional labels"""
+
+    type = "counter"
+
+    def __init__(self, name, help_text, labels=()):
+        self.name = name
+        self.help = help_text
+        self.label_names = tuple(labels)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1, **labels):
+        key = tuple((name, labels.get(name, "")) for name in self.label_names)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def samples(self):
+        with self._lock:
+            return [(self.name, key, value) for key, value in self._values.items()]
+
+class Histogram:
+    """Latency histogram (cumulative buckets, sum and count) with optional labels"""
+
+    type = "histogram"
+
+    def __init__(self, name, help_text, labels=(), buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.help = help_text
+        self.label_names = tuple(labels)
+        self.buckets = tuple(sorted(buckets))
+        self._series = {}   # label key -> [bucket counts..., sum, count]
+        self._lock = threading.Lock()
+
+    def observe(self, value, **labels):
+        key = tuple((name, labels.get(name, "")) for name in self.label_names)
+        with self._lock:
+            series = self._series.setdefault(key, [0] * len(self.buckets) + [0.0, 0])
+            for index, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series[index] += 1
+            series[-2] += value
+            series[-1] += 1
+
+    def samples(self):
+        samples = []
+        with self._lock:
+            for key, series in self._series.items():
+                for bound, count in zip(self.buckets, series):
+                    samples.append((f"{self.name}_bucket", key + (("le", _format_value(float(bound))),), count))
+                samples.append((f"{self.name}_bucket", key + (("le", "+Inf"),), series[-1]))
+                samples.append((f"{self.name}_sum", key, round(series[-2], 6)))
+                samples.append((f"{self.name}_count", key, series[-1]))
+        return samples
+
+class CallbackMetric:
+    """Counter or gauge whose value is read from a callable at scrape time"""
+
+    def __init__(self, name, help_text, metric_type, callback):
+        self.name = name
+        self.help = help_text
+        self.type = metric_type
+        self.callback = callback
+
+    def samples(self):
+        value = self.callback()
+        if isinstance(value, dict):
+            return [(self.name, tuple(sorted(labels)), amount) for labels, amount in value.items()]
+        return [(self.name, (), value)]
+
+class MetricsRegistry:
+    def __init__(self):
+        self._metrics = []
+        self._lock = threading.Lock()
+
+    def register(self, metric):
+        with self._lock:
+            self._metrics.append(metric)
+        return metric
+
+    def render(self):
+        """All metrics in the Prometheus text format (version 0.0.4)"""
+        lines = []
+        with self._lock:
+            metrics = list(self._metrics)
+        for metric in metrics:
+            try:
+                samples = metric.samples()
+            except Exception as e:
+                print(f"⚠️ Metric {metric.name} could not be collected: {e}")
+                continue
+            lines.append(f"# HELP {metric.name} {metric.help}")
+            lines.append(f"# TYPE {metric.name} {metric.type}")
+            for name, labels, value in samples:
+                lines.append(f"{name}{_format_labels(labels)} {_format_value(value)}")
+        return "\n".join(lines) + "\n"
+
+registry = MetricsRegistry()
+
+STAGE_SECONDS = registry.register(Histogram(
+    "docval_stage_seconds", "Duration of each upload pipeline stage", labels=("pipeline", "stage")
+))
+PIPELINE_RUNS = registry.register(Counter(
+    "docval_pipeline_runs_total", "Upload pipeline runs by outcome", labels=("pipeline", "outcome")
+))
+OCR_PAGES = registry.register(Counter(
+    "docval_ocr_pages_total", "Pages run through text extraction, by method", labels=("method",)
+))
+HASHED_BYTES = registry.register(Counter(
+    "docval_hashed_bytes_total", "Document bytes read for hashing"
+))
+
+# Per-request stage breakdown (started by start_breakdown(), filled by stage())
+_breakdown = ContextVar("stage_breakdown", default=None)
+
+@contextmanager
+def stage(pipeline, name):
+    """
+    Time one pipeline stage
+
+    The duration goes to the docval_stage_seconds histogram and, between
+    start_breakdown() and stop_breakdown(), to the request's breakdown.
+    """
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        seconds = time.perf_counter() - start
+        STAGE_SECONDS.observe(seconds, pipeline=pipeline, stage=name)
+        breakdown = _breakdown.get()
+        if breakdown is not None:
+            breakdown[name] = round(breakdown.get(name, 0.0) + seconds, 4)
+
+def start_breakdown():
+    """
+    Start collecting the stage timings of the current request
+
+    Returns:
+        tuple: (breakdown dict, token for stop_breakdown())
+    """
+    breakdown = {}
+    return breakdown, _breakdown.set(breakdown)
+
+def stop_breakdown(token):
+    """Stop collecting (server threads are reused across requests)"""
+    _breakdown.reset(token)
+
+def record_run(pipeline, outcome, seconds):
+    """Count a finished pipeline run and record its total duration"""
+    PIPELINE_RUNS.inc(pipeline=pipeline, outcome=outcome)
+    STAGE_SECONDS.observe(seconds, pipeline=pipeline, stage="total")
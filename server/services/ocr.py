@@ -1,19 +1,63 @@
 import pytesseract
 from PIL import Image
 import os
-import io
+import time
+import threading
 import fitz  # PyMuPDF for PDF processing
-import requests
-import tempfile
+from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
+import config
+from services.ocr_cache import ocr_cache, make_cache_key
+from services.ocr_engine import get_ocr_engine
+from services.document_context import DocumentContext
+from services.metrics import OCR_PAGES
 
-# Configure Tesseract path (Windows-specific fix)
-# Uncomment and modify the path if Tesseract is not in your PATH
-pytesseract.pytesseract.tesseract_cmd = r'C:\Program Files\Tesseract-OCR\tesseract.exe'
+def render_page(page, dpi, clip=None):
+    """
+    Render a PyMuPDF page straight into a PIL Image
+    
+    The pixmap samples are wrapped directly instead of being encoded to
+    PPM and decoded again, so each page is held in memory once.
+    
+    Args:
+        page (fitz.Page): Page to render
+        dpi (int): Render resolution
+        clip (fitz.Rect): Only render this region of the page (optional)
+        
+    Returns:
+        PIL.Image: RGB image of the page
+    """
+    pix = page.get_pixmap(matrix=fitz.Matrix(dpi/72, dpi/72), clip=clip, alpha=False)
+    return Image.frombytes("RGB", (pix.width, pix.height), pix.samples)
+
+def iter_pdf_pages(pdf_path, dpi=None, page_nums=None):
+    """
+    Render PDF pages one at a time
+    
+    Only the page currently being consumed is alive, so peak memory does
+    not grow with the number of pages in the document.
+    
+    Args:
+        pdf_path (str): Path to the PDF file
+        dpi (int): Render resolution (default: config.OCR_DPI)
+        page_nums (iterable): Zero-based pages to render (default: all)
+        
+    Yields:
+        tuple: (page_num, PIL Image)
+    """
+    dpi = dpi or config.OCR_DPI
+    with fitz.open(pdf_path) as doc:
+        if page_nums is None:
+            page_nums = range(doc.page_count)
+        for page_num in page_nums:
+            yield page_num, render_page(doc[page_num], dpi)
 
 def pdf_to_images(pdf_path):
     """
     Convert PDF pages to PIL Images
     
+    Holds every page in memory at once; the OCR pipeline uses
+    iter_pdf_pages() instead.
+    
     Args:
         pdf_path (str): Path to the PDF file
         
@@ -21,22 +65,7 @@ def pdf_to_images(pdf_path):
         list: List of PIL Image objects
     """
     try:
-        doc = fitz.open(pdf_path)
-        images = []
-        
-        for page_num in range(doc.page_count):
-            # Get page
-            page = doc[page_num]
-            
-            # Convert page to image (300 DPI for better OCR)
-            pix = page.get_pixmap(matrix=fitz.Matrix(300/72, 300/72))
-            
-            # Convert to PIL Image
-            img_data = pix.tobytes("ppm")
-            img = Image.open(io.BytesIO(img_data))
-            images.append(img)
-        
-        doc.close()
+        images = [image for _, image in iter_pdf_pages(pdf_path)]
         print(f"📄 Converted {len(images)} pages from PDF to images")
         return images
         
@@ -44,117 +73,548 @@ def pdf_to_images(pdf_path):
         print(f"❌ PDF conversion error: {str(e)}")
         return []
 
-def extract_text(file_path):
+# Process pool shared by all requests so the number of concurrent
+# Tesseract processes stays bounded by OCR_WORKERS
+_ocr_pool = None
+_ocr_pool_lock = threading.Lock()
+
+def get_ocr_pool():
     """
-    Extract text from image or PDF using Tesseract OCR
+    Get (or lazily create) the shared OCR process pool
+    
+    Returns:
+        ProcessPoolExecutor: Pool with config.OCR_WORKERS processes
+    """
+    global _ocr_pool
+    with _ocr_pool_lock:
+        if _ocr_pool is None:
+            _ocr_pool = ProcessPoolExecutor(max_workers=max(1, config.OCR_WORKERS))
+            print(f"⚙️ OCR process pool started with {config.OCR_WORKERS} workers")
+        return _ocr_pool
+
+def image_to_text_with_confidence(image, lang, tesseract_config=''):
+    """
+    OCR an image and measure how confident Tesseract was
+    
+    Text is rebuilt from image_to_data() word boxes (lines joined by
+    newlines, paragraphs by blank lines) so a single Tesseract pass
+    gives both the text and the per-word confidences.
+    
+    Returns:
+        tuple: (text, mean word confidence 0-100, or 0.0 if no words)
+    """
+    data = get_ocr_engine().image_to_data(image, lang, tesseract_config)
+    
+    lines = {}
+    confidences = []
+    for i, word in enumerate(data["text"]):
+        word = word.strip()
+        conf = float(data["conf"][i])
+        if not word or conf < 0:
+            continue
+        confidences.append(conf)
+        key = (data["block_num"][i], data["par_num"][i], data["line_num"][i])
+        lines.setdefault(key, []).append(word)
+    
+    paragraphs = []
+    last_par = None
+    for (block_num, par_num, _), words in lines.items():
+        if (block_num, par_num) != last_par:
+            paragraphs.append([])
+            last_par = (block_num, par_num)
+        paragraphs[-1].append(' '.join(words))
+    text = '\n\n'.join('\n'.join(par_lines) for par_lines in paragraphs)
+    
+    mean_conf = sum(confidences) / len(confidences) if confidences else 0.0
+    return text, mean_conf
+
+def _ocr_page_tiers(render, dpi_tiers, lang, min_confidence):
+    """
+    OCR a PDF page at the lowest DPI tier, escalating while confidence is low
+    
+    Clean, large-font pages finish on the cheap first pass; only pages whose
+    mean word confidence is below min_confidence are re-rendered at the next
+    tier. The most confident pass wins.
+    
+    Args:
+        render (callable): dpi -> PIL Image of the page
+    
+    Returns:
+        dict: text, seconds, dpi, tier (0-based) and confidence of the kept pass
+    """
+    start = time.perf_counter()
+    best = None
+    for tier, dpi in enumerate(dpi_tiers):
+        image = render(dpi)
+        text, confidence = image_to_text_with_confidence(image, lang)
+        del image
+        if best is None or confidence > best["confidence"]:
+            best = {"text": text.strip(), "dpi": dpi, "tier": tier, "confidence": round(confidence, 1)}
+        if confidence >= min_confidence:
+            break
+    best["seconds"] = time.perf_counter() - start
+    return best
+
+def _ocr_pdf_page(pdf_path, page_num, dpi_tiers, lang, min_confidence):
+    """
+    Render and OCR a single PDF page (runs inside a pool worker)
+    
+    Each worker opens the PDF itself so only the page number crosses
+    the process boundary, not the rendered image.
+    
+    Returns:
+        tuple: (page_num, page result dict)
+    """
+    with fitz.open(pdf_path) as doc:
+        page = doc[page_num]
+        return page_num, _ocr_page_tiers(lambda dpi: render_page(page, dpi), dpi_tiers, lang, min_confidence)
+
+def get_dpi_tiers():
+    """
+    DPI tiers to try for scanned pages, lowest first
+    
+    Returns:
+        list: config.OCR_DPI_TIERS when adaptive DPI is on, else [config.OCR_DPI]
+    """
+    if config.OCR_ADAPTIVE_DPI and config.OCR_DPI_TIERS:
+        return sorted(config.OCR_DPI_TIERS)
+    return [config.OCR_DPI]
+
+def _ocr_pdf_sequential(ctx, page_nums):
+    """
+    OCR the given PDF pages one after another in the current process
+    
+    Pages are rendered through the DocumentContext, so the rasters it
+    retains (page 0) are reused by visual analysis afterwards.
+    
+    Returns:
+        dict: page_num -> page result dict
+    """
+    page_results = {}
+    dpi_tiers = get_dpi_tiers()
+    for page_num in page_nums:
+        print(f"🔤 Processing page {page_num+1}...")
+        page_results[page_num] = _ocr_page_tiers(
+            lambda dpi: ctx.page_image(page_num, dpi), dpi_tiers, config.OCR_LANG, config.OCR_MIN_CONFIDENCE
+        )
+    return page_results
+
+def _ocr_pdf_parallel(pdf_path, page_nums, workers):
+    """
+    OCR the given PDF pages concurrently on the shared process pool
+    
+    Results are collected by page number, so the combined text keeps
+    the original page order no matter which page finishes first.
+    
+    Returns:
+        dict: page_num -> page result dict
+    """
+    pool = get_ocr_pool()
+    dpi_tiers = get_dpi_tiers()
+    pending_pages = iter(page_nums)
+    in_flight = set()
+    
+    page_results = {}
+    while True:
+        # Keep at most `workers` pages of this document in flight
+        for page_num in pending_pages:
+            in_flight.add(pool.submit(
+                _ocr_pdf_page, pdf_path, page_num, dpi_tiers, config.OCR_LANG, config.OCR_MIN_CONFIDENCE
+            ))
+            if len(in_flight) >= workers:
+                break
+        if not in_flight:
+            break
+        
+        done, in_flight = wait(in_flight, return_when=FIRST_COMPLETED)
+        for future in done:
+            page_num, page_result = future.result()
+            page_results[page_num] = page_result
+            print(f"🔤 Page {page_num+1} OCR'd in {page_result['seconds']:.2f}s "
+                  f"at {page_result['dpi']} DPI (confidence {page_result['confidence']})")
+    
+    return page_results
+
+def has_usable_text_layer(page_text):
+    """
+    Check whether a page's embedded text layer can replace OCR
+    
+    Scanned pages have no text layer (or a few stray characters), and
+    PDFs with broken font maps decode to U+FFFD replacement characters.
     
     Args:
-        file_path (str): Path to the image/PDF file or URL
+        page_text (str): Text returned by PyMuPDF for the page
         
     Returns:
-        str: Extracted text or empty string if error
+        bool: True if the text layer should be used as-is
     """
-    try:
-        temp_file_path = None
+    stripped = page_text.strip()
+    if len(stripped) < config.OCR_TEXT_LAYER_MIN_CHARS:
+        return False
+    garbage = stripped.count('\ufffd')
+    return garbage / len(stripped) < 0.05
+
+def _read_text_layers(doc):
+    """
+    Read the native text layer of every PDF page that has a usable one
+    
+    Returns:
+        dict: page_num -> page result dict for pages with a text layer
+    """
+    page_results = {}
+    for page_num in range(doc.page_count):
+        start = time.perf_counter()
+        page_text = doc[page_num].get_text("text")
+        if has_usable_text_layer(page_text):
+            page_results[page_num] = {
+                "text": page_text.strip(),
+                "seconds": time.perf_counter() - start
+            }
+    return page_results
+
+def summarize_extraction_method(pages):
+    """
+    Collapse per-page methods into the document-level extraction_method
+    
+    Returns:
+        str: The shared method, "mixed" if pages differ, or "none"
+    """
+    methods = {page["method"] for page in pages}
+    if not methods:
+        return "none"
+    if len(methods) == 1:
+        return methods.pop()
+    return "mixed"
+
+def _field_tesseract_config(field):
+    tesseract_config = f'--psm {field.get("psm", 7)}'
+    if field.get("whitelist"):
+        tesseract_config += f' -c tessedit_char_whitelist={field["whitelist"]}'
+    return tesseract_config
+
+def _ocr_profile_fields(ctx, profile):
+    """
+    OCR only the regions of interest defined by an institute's OCR profile
+    
+    PDF regions are rendered with a clip rectangle (or read from the text
+    layer when the page has one); image regions are cropped from the file.
+    
+    Args:
+        ctx (DocumentContext): Document being processed
+        profile (dict): OCR profile with normalized ROI fields
         
-        # Handle URL downloads
-        if file_path.startswith(('http://', 'https://')):
-            print(f"🌐 Downloading file from URL: {file_path}")
-            response = requests.get(file_path, timeout=30)
-            response.raise_for_status()
+    Returns:
+        tuple: (fields dict name -> value, per-field info list)
+    """
+    dpi = profile.get("dpi") or config.OCR_DPI
+    fields = {}
+    field_info = []
+    
+    if ctx.is_pdf:
+        doc = ctx.pdf
+        text_layer_usable = {}
+        for field in profile["fields"]:
+            start = time.perf_counter()
+            page_num = min(field.get("page", 0), doc.page_count - 1)
+            page = doc[page_num]
+            x0, y0, x1, y1 = field["box"]
+            rect = fitz.Rect(
+                page.rect.x0 + x0 * page.rect.width, page.rect.y0 + y0 * page.rect.height,
+                page.rect.x0 + x1 * page.rect.width, page.rect.y0 + y1 * page.rect.height
+            )
             
-            # Create temporary file
-            with tempfile.NamedTemporaryFile(delete=False, suffix=".tmp") as temp_file:
-                temp_file.write(response.content)
-                temp_file_path = temp_file.name
+            if page_num not in text_layer_usable:
+                text_layer_usable[page_num] = (
+                    config.OCR_USE_TEXT_LAYER and has_usable_text_layer(page.get_text("text"))
+                )
             
-            # Use the temporary file for processing
-            working_file_path = temp_file_path
-        else:
-            # Local file
-            if not os.path.exists(file_path):
-                print(f"❌ OCR Error: File not found: {file_path}")
-                return ""
-            working_file_path = file_path
+            if text_layer_usable[page_num]:
+                value, method, confidence = page.get_textbox(rect), "text_layer", None
+            else:
+                image = render_page(page, dpi, clip=rect)
+                value, confidence = image_to_text_with_confidence(
+                    image, config.OCR_LANG, _field_tesseract_config(field)
+                )
+                method, confidence = "tesseract_ocr", round(confidence, 1)
+            
+            fields[field["name"]] = ' '.join(value.split())
+            field_info.append({
+                "field": field["name"],
+                "page": page_num + 1,
+                "method": method,
+                "confidence": confidence,
+                "seconds": round(time.perf_counter() - start, 3)
+            })
+    else:
+        image = ctx.page_image(0)
+        width, height = image.size
+        for field in profile["fields"]:
+            start = time.perf_counter()
+            x0, y0, x1, y1 = field["box"]
+            region = image.crop((int(x0 * width), int(y0 * height), int(x1 * width), int(y1 * height)))
+            value, confidence = image_to_text_with_confidence(
+                region, config.OCR_LANG, _field_tesseract_config(field)
+            )
+            fields[field["name"]] = ' '.join(value.split())
+            field_info.append({
+                "field": field["name"],
+                "page": 1,
+                "method": "tesseract_ocr",
+                "confidence": round(confidence, 1),
+                "seconds": round(time.perf_counter() - start, 3)
+            })
+    
+    return fields, field_info
+
+def ocr_settings(profile=None):
+    """
+    OCR settings that change the extracted text, used in the cache key
+    
+    Args:
+        profile (dict): OCR profile in use, if any
+    
+    Returns:
+        dict: Language, page segmentation mode, DPI and text-layer options
+    """
+    return {
+        # "text": profile results keep raw text next to the fields (was "name: value" lines)
+        "profile": {"dpi": profile.get("dpi"), "fields": profile["fields"], "text": "raw"} if profile else None,
+        "engine": config.OCR_ENGINE,
+        "lang": config.OCR_LANG,
+        "psm": config.OCR_IMAGE_PSM,
+        "dpi": config.OCR_DPI,
+        "dpi_tiers": get_dpi_tiers(),
+        "min_confidence": config.OCR_MIN_CONFIDENCE,
+        "text_layer": config.OCR_USE_TEXT_LAYER,
+        "text_layer_min_chars": config.OCR_TEXT_LAYER_MIN_CHARS
+    }
+
+def ocr_document(source, parallel=None, workers=None, use_cache=True, profile=None):
+    """
+    Extract text from image or PDF using Tesseract OCR, with timings
+    
+    Args:
+        source (str | DocumentContext): Path/URL of the image/PDF file, or a
+            DocumentContext shared with the other pipeline stages
+        parallel (bool): OCR PDF pages on the process pool (default: config.OCR_PARALLEL)
+        workers (int): Max pages in flight at once (default: config.OCR_WORKERS)
+        use_cache (bool): Reuse results for identical file bytes + settings
+        profile (dict): OCR profile; when given only its ROI fields are OCR'd
         
-        print(f"🔤 Extracting text from: {working_file_path}")
+    Returns:
+        dict: Extracted text, extraction method, OCR mode and per-page timings
+              (plus structured "fields" when a profile was used). text_scope
+              is "full", or "regions" when a profile read only its fields and
+              the text is the raw OCR of those regions. When OCR fails, "error"
+              is set and the text is empty (never the error message).
+    """
+    if parallel is None:
+        parallel = config.OCR_PARALLEL
+    if workers is None:
+        workers = config.OCR_WORKERS
+    
+    start = time.perf_counter()
+    result = {
+        "text": "",
+        "extraction_method": "none",
+        "mode": "sequential",
+        "workers": 1,
+        "pages": [],
+        "total_seconds": 0.0,
+        "cache": "miss",
+        "text_scope": "full"
+    }
+    # Contexts passed in belong to the caller; ones built here are closed here
+    owns_context = not isinstance(source, DocumentContext)
+    ctx = None
+    cache_key = None
+    
+    try:
+        if owns_context:
+            is_url = source.startswith(('http://', 'https://'))
+            if not is_url and not os.path.exists(source):
+                print(f"❌ OCR Error: File not found: {source}")
+                return result
+        ctx = DocumentContext.from_source(source)
+        
+        # Identical bytes with identical settings always OCR to the same text
+        if use_cache and config.OCR_CACHE_ENABLED:
+            cache_key = make_cache_key(ctx.sha256, ocr_settings(profile))
+            cached, tier = ocr_cache.get(cache_key)
+            if cached is not None:
+                cached["cache"] = tier
+                cached["total_seconds"] = round(time.perf_counter() - start, 3)
+                print(f"⚡ OCR cache hit ({tier}) - skipping Tesseract")
+                return cached
+        
+        print(f"🔤 Extracting text from: {ctx.source}")
         
-        # Check file extension to determine processing method
-        file_ext = working_file_path.lower()[-4:]
-        if file_ext == '.pdf':
+        # Check file type to determine processing method
+        if profile:
+            # Known layout: only the profile's regions of interest are read
+            print(f"🎯 Using OCR profile for {profile.get('institute')} / {profile.get('document_type')}")
+            fields, field_info = _ocr_profile_fields(ctx, profile)
+            result["fields"] = fields
+            result["pages"] = field_info
+            # Raw text next to the fields: a PDF whose pages all have a text layer
+            # gives the full text for free; otherwise only the regions were read
+            text_layer_pages = _read_text_layers(ctx.pdf) if ctx.is_pdf and config.OCR_USE_TEXT_LAYER else {}
+            if ctx.is_pdf and len(text_layer_pages) == ctx.page_count:
+                extracted_text = '\n\n'.join(text_layer_pages[n]["text"] for n in range(ctx.page_count))
+            else:
+                extracted_text = '\n'.join(value for value in fields.values() if value)
+                result["text_scope"] = "regions"
+            
+        elif ctx.is_pdf:
             # Handle PDF files
             print("📄 Processing PDF file...")
-            images = pdf_to_images(working_file_path)
+            page_count = ctx.page_count
+            # Born-digital pages already carry their text, no rendering needed
+            text_layer_pages = _read_text_layers(ctx.pdf) if config.OCR_USE_TEXT_LAYER else {}
+            
+            scanned_pages = [n for n in range(page_count) if n not in text_layer_pages]
+            if text_layer_pages:
+                print(f"⚡ {len(text_layer_pages)}/{page_count} pages read from the PDF text layer")
             
-            if not images:
-                print("❌ Failed to convert PDF to images")
-                return ""
+            ocr_pages = {}
+            if scanned_pages:
+                if parallel and workers > 1 and len(scanned_pages) >= config.OCR_PARALLEL_MIN_PAGES:
+                    result["mode"] = "parallel"
+                    result["workers"] = min(workers, len(scanned_pages))
+                    # Pool workers open the file themselves, so they need a path
+                    ocr_pages = _ocr_pdf_parallel(ctx.path, scanned_pages, workers)
+                else:
+                    ocr_pages = _ocr_pdf_sequential(ctx, scanned_pages)
             
-            # Extract text from all pages
+            # Combine all pages in their original order
             all_text = []
-            for i, image in enumerate(images):
-                print(f"🔤 Processing page {i+1}...")
-                
-                # Convert to RGB if necessary
-                if image.mode != 'RGB':
-                    image = image.convert('RGB')
-                
-                # Extract text using Tesseract
-                page_text = pytesseract.image_to_string(image, lang='eng')
-                all_text.append(page_text.strip())
+            for page_num in range(page_count):
+                if page_num in text_layer_pages:
+                    page_result = text_layer_pages[page_num]
+                    page_info = {"method": "text_layer"}
+                else:
+                    page_result = ocr_pages[page_num]
+                    page_info = {
+                        "method": "tesseract_ocr",
+                        "dpi": page_result["dpi"],
+                        "tier": page_result["tier"],
+                        "confidence": page_result["confidence"]
+                    }
+                all_text.append(page_result["text"])
+                result["pages"].append({
+                    "page": page_num + 1,
+                    **page_info,
+                    "seconds": round(page_result["seconds"], 3),
+                    "chars": len(page_result["text"])
+                })
             
-            # Combine all pages
             extracted_text = '\n\n'.join(all_text)
             
         else:
             # Handle image files (PNG, JPG, etc.)
             print("🖼️ Processing image file...")
-            image = Image.open(working_file_path)
+            page_start = time.perf_counter()
+            # Decoded once as RGB and kept on the context for visual analysis
+            image = ctx.page_image(0)
             
-            # Convert to RGB if necessary (for better OCR results)
-            if image.mode != 'RGB':
-                image = image.convert('RGB')
-            
-            # Extract text using Tesseract
-            extracted_text = pytesseract.image_to_string(image, config='--psm 6')
+            # Extract text using Tesseract (raster files have a fixed
+            # resolution, so there is no DPI tier to escalate to)
+            extracted_text, confidence = image_to_text_with_confidence(
+                image, config.OCR_LANG, f'--psm {config.OCR_IMAGE_PSM}'
+            )
+            result["pages"] = [{
+                "page": 1,
+                "method": "tesseract_ocr",
+                "dpi": "native",
+                "tier": 0,
+                "confidence": round(confidence, 1),
+                "seconds": round(time.perf_counter() - page_start, 3),
+                "chars": len(extracted_text.strip())
+            }]
         
-        print(f"✅ OCR completed. Extracted {len(extracted_text)} characters")
+        result["text"] = extracted_text.strip()
+        result["extraction_method"] = "roi_profile" if profile else summarize_extraction_method(result["pages"])
+        result["total_seconds"] = round(time.perf_counter() - start, 3)
+        print(f"✅ OCR completed. Extracted {len(extracted_text)} characters "
+              f"in {result['total_seconds']}s ({result['mode']})")
         
-        # Clean up temporary file if we created one
-        if temp_file_path and os.path.exists(temp_file_path):
-            try:
-                os.unlink(temp_file_path)
-                print(f"🗑️ Temporary OCR file cleaned up")
-            except Exception as e:
-                print(f"⚠️ Failed to clean up OCR temp file: {e}")
+        if profile:
+            OCR_PAGES.inc(method="roi_profile")
+        else:
+            for page in result["pages"]:
+                OCR_PAGES.inc(method=page["method"])
         
-        return extracted_text.strip()
+        if cache_key:
+            ocr_cache.put(cache_key, {k: v for k, v in result.items() if k != "cache"})
         
     except pytesseract.TesseractNotFoundError:
         error_msg = "❌ Tesseract OCR not found. Please install Tesseract OCR and add it to your PATH"
         print(error_msg)
-        return f"ERROR: {error_msg}"
+        result.update(text="", extraction_method="failed", error=error_msg)
         
     except Exception as e:
         error_msg = f"❌ OCR Error: {str(e)}"
         print(error_msg)
+        result.update(text="", extraction_method="failed", error=error_msg)
+    
+    finally:
+        # Clean up the context (and any download/temp file) if we created it
+        if owns_context and ctx is not None:
+            ctx.close()
+    
+    return result
+
+def ocr_result_from_record(ocr_data, source="issued_record"):
+    """
+    Wrap the stored ocr_data of an existing document as an OCR result
+    
+    Used when a verifier upload is byte-identical to an issued document,
+    so its text can be reused instead of running OCR again. Records whose
+    full text lives in side storage only expose their stored preview here;
+    the text_ref is carried along so it can be shared, not copied.
+    
+    Args:
+        ocr_data (dict): ocr_data of the stored document
+        source (str): What the result was reused from
         
-        # Clean up temporary file if we created one
-        if temp_file_path and os.path.exists(temp_file_path):
-            try:
-                os.unlink(temp_file_path)
-            except:
-                pass
+    Returns:
+        dict: Same shape as ocr_document() results, plus text_ref
+    """
+    ocr_data = ocr_data or {}
+    return {
+        "text": ocr_data.get("extracted_text", ocr_data.get("preview", "")),
+        "text_ref": ocr_data.get("text_ref"),
+        "text_length": ocr_data.get("text_length"),
+        "extraction_method": ocr_data.get("extraction_method", "none"),
+        "fields": ocr_data.get("fields"),
+        "text_scope": ocr_data.get("text_scope", "full"),
+        "mode": "reused",
+        "workers": 0,
+        "pages": [],
+        "total_seconds": 0.0,
+        "cache": source
+    }
+
+def extract_text(source):
+    """
+    Extract text from image or PDF using Tesseract OCR
+    
+    Args:
+        source (str | DocumentContext): Path to the image/PDF file, URL or DocumentContext
         
-        return f"ERROR: {error_msg}"
+    Returns:
+        str: Extracted text or empty string if error
+    """
+    return ocr_document(source)["text"]
 
 def test_tesseract_installation():
     """
     Test if Tesseract is properly installed and accessible
     """
     try:
-        version = pytesseract.get_tesseract_version()
-        print(f"✅ Tesseract version: {version}")
+        engine = get_ocr_engine()
+        version = engine.version()
+        print(f"✅ Tesseract version: {version} ({engine.name} engine)")
         return True
     except pytesseract.TesseractNotFoundError:
         print("❌ Tesseract OCR not found!")
@@ -0,0 +1,162 @@
+import os
+import json
+import hashlib
+import tempfile
+import threading
+from collections import OrderedDict
+import config
+from services.metrics import registry, CallbackMetric
+
+def file_sha256(file_path, chunk_size=1024 * 1024):
+    """
+    Calculate the SHA-256 of a file without loading it fully into memory
+
+    Args:
+        file_path (str): Path to the file
+        chunk_size (int): Bytes read per iteration
+
+    Returns:
+        str: SHA-256 digest in hexadecimal format
+    """
+    digest = hashlib.sha256()
+    with open(file_path, 'rb') as file:
+        for chunk in iter(lambda: file.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+def make_cache_key(content_sha256, settings):
+    """
+    Build a cache key from the file content hash and the OCR settings
+
+    Args:
+        content_sha256 (str): SHA-256 of the file bytes
+        settings (dict): OCR settings that influence the result (lang, psm, DPI, ...)
+
+    Returns:
+        str: Hex key identifying this (content, settings) pair
+    """
+    settings_blob = json.dumps(settings, sort_keys=True)
+    return hashlib.sha256(f"{content_sha256}:{settings_blob}".encode('utf-8')).hexdigest()
+
+class OcrCache:
+    """
+    Two-tier OCR result cache keyed by content hash + OCR settings
+
+    Tier 1 is a bounded in-process LRU, tier 2 a JSON file per entry
+    under cache_dir that survives restarts and is shared by all workers.
+    """
+
+    def __init__(self, max_entries=256, cache_dir=None):
+        self.max_entries = max_entries
+        self.cache_dir = cache_dir
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._stats = {
+            "memory_hits": 0,
+            "disk_hits": 0,
+            "misses": 0,
+            "evictions": 0,
+            "writes": 0
+        }
+        if self.cache_dir:
+            os.makedirs(self.cache_dir, exist_ok=True)
+
+    def _disk_path(self, key):
+        return os.path.join(self.cache_dir, key[:2], f"{key}.json")
+
+    def _remember(self, key, value):
+        """Insert into the LRU tier, evicting the oldest entries (lock held)"""
+        self._entries[key] = value
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self._stats["evictions"] += 1
+
+    def get(self, key):
+        """
+        Look up a cached OCR result
+
+        Returns:
+            tuple: (result dict, tier name) or (None, None) on a miss
+        """
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                self._stats["memory_hits"] += 1
+                return dict(self._entries[key]), "memory"
+
+        if self.cache_dir:
+            try:
+                with open(self._disk_path(key), 'r', encoding='utf-8') as file:
+                    value = json.load(file)
+                with self._lock:
+                    self._remember(key, value)
+                    self._stats["disk_hits"] += 1
+                return dict(value), "disk"
+            except FileNotFoundError:
+                pass
+            except Exception as e:
+                print(f"⚠️ OCR cache read failed for {key[:12]}: {e}")
+
+        with self._lock:
+            self._stats["misses"] += 1
+        return None, None
+
+    def put(self, key, value):
+        """
+        Store an OCR result in both tiers
+
+        Args:
+            key (str): Key from make_cache_key
+            value (dict): JSON-serialisable OCR result
+        """
+        with self._lock:
+            self._remember(key, value)
+            self._stats["writes"] += 1
+
+        if self.cache_dir:
+            path = self._disk_path(key)
+            try:
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                # Write then rename so concurrent readers never see a partial file
+                fd, temp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+                with os.fdopen(fd, 'w', encoding='utf-8') as file:
+                    json.dump(value, file)
+                os.replace(temp_path, path)
+            except Exception as e:
+                print(f"⚠️ OCR cache write failed for {key[:12]}: {e}")
+
+    def clear(self):
+        """Drop the in-process tier (the disk tier is left untouched)"""
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        """
+        Get hit/miss/eviction counters
+
+        Returns:
+            dict: Counters plus current size and hit ratio
+        """
+        with self._lock:
+            stats = dict(self._stats)
+            stats["entries"] = len(self._entries)
+        lookups = stats["memory_hits"] + stats["disk_hits"] + stats["misses"]
+        stats["max_entries"] = self.max_entries
+        stats["persistent"] = bool(self.cache_dir)
+        stats["hit_ratio"] = round((lookups - stats["misses"]) / lookups, 3) if lookups else 0.0
+        return stats
+
+ocr_cache = OcrCache(
+    max_entries=config.OCR_CACHE_MAX_ENTRIES,
+    cache_dir=config.OCR_CACHE_DIR or None
+)
+
+registry.register(CallbackMetric(
+    "docval_ocr_cache_lookups_total", "OCR cache lookups by result", "counter",
+    lambda: {(("result", name),): ocr_cache.stats()[name] for name in ("memory_hits", "disk_hits", "misses")}
+))
+registry.register(CallbackMetric(
+    "docval_ocr_cache_entries", "OCR results held in memory", "gauge",
+    lambda: ocr_cache.stats()["entries"]
+))
@@ -0,0 +1,183 @@
+import re
+import threading
+from abc import ABC, abstractmethod
+import pytesseract
+import config
+
+# Configure Tesseract path (set TESSERACT_CMD if Tesseract is not in your PATH)
+if config.TESSERACT_CMD:
+    pytesseract.pytesseract.tesseract_cmd = config.TESSERACT_CMD
+
+def parse_tesseract_config(tesseract_config):
+    """
+    Split a Tesseract CLI config string into psm and -c variables
+
+    Args:
+        tesseract_config (str): e.g. "--psm 7 -c tessedit_char_whitelist=0123456789"
+
+    Returns:
+        tuple: (psm int or None, dict of variable -> value)
+    """
+    psm_match = re.search(r'--psm\s+(\d+)', tesseract_config or '')
+    variables = dict(re.findall(r'-c\s+(\w+)=(\S+)', tesseract_config or ''))
+    return (int(psm_match.group(1)) if psm_match else None), variables
+
+class OcrEngine(ABC):
+    """
+    Interface every OCR backend implements
+
+    image_to_data() returns the same dict layout as pytesseract's
+    Output.DICT (text, conf, block_num, par_num, line_num, left, top,
+    width, height) so callers do not care which backend produced it.
+    """
+    name = "base"
+
+    @abstractmethod
+    def image_to_data(self, image, lang, tesseract_config=''):
+        """Word boxes, confidences and layout numbers (pytesseract Output.DICT layout)"""
+
+    @abstractmethod
+    def image_to_string(self, image, lang, tesseract_config=''):
+        """Plain recognized text"""
+
+    @abstractmethod
+    def version(self):
+        """Tesseract version string"""
+
+class PytesseractEngine(OcrEngine):
+    """
+    Default backend: shells out to the tesseract binary for every call
+    """
+    name = "pytesseract"
+
+    def image_to_data(self, image, lang, tesseract_config=''):
+        return pytesseract.image_to_data(
+            image, lang=lang, config=tesseract_config, output_type=pytesseract.Output.DICT
+        )
+
+    def image_to_string(self, image, lang, tesseract_config=''):
+        return pytesseract.image_to_string(image, lang=lang, config=tesseract_config)
+
+    def version(self):
+        return str(pytesseract.get_tesseract_version())
+
+class TesserocrEngine(OcrEngine):
+    """
+    Persistent in-process backend built on tesserocr (libtesseract bindings)
+
+    Each thread keeps one TessBaseAPI per language alive, so the
+    traineddata is loaded once per worker instead of once per page, and
+    images are handed over in memory with no temp file or subprocess.
+    """
+    name = "tesserocr"
+
+    def __init__(self, tessdata_path=None):
+        try:
+            import tesserocr
+        except ImportError:
+            raise RuntimeError("OCR_ENGINE=tesserocr requires the tesserocr package (pip install tesserocr)")
+        self._tesserocr = tesserocr
+        self._tessdata_path = tessdata_path
+        self._local = threading.local()
+
+    def _get_api(self, lang):
+        apis = getattr(self._local, "apis", None)
+        if apis is None:
+            apis = self._local.apis = {}
+        if lang not in apis:
+            kwargs = {"lang": lang}
+            if self._tessdata_path:
+                kwargs["path"] = self._tessdata_path
+            apis[lang] = self._tesserocr.PyTessBaseAPI(**kwargs)
+        return apis[lang]
+
+    def _recognize(self, image, lang, tesseract_config):
+        api = self._get_api(lang)
+        psm, variables = parse_tesseract_config(tesseract_config)
+        api.SetPageSegMode(psm if psm is not None else self._tesserocr.PSM.AUTO)
+        # Variables stick to the API object: remember the values being overridden
+        previous = {}
+        for name, value in variables.items():
+            previous[name] = api.GetVariableAsString(name)
+            api.SetVariable(name, value)
+        api.SetImage(image)
+        api.Recognize()
+        return api, previous
+
+    def _reset(self, api, previous):
+        # Restore the values the per-call overrides replaced
+        for name, value in previous.items():
+            if value is not None:
+                api.SetVariable(name, value)
+        api.Clear()
+
+    def image_to_data(self, image, lang, tesseract_config=''):
+        RIL = self._tesserocr.RIL
+        data = {key: [] for key in ("text", "conf", "block_num", "par_num", "line_num",
+                                    "left", "top", "width", "height")}
+        api, previous = self._recognize(image, lang, tesseract_config)
+        try:
+            iterator = api.GetIterator()
+            block_num = par_num = line_num = 0
+            while iterator is not None:
+                if iterator.IsAtBeginningOf(RIL.BLOCK):
+                    block_num, par_num, line_num = block_num + 1, 0, 0
+                if iterator.IsAtBeginningOf(RIL.PARA):
+                    par_num, line_num = par_num + 1, 0
+                if iterator.IsAtBeginningOf(RIL.TEXTLINE):
+                    line_num += 1
+
+                box = iterator.BoundingBox(RIL.WORD) or (0, 0, 0, 0)
+                data["text"].append(iterator.GetUTF8Text(RIL.WORD) or "")
+                data["conf"].append(iterator.Confidence(RIL.WORD))
+                data["block_num"].append(block_num)
+                data["par_num"].append(par_num)
+                data["line_num"].append(line_num)
+                data["left"].append(box[0])
+                data["top"].append(box[1])
+                data["width"].append(box[2] - box[0])
+                data["height"].append(box[3] - box[1])
+
+                if not iterator.Next(RIL.WORD):
+                    break
+        finally:
+            self._reset(api, previous)
+        return data
+
+    def image_to_string(self, image, lang, tesseract_config=''):
+        api, previous = self._recognize(image, lang, tesseract_config)
+        try:
+            return api.GetUTF8Text()
+        finally:
+            self._reset(api, previous)
+
+    def version(self):
+        return self._tesserocr.tesseract_version()
+
+OCR_ENGINES = {
+    PytesseractEngine.name: PytesseractEngine,
+    TesserocrEngine.name: TesserocrEngine
+}
+
+_engine = None
+_engine_lock = threading.Lock()
+
+def get_ocr_engine():
+    """
+    Get the OCR backend selected by config.OCR_ENGINE (one per process)
+
+    Returns:
+        OcrEngine: The configured engine instance
+    """
+    global _engine
+    with _engine_lock:
+        if _engine is None:
+            engine_name = config.OCR_ENGINE.lower()
+            if engine_name not in OCR_ENGINES:
+                raise ValueError(f"Unknown OCR_ENGINE '{config.OCR_ENGINE}'. Available: {list(OCR_ENGINES)}")
+            if engine_name == TesserocrEngine.name:
+                _engine = TesserocrEngine(tessdata_path=config.TESSDATA_PATH)
+            else:
+                _engine = PytesseractEngine()
+            print(f"🔤 OCR engine: {_engine.name}")
+        return _engine
@@ -0,0 +1,274 @@
+import threading
+from datetime import datetime
+import cv2
+import numpy as np
+import config
+from services.metrics import registry, CallbackMetric
+from services.index_refresh import IndexRefresher
+
+# Perceptual fingerprints survive re-encoding, resizing and rescanning, so a
+# verifier upload that is not byte-identical to an issued document can still
+# be matched to it by Hamming distance between 64-bit page hashes.
+
+def _to_gray(image):
+    array = np.asarray(image)
+    if array.ndim == 3:
+        array = cv2.cvtColor(array, cv2.COLOR_RGB2GRAY)
+    return array
+
+def dhash(gray, hash_size=8):
+    """
+    Difference hash: sign of horizontal gradients on a (hash_size+1) x hash_size thumbnail
+
+    Returns:
+        int: 64-bit hash (for hash_size=8)
+    """
+    small = cv2.resize(gray, (hash_size + 1, hash_size), interpolation=cv2.INTER_AREA)
+    bits = (small[:, 1:] > small[:, :-1]).flatten()
+    return int("".join('1' if bit else '0' for bit in bits), 2)
+
+def phash(gray, hash_size=8, highfreq_factor=4):
+    """
+    DCT perceptual hash: low-frequency DCT coefficients compared to their median
+
+    Returns:
+        int: 64-bit hash (for hash_size=8)
+    """
+    size = hash_size * highfreq_factor
+    small = cv2.resize(gray, (size, size), interpolation=cv2.INTER_AREA).astype(np.float32)
+    low = cv2.dct(small)[:hash_size, :hash_size]
+    bits = (low > np.median(low)).flatten()
+    return int("".join('1' if bit else '0' for bit in bits), 2)
+
+def hamming(a, b):
+    return bin(a ^ b).count('1')
+
+def page_fingerprints(ctx, max_pages=None):
+    """
+    pHash and dHash of the first pages of a document
+
+    Reuses page 0's raster when OCR or analysis already produced one; other
+    pages are rendered at PHASH_DPI and not kept.
+
+    Args:
+        ctx (DocumentContext): Document
+        max_pages (int): Pages to fingerprint (default: config.PHASH_MAX_PAGES)
+
+    Returns:
+        list: [{"page": n, "phash": hex, "dhash": hex}, ...]
+    """
+    # Local import: services.ocr imports the document context module too
+    from services.ocr import render_page
+
+    max_pages = max_pages or config.PHASH_MAX_PAGES
+    fingerprints = []
+    for page_num in range(min(ctx.page_count, max_pages)):
+        if not ctx.is_pdf or ctx.cached_dpis(page_num):
+            gray = ctx.gray_page(page_num)
+        else:
+            # Low-resolution render that does not replace the context's cached raster
+            gray = _to_gray(render_page(ctx.pdf[page_num], config.PHASH_DPI))
+        fingerprints.append({
+            "page": page_num,
+            "phash": f"{phash(gray):016x}",
+            "dhash": f"{dhash(gray):016x}"
+        })
+    return fingerprints
+
+def fingerprint_document(ctx):
+    """
+    page_fingerprints() for issuance/verification
+
+    Returns:
+        list: Fingerprints, or [] if disabled or the document cannot be rendered
+    """
+    if not config.PHASH_ENABLED:
+        return []
+    try:
+        return page_fingerprints(ctx)
+    except Exception as e:
+        print(f"⚠️ Perceptual hashing failed: {e}")
+        return []
+
+class BKTree:
+    """
+    Burkhard-Keller tree over 64-bit hashes under Hamming distance
+
+    A radius search only descends into children whose edge distance is
+    within [d - radius, d + radius], so most of the tree is skipped for
+    small radii.
+    """
+
+    def __init__(self):
+        self._root = None   # [hash, items, {distance: child}]
+        self.size = 0
+
+    def add(self, value, item):
+        self.size += 1
+        if self._root is None:
+            self._root = [value, [item], {}]
+            return
+        node = self._root
+        while True:
+            distance = hamming(value, node[0])
+            if distance == 0:
+                node[1].append(item)
+                return
+            child = node[2].get(distance)
+            if child is None:
+                node[2][distance] = [value, [item], {}]
+                return
+            node = child
+
+    def search(self, value, radius):
+        """
+        Returns:
+            list: (distance, item) for every item within radius
+        """
+        if self._root is None:
+            return []
+        found = []
+        stack = [self._root]
+        while stack:
+            node = stack.pop()
+            distance = hamming(value, node[0])
+            if distance <= radius:
+                found.extend((distance, item) for item in node[1])
+            for edge, child in node[2].items():
+                if distance - radius <= edge <= distance + radius:
+                    stack.append(child)
+        return found
+
+class PerceptualIndex:
+    """
+    In-memory nearest-issued-document index over page pHashes
+
+    Built from the perceptual_hashes stored on issued records at startup,
+    extended as documents are issued and refreshed with documents issued by
+    other processes. Candidates found via pHash are confirmed with the
+    page's dHash.
+    """
+
+    def __init__(self, max_distance):
+        self.max_distance = max_distance
+        self._tree = BKTree()
+        self._documents = set()
+        self._lock = threading.Lock()
+        self._refresher = IndexRefresher("Perceptual index", config.INDEX_REFRESH_SECONDS)
+
+    def add(self, document_id, fingerprints):
+        """Index the page fingerprints of an issued document (once)"""
+        if not fingerprints:
+            return
+        with self._lock:
+            if str(document_id) in self._documents:
+                return
+            for fingerprint in fingerprints:
+                item = (str(document_id), fingerprint["page"], int(fingerprint["dhash"], 16))
+                self._tree.add(int(fingerprint["phash"], 16), item)
+            self._documents.add(str(document_id))
+
+    def rebuild(self, mongo):
+        """
+        Reload the index from the issued documents in Mongo
+
+        Returns:
+            int: Number of documents indexed
+        """
+        started_at = datetime.utcnow()
+        tree = BKTree()
+        documents = set()
+        cursor = mongo.db.documents.find(
+            {"metaData.upload_method": "issuer_upload", "perceptual_hashes.0": {"$exists": True}},
+            {"perceptual_hashes": 1}
+        )
+        for doc in cursor:
+            for fingerprint in doc["perceptual_hashes"]:
+                item = (str(doc["_id"]), fingerprint["page"], int(fingerprint["dhash"], 16))
+                tree.add(int(fingerprint["phash"], 16), item)
+            documents.add(str(doc["_id"]))
+        with self._lock:
+            self._tree, self._documents = tree, documents
+        self._refresher.mark_built(started_at)
+        print(f"🧬 Perceptual index built: {len(documents)} documents, {tree.size} pages")
+        return len(documents)
+
+    def refresh(self, mongo):
+        """Index documents issued by other processes since the last pass (rate limited)"""
+        def read(since):
+            cursor = mongo.db.documents.find(
+                {"_id": {"$gte": since}, "metaData.upload_method": "issuer_upload",
+                 "perceptual_hashes.0": {"$exists": True}},
+                {"perceptual_hashes": 1}
+            )
+            for doc in cursor:
+                self.add(doc["_id"], doc["perceptual_hashes"])
+        self._refresher.refresh(read)
+
+    def lookup(self, fingerprints, limit=3):
+        """
+        Issued documents whose pages look like the given ones
+
+        Args:
+            fingerprints: page_fingerprints() of the document being verified
+            limit (int): Max candidates returned
+
+        Returns:
+            list: Candidates, best first: {"document_id", "pages_matched",
+                  "distance" (mean pHash distance of matched pages)}
+        """
+        best = {}   # document_id -> {query page -> distance}
+        with self._lock:
+            for fingerprint in fingerprints:
+                query_dhash = int(fingerprint["dhash"], 16)
+                for distance, (document_id, page, stored_dhash) in self._tree.search(
+                        int(fingerprint["phash"], 16), self.max_distance):
+                    if page != fingerprint["page"] or hamming(query_dhash, stored_dhash) > self.max_distance:
+                        continue
+                    pages = best.setdefault(document_id, {})
+                    pages[page] = min(distance, pages.get(page, distance))
+
+        candidates = [
+            {
+                "document_id": document_id,
+                "pages_matched": len(pages),
+                "distance": round(sum(pages.values()) / len(pages), 2)
+            }
+            for document_id, pages in best.items()
+        ]
+        candidates.sort(key=lambda candidate: (-candidate["pages_matched"], candidate["distance"]))
+        return candidates[:limit]
+
+    def best_match(self, fingerprints):
+        """
+        The issued document a scan is a near-duplicate of, if one stands out
+
+        Whole-page 64-bit hashes cannot tell documents of one template apart:
+        certificates that differ only in name, grade and number fall within a
+        few bits of each other. A hit is therefore only attributed to one
+        document when it is strictly closer than the runner-up (more pages
+        matched, or a lower mean distance); otherwise the candidates only say
+        which layout the scan has.
+
+        Returns:
+            tuple: (best candidate or None, all candidates from lookup())
+        """
+        candidates = self.lookup(fingerprints)
+        if not candidates:
+            return None, candidates
+        if len(candidates) > 1:
+            best, runner_up = candidates[0], candidates[1]
+            if (best["pages_matched"], -best["distance"]) <= (runner_up["pages_matched"], -runner_up["distance"]):
+                return None, candidates
+        return candidates[0], candidates
+
+    def stats(self):
+        with self._lock:
+            return {"documents": len(self._documents), "pages": self._tree.size, "max_distance": self.max_distance}
+
+perceptual_index = PerceptualIndex(config.PHASH_MAX_DISTANCE)
+
+registry.register(CallbackMetric(
+    "docval_perceptual_index_pages", "Issued pages in the perceptual near-duplicate index", "gauge",
+    lambda: perceptual_index.stats()["pages"]
+))
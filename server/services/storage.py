@@ -0,0 +1,343 @@
+import os
+import time
+import random
+import hashlib
+import tempfile
+import threading
+import contextvars
+from abc import ABC, abstractmethod
+from concurrent.futures import ThreadPoolExecutor
+from werkzeug.utils import secure_filename
+from services.metrics import stage
+import config
+
+# Document storage behind one interface (upload, fetch, delete, url), so the
+# pipeline can run against Cloudinary or, for offline runs and benchmarks,
+# a content-addressed directory on local disk (STORAGE_BACKEND).
+
+class StorageError(Exception):
+    """A storage call failed; retryable errors are worth another attempt"""
+
+    def __init__(self, message, retryable=True):
+        super().__init__(message)
+        self.retryable = retryable
+
+class CircuitBreaker:
+    """
+    Fail fast while a backend keeps failing
+
+    After `failure_threshold` consecutive failures the circuit opens and
+    calls are refused for `reset_seconds`; then a single trial call is let
+    through (half-open) and its outcome closes or re-opens the circuit.
+    """
+
+    def __init__(self, name, failure_threshold, reset_seconds):
+        self.name = name
+        self.failure_threshold = max(1, failure_threshold)
+        self.reset_seconds = reset_seconds
+        self._failures = 0
+        self._opened_at = None
+        self._trial_running = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self):
+        with self._lock:
+            if self._opened_at is None:
+                return "closed"
+            return "half_open" if time.monotonic() - self._opened_at >= self.reset_seconds else "open"
+
+    def allow(self):
+        with self._lock:
+            if self._opened_at is None:
+                return True
+            if time.monotonic() - self._opened_at < self.reset_seconds or self._trial_running:
+                return False
+            self._trial_running = True
+            return True
+
+    def record_success(self):
+        with self._lock:
+            if self._opened_at is not None:
+                print(f"✅ {self.name} circuit closed")
+            self._failures = 0
+            self._opened_at = None
+            self._trial_running = False
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            if self._trial_running or (self._opened_at is None and self._failures >= self.failure_threshold):
+                print(f"⚠️ {self.name} circuit opened after {self._failures} failures")
+                self._opened_at = time.monotonic()
+            self._trial_running = False
+
+def call_with_retry(func, breaker, attempts=None, base_delay=None, max_delay=None):
+    """
+    Call func with exponential backoff (full jitter) behind a circuit breaker
+
+    Only StorageErrors marked retryable (and unexpected exceptions) are
+    retried; anything else is raised at once. A call whose attempts all fail
+    counts as one failure against the breaker.
+
+    Raises:
+        StorageError: When the circuit is open or every attempt failed
+    """
+    attempts = attempts or config.STORAGE_RETRY_ATTEMPTS
+    base_delay = config.STORAGE_RETRY_BASE_SECONDS if base_delay is None else base_delay
+    max_delay = config.STORAGE_RETRY_MAX_SECONDS if max_delay is None else max_delay
+
+    for attempt in range(1, attempts + 1):
+        if not breaker.allow():
+            if attempt > 1:
+                # Opened while this call was retrying, or this call was the
+                # half-open trial: its failure is counted now
+                breaker.record_failure()
+                raise error
+            raise StorageError(f"{breaker.name} unavailable (circuit open), try again later", retryable=False)
+        try:
+            result = func()
+        except StorageError as e:
+            if not e.retryable:
+                breaker.record_success()  # the backend answered; the request was at fault
+                raise
+            error = e
+        except Exception as e:
+            error = StorageError(str(e))
+        else:
+            breaker.record_success()
+            return result
+
+        if attempt == attempts:
+            breaker.record_failure()
+            raise error
+        delay = random.uniform(0, min(max_delay, base_delay * (2 ** (attempt - 1))))
+        print(f"🔁 {breaker.name} attempt {attempt}/{attempts} failed ({error}); retrying in {delay:.2f}s")
+        time.sleep(delay)
+
+class StorageBackend(ABC):
+    """
+    Interface of a document store
+
+    upload() returns the same dict shape for every backend:
+    {"success", "secure_url", "public_id", "bytes", "storage", ...} or
+    {"success": False, "error"}.
+    """
+
+    name = "base"
+
+    @abstractmethod
+    def upload(self, open_stream, folder="documents", filename="document"):
+        """
+        Store a document
+
+        Args:
+            open_stream: Callable returning a new binary stream of the document
+                         (called again for every retry)
+            folder (str): Folder / namespace of the document
+            filename (str): Original filename
+
+        Returns:
+            dict: Upload result
+        """
+
+    @abstractmethod
+    def fetch(self, public_id):
+        """Stored bytes of a document"""
+
+    @abstractmethod
+    def delete(self, public_id):
+        """
+        Returns:
+            dict: {"success": bool, "result" or "error"}
+        """
+
+    @abstractmethod
+    def url(self, public_id):
+        """Public URL of a stored document"""
+
+    def local_path(self, url):
+        """File behind a URL of this backend, if it is on local disk (else None)"""
+        return None
+
+class LocalStorage(StorageBackend):
+    """
+    Content-addressed document store in a local directory
+
+    Blobs live once under objects/<sha256[:2]>/<sha256>; every upload gets
+    its own public id under refs/<folder>/, hard-linked to the blob, so
+    identical documents share their bytes and deleting one upload keeps the
+    others. A blob is removed with its last reference.
+    """
+
+    name = "local"
+
+    def __init__(self, root, base_url):
+        self.root = os.path.abspath(root)
+        self.base_url = base_url.rstrip('/')
+        self._lock = threading.Lock()
+        os.makedirs(os.path.join(self.root, "objects"), exist_ok=True)
+        os.makedirs(os.path.join(self.root, "refs"), exist_ok=True)
+        os.makedirs(os.path.join(self.root, "tmp"), exist_ok=True)
+
+    def _blob_path(self, digest):
+        return os.path.join(self.root, "objects", digest[:2], digest)
+
+    def ref_path(self, public_id):
+        path = os.path.abspath(os.path.join(self.root, "refs", public_id))
+        if not path.startswith(os.path.join(self.root, "refs") + os.sep):
+            raise StorageError(f"Invalid public id: {public_id}", retryable=False)
+        return path
+
+    def upload(self, open_stream, folder="documents", filename="document"):
+        spool_path = None
+        try:
+            digest = hashlib.sha256()
+            size = 0
+            with tempfile.NamedTemporaryFile(dir=os.path.join(self.root, "tmp"), delete=False) as spool, \
+                    open_stream() as stream:
+                spool_path = spool.name
+                for chunk in iter(lambda: stream.read(config.STORAGE_CHUNK_SIZE), b''):
+                    digest.update(chunk)
+                    spool.write(chunk)
+                    size += len(chunk)
+            digest = digest.hexdigest()
+
+            ext = os.path.splitext(secure_filename(filename or ""))[1].lower()
+            public_id = f"{folder}/{digest}_{os.urandom(4).hex()}{ext}"
+            blob = self._blob_path(digest)
+            ref = self.ref_path(public_id)
+            with self._lock:
+                deduplicated = os.path.exists(blob)
+                if deduplicated:
+                    os.unlink(spool_path)
+                else:
+                    os.makedirs(os.path.dirname(blob), exist_ok=True)
+                    os.replace(spool_path, blob)
+                spool_path = None
+                os.makedirs(os.path.dirname(ref), exist_ok=True)
+                os.link(blob, ref)
+
+            return {
+                "success": True,
+                "secure_url": self.url(public_id),
+                "public_id": public_id,
+                "bytes": size,
+                "format": ext.lstrip('.') or None,
+                "storage": self.name,
+                "deduplicated": deduplicated
+            }
+        except Exception as e:
+            print(f"❌ Local storage upload error: {e}")
+            if spool_path and os.path.exists(spool_path):
+                os.unlink(spool_path)
+            return {"success": False, "error": str(e)}
+
+    def fetch(self, public_id):
+        with open(self.ref_path(public_id), 'rb') as file:
+            return file.read()
+
+    def delete(self, public_id):
+        try:
+            ref = self.ref_path(public_id)
+            digest = os.path.basename(public_id).split('_', 1)[0]
+            blob = self._blob_path(digest)
+            with self._lock:
+                os.unlink(ref)
+                if os.path.exists(blob) and os.stat(blob).st_nlink <= 1:
+                    os.unlink(blob)
+            return {"success": True, "result": "ok"}
+        except Exception as e:
+            print(f"❌ Local storage delete error: {e}")
+            return {"success": False, "error": str(e)}
+
+    def url(self, public_id):
+        return f"{self.base_url}/{public_id}"
+
+    def local_path(self, url):
+        if not url.startswith(self.base_url + '/'):
+            return None
+        path = self.ref_path(url[len(self.base_url) + 1:].split('?')[0])
+        return path if os.path.exists(path) else None
+
+_storage = None
+_storage_lock = threading.Lock()
+
+def get_storage():
+    """
+    Get (or lazily create) the configured storage backend
+
+    Returns:
+        StorageBackend: CloudinaryStorage or LocalStorage (config.STORAGE_BACKEND)
+    """
+    global _storage
+    with _storage_lock:
+        if _storage is None:
+            if config.STORAGE_BACKEND == "local":
+                _storage = LocalStorage(config.LOCAL_STORAGE_ROOT, config.LOCAL_STORAGE_BASE_URL)
+            elif config.STORAGE_BACKEND == "cloudinary":
+                # Local import: cloudinary_service builds on this module
+                from services.cloudinary_service import CloudinaryStorage
+                _storage = CloudinaryStorage()
+            else:
+                raise ValueError(f"Unknown STORAGE_BACKEND: {config.STORAGE_BACKEND}")
+            print(f"🗄️ Document storage: {_storage.name}")
+        return _storage
+
+_upload_pool = None
+_upload_pool_lock = threading.Lock()
+
+def get_upload_pool():
+    """
+    Get (or lazily create) the thread pool for background storage uploads
+
+    Returns:
+        ThreadPoolExecutor: Pool with config.STORAGE_UPLOAD_WORKERS threads
+    """
+    global _upload_pool
+    with _upload_pool_lock:
+        if _upload_pool is None:
+            _upload_pool = ThreadPoolExecutor(max_workers=max(1, config.STORAGE_UPLOAD_WORKERS),
+                                              thread_name_prefix="upload")
+            print(f"⚙️ Storage upload pool started with {config.STORAGE_UPLOAD_WORKERS} workers")
+        return _upload_pool
+
+class BackgroundUpload:
+    """
+    Storage upload of an ingested document running on the upload pool
+
+    Started as soon as the upload is spooled, so it overlaps hashing, OCR and
+    analysis of the same bytes. Join with result() before writing the record;
+    call discard() if the record will not be written. The context must stay
+    open until one of the two has returned.
+    """
+
+    def __init__(self, ctx, folder, pipeline):
+        self.pipeline = pipeline
+        # Run in a copy of the request context so the upload's stage timing
+        # lands in the request's breakdown
+        self._future = get_upload_pool().submit(contextvars.copy_context().run, self._upload, ctx, folder)
+
+    def _upload(self, ctx, folder):
+        with stage(self.pipeline, "storage_upload"):
+            return get_storage().upload(ctx.open_stream, folder=folder, filename=ctx.filename)
+
+    def result(self):
+        """
+        Wait for the upload
+
+        Returns:
+            dict: StorageBackend.upload() result
+        """
+        with stage(self.pipeline, "storage_upload_wait"):
+            return self._future.result()
+
+    def discard(self):
+        """Wait for the upload and remove the stored copy (no record was written)"""
+        try:
+            result = self._future.result()
+        except Exception:
+            return
+        if result.get("success"):
+            print(f"🗑️ Removing upload of unrecorded document: {result['public_id']}")
+            get_storage().delete(result["public_id"])
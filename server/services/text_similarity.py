@@ -0,0 +1,328 @@
+import re
+import zlib
+import difflib
+import threading
+import unicodedata
+from datetime import datetime
+import numpy as np
+from bson import Binary, ObjectId
+from models.ocr_text_model import load_ocr_text
+import config
+from services.metrics import registry, CallbackMetric
+from services.index_refresh import IndexRefresher
+
+# MinHash signatures over word shingles of the OCR text, bucketed by LSH bands,
+# find the issued document a verifier's scan claims to be without reading
+# every stored text. The candidate is then diffed to localize what changed.
+# Both sides sign full-page text: verifier uploads are OCR'd without a profile.
+
+_MERSENNE_PRIME = np.uint64((1 << 61) - 1)
+_MAX_HASH = np.uint64(0xFFFFFFFF)
+_NON_WORD = re.compile(r'[^0-9a-z]+')
+
+def normalize_words(text):
+    """Lowercased alphanumeric words of a text (punctuation and layout dropped)"""
+    text = unicodedata.normalize('NFKC', text or "").lower()
+    return _NON_WORD.sub(' ', text).split()
+
+def shingles(words, size=None):
+    """
+    Word n-grams of a text
+
+    Texts shorter than one shingle give a single shingle of all their words.
+
+    Returns:
+        set: Shingle strings
+    """
+    size = size or config.MINHASH_SHINGLE_WORDS
+    if len(words) < size:
+        return {' '.join(words)} if words else set()
+    return {' '.join(words[i:i + size]) for i in range(len(words) - size + 1)}
+
+class MinHasher:
+    """
+    MinHash with num_perm universal hash functions (a*x + b mod 2^61-1)
+
+    The permutations are seeded, so signatures stored in the database stay
+    comparable across processes and restarts.
+    """
+
+    def __init__(self, num_perm, seed=1):
+        self.num_perm = num_perm
+        rng = np.random.RandomState(seed)
+        self._a = rng.randint(1, _MERSENNE_PRIME, size=num_perm, dtype=np.uint64)
+        self._b = rng.randint(0, _MERSENNE_PRIME, size=num_perm, dtype=np.uint64)
+
+    def signature(self, text):
+        """
+        Args:
+            text (str): Text to sign
+
+        Returns:
+            numpy.ndarray: uint32 signature, or None if the text has no words
+        """
+        grams = shingles(normalize_words(text))
+        if not grams:
+            return None
+        # crc32 is stable across processes, unlike the salted builtin hash()
+        values = np.fromiter((zlib.crc32(gram.encode('utf-8')) for gram in grams), dtype=np.uint64, count=len(grams))
+        permuted = (values[:, None] * self._a + self._b) % _MERSENNE_PRIME & _MAX_HASH
+        return permuted.min(axis=0).astype(np.uint32)
+
+def encode_signature(signature):
+    """Signature as stored on the document record (text_minhash)"""
+    return Binary(signature.astype('<u4').tobytes()) if signature is not None else None
+
+def decode_signature(data):
+    return np.frombuffer(bytes(data), dtype='<u4').astype(np.uint32)
+
+class TextIndex:
+    """
+    Locality-sensitive hashing index over the MinHash signatures of issued texts
+
+    Signatures are cut into MINHASH_BANDS bands; documents sharing any band
+    become candidates and are ranked by estimated Jaccard similarity
+    (fraction of equal signature slots). With b bands of r rows, texts of
+    similarity s collide with probability 1 - (1 - s^r)^b. Documents issued
+    by other processes are picked up by refresh().
+    """
+
+    def __init__(self, num_perm, bands, min_similarity):
+        if num_perm % bands:
+            raise ValueError("MINHASH_PERMUTATIONS must be a multiple of MINHASH_BANDS")
+        self.hasher = MinHasher(num_perm)
+        self.bands = bands
+        self.rows = num_perm // bands
+        self.min_similarity = min_similarity
+        self._signatures = {}
+        self._buckets = [{} for _ in range(bands)]
+        self._lock = threading.Lock()
+        self._refresher = IndexRefresher("Text index", config.INDEX_REFRESH_SECONDS)
+
+    def signature(self, text):
+        return self.hasher.signature(text or "")
+
+    def _band_keys(self, signature):
+        return [signature[i * self.rows:(i + 1) * self.rows].tobytes() for i in range(self.bands)]
+
+    def _insert(self, signatures, buckets, document_id, signature):
+        signatures[document_id] = signature
+        for band, key in zip(buckets, self._band_keys(signature)):
+            band.setdefault(key, set()).add(document_id)
+
+    def add(self, document_id, encoded):
+        """Index the text_minhash of an issued document"""
+        if encoded is None:
+            return
+        signature = decode_signature(encoded)
+        if len(signature) != self.hasher.num_perm:
+            return
+        with self._lock:
+            self._insert(self._signatures, self._buckets, str(document_id), signature)
+
+    def rebuild(self, mongo):
+        """
+        Reload the index from the issued documents in Mongo
+
+        Signatures computed with a different MINHASH_PERMUTATIONS are
+        skipped (recompute them with flask db backfill-minhash --all).
+
+        Returns:
+            int: Number of documents indexed
+        """
+        started_at = datetime.utcnow()
+        signatures = {}
+        buckets = [{} for _ in range(self.bands)]
+        skipped = 0
+        cursor = mongo.db.documents.find(
+            {"metaData.upload_method": "issuer_upload", "text_minhash": {"$type": "binData"}},
+            {"text_minhash": 1}
+        )
+        for doc in cursor:
+            signature = decode_signature(doc["text_minhash"])
+            if len(signature) != self.hasher.num_perm:
+                skipped += 1
+                continue
+            self._insert(signatures, buckets, str(doc["_id"]), signature)
+        with self._lock:
+            self._signatures, self._buckets = signatures, buckets
+        self._refresher.mark_built(started_at)
+        print(f"🔎 Text index built: {len(signatures)} documents"
+              + (f" ({skipped} with stale signatures skipped)" if skipped else ""))
+        return len(signatures)
+
+    def refresh(self, mongo):
+        """Index documents issued by other processes since the last pass (rate limited)"""
+        def read(since):
+            cursor = mongo.db.documents.find(
+                {"_id": {"$gte": since}, "metaData.upload_method": "issuer_upload",
+                 "text_minhash": {"$type": "binData"}},
+                {"text_minhash": 1}
+            )
+            for doc in cursor:
+                self.add(doc["_id"], doc["text_minhash"])
+        self._refresher.refresh(read)
+
+    def lookup(self, signature, limit=3):
+        """
+        Issued documents whose text resembles the given signature
+
+        Args:
+            signature: MinHasher.signature() of the text being verified
+            limit (int): Max candidates returned
+
+        Returns:
+            list: {"document_id", "similarity"} best first, similarity >= min_similarity
+        """
+        if signature is None:
+            return []
+        with self._lock:
+            candidates = set()
+            for band, key in zip(self._buckets, self._band_keys(signature)):
+                candidates.update(band.get(key, ()))
+            scored = [
+                (float(np.mean(self._signatures[document_id] == signature)), document_id)
+                for document_id in candidates
+            ]
+        scored = [(similarity, document_id) for similarity, document_id in scored if similarity >= self.min_similarity]
+        scored.sort(reverse=True)
+        return [{"document_id": document_id, "similarity": round(similarity, 3)} for similarity, document_id in scored[:limit]]
+
+    def stats(self):
+        with self._lock:
+            return {"documents": len(self._signatures), "bands": self.bands, "rows": self.rows}
+
+def sign_text(text):
+    """
+    text_minhash for a document record
+
+    Args:
+        text (str): Full-page text of the document (not profile field values)
+
+    Returns:
+        Binary: Encoded signature, or None if disabled or the text has no words
+    """
+    if not config.MINHASH_ENABLED:
+        return None
+    try:
+        return encode_signature(text_index.signature(text))
+    except Exception as e:
+        print(f"⚠️ Text signature failed: {e}")
+        return None
+
+def _best_window(value_words, words):
+    """Span of words most similar to value_words (same length), with its ratio"""
+    size = len(value_words)
+    target = ' '.join(value_words)
+    best, best_ratio = "", 0.0
+    matcher = difflib.SequenceMatcher(autojunk=False)
+    matcher.set_seq2(target)
+    for start in range(max(1, len(words) - size + 1)):
+        window = ' '.join(words[start:start + size])
+        matcher.set_seq1(window)
+        if matcher.quick_ratio() <= best_ratio:
+            continue
+        ratio = matcher.ratio()
+        if ratio > best_ratio:
+            best, best_ratio = window, ratio
+    return best, best_ratio
+
+def diff_fields(fields, text, min_similarity=None):
+    """
+    Issued field values that do not appear in the presented text
+
+    A value whose closest span reads at least min_similarity alike is taken
+    as found with OCR noise (e.g. one misread character), not as altered.
+
+    Args:
+        fields (dict): Structured fields of the issued record (OCR profile)
+        text (str): OCR text of the presented document
+        min_similarity (float): Default config.TEXT_FIELD_MIN_SIMILARITY
+
+    Returns:
+        list: {"field", "issued", "presented" (closest text found), "similarity"}
+    """
+    if min_similarity is None:
+        min_similarity = config.TEXT_FIELD_MIN_SIMILARITY
+    words = normalize_words(text)
+    joined = f" {' '.join(words)} "
+    altered = []
+    for name, value in (fields or {}).items():
+        value_words = normalize_words(str(value or ""))
+        if not value_words or f" {' '.join(value_words)} " in joined:
+            continue
+        presented, ratio = _best_window(value_words, words)
+        if ratio >= min_similarity:
+            continue
+        altered.append({
+            "field": name,
+            "issued": ' '.join(value_words),
+            "presented": presented,
+            "similarity": round(ratio, 3)
+        })
+    return altered
+
+def diff_lines(issued_text, text, max_changes=20):
+    """
+    Line-level differences between the issued and presented texts
+
+    Each change carries the similarity of its two sides, so reviewers can
+    tell OCR noise (close to 1) from rewritten lines.
+
+    Returns:
+        list: {"op": "replace" | "delete" | "insert", "issued": [...], "presented": [...], "similarity"}
+    """
+    def lines(value):
+        return [' '.join(words) for words in map(normalize_words, (value or "").splitlines()) if words]
+
+    issued_lines, presented_lines = lines(issued_text), lines(text)
+    changes = []
+    matcher = difflib.SequenceMatcher(None, issued_lines, presented_lines, autojunk=False)
+    for op, i1, i2, j1, j2 in matcher.get_opcodes():
+        if op == "equal":
+            continue
+        issued, presented = issued_lines[i1:i2], presented_lines[j1:j2]
+        similarity = difflib.SequenceMatcher(None, '\n'.join(issued), '\n'.join(presented), autojunk=False).ratio()
+        changes.append({"op": op, "issued": issued, "presented": presented, "similarity": round(similarity, 3)})
+        if len(changes) >= max_changes:
+            break
+    return changes
+
+def compare_with_issued(mongo, document_id, text):
+    """
+    Localize the differences between a presented text and an issued record
+
+    Records issued with an OCR profile are compared field by field; other
+    records line by line. Changed lines whose issued side was replaced or
+    removed by something less than TEXT_LINE_MIN_SIMILARITY alike are the
+    altered_lines; extra lines on the scan are usually OCR noise.
+
+    Returns:
+        dict: {"document_id", "altered_fields", "changed_lines", "altered_lines"},
+              or None if the record is gone
+    """
+    doc = mongo.db.documents.find_one({"_id": ObjectId(document_id)}, {"ocr_data": 1})
+    if not doc:
+        return None
+    ocr_data = doc.get("ocr_data") or {}
+    fields = ocr_data.get("fields")
+    if fields:
+        return {"document_id": str(document_id), "altered_fields": diff_fields(fields, text),
+                "changed_lines": [], "altered_lines": []}
+    changed_lines = diff_lines(load_ocr_text(mongo, ocr_data), text)
+    return {
+        "document_id": str(document_id),
+        "altered_fields": [],
+        "changed_lines": changed_lines,
+        "altered_lines": [
+            change for change in changed_lines
+            if change["op"] != "insert" and change["similarity"] < config.TEXT_LINE_MIN_SIMILARITY
+        ]
+    }
+
+text_index = TextIndex(config.MINHASH_PERMUTATIONS, config.MINHASH_BANDS, config.MINHASH_MIN_SIMILARITY)
+
+registry.register(CallbackMetric(
+    "docval_text_index_documents", "Issued documents in the MinHash/LSH text index", "gauge",
+    lambda: text_index.stats()["documents"]
+))
@@ -0,0 +1,321 @@
+from datetime import datetime
+from bson import ObjectId
+from models.document_model import create_document
+from services.ocr import ocr_document, ocr_result_from_record
+from services.hmac_hash import find_issued_by_digests
+from services.storage import BackgroundUpload
+from services.doc_proccess import process_document
+from services.metrics import stage
+from services.perceptual_hash import fingerprint_document, perceptual_index
+from services.text_similarity import text_index, compare_with_issued
+from database import mongo
+import config
+
+class VerificationError(Exception):
+    """A verification that could not complete (e.g. storage upload failed)"""
+
+    def __init__(self, message, details=None):
+        super().__init__(message)
+        self.message = message
+        self.details = details
+
+def _match_issued_text(ocr_text, perceptual_match):
+    """
+    Find the issued document a scan claims to be and diff its text
+
+    The target is the most similar issued text. Same-template documents
+    look alike, so the visual match only breaks a tie between equally
+    similar texts; it never picks a document the text does not point at.
+
+    Args:
+        ocr_text (str): OCR text of the presented document
+        perceptual_match (dict): Visual match, if any (tiebreaker)
+
+    Returns:
+        dict: compare_with_issued() result plus "similarity" and "candidates", or None
+    """
+    text_index.refresh(mongo)
+    candidates = text_index.lookup(text_index.signature(ocr_text))
+    if not candidates:
+        return None
+    target = candidates[0]
+    if perceptual_match:
+        target = next((candidate for candidate in candidates
+                       if candidate["document_id"] == perceptual_match["document_id"]
+                       and candidate["similarity"] == target["similarity"]), target)
+    match = compare_with_issued(mongo, target["document_id"], ocr_text)
+    if match:
+        match["similarity"] = target["similarity"]
+        match["candidates"] = candidates
+    return match
+
+def run_verification(ctx, verifier_id, verifier, document_type="unknown", short_circuit=None,
+                     pipeline="verifier_upload"):
+    """
+    Verifier pipeline: hash lookup, storage upload, OCR, analysis and record
+    
+    Shared by the synchronous upload route and the background job workers.
+    
+    Args:
+        ctx (DocumentContext): Ingested upload, hashed with every institute key
+        verifier_id (str): Verifier performing the check
+        verifier (dict): Verifier record (name, institution)
+        document_type (str): Document type given with the upload
+        short_circuit (bool): Reuse the issued record on a hash hit
+                              (default: config.VERIFIER_SHORT_CIRCUIT)
+        pipeline (str): Label for the stage timing metrics
+    
+    Returns:
+        dict: Verification response (document_id, verdict, analysis, timings)
+    
+    Raises:
+        VerificationError: If the document could not be stored
+    """
+    # Step 2: Hash verification - resolve all candidate digests with one query
+    existing_doc = None
+    matched_institute = None
+    verification_status = "new_document"
+    try:
+        with stage(pipeline, "hash_lookup"):
+            existing_doc, matched_key, digests = find_issued_by_digests(mongo, ctx)
+        if existing_doc:
+            document_hash = existing_doc["hash"]
+            matched_institute = matched_key["name"] if matched_key else None
+            verification_status = "hash_verified"
+            print(f"✅ Document hash found in database - issued by: {existing_doc.get('issuer_id')} "
+                  f"(key: {matched_institute})")
+        else:
+            document_hash = digests.get(config.DEFAULT_INSTITUTE_SECRET)
+            verification_status = "hash_not_found" 
+            print(f"❌ Document hash not found for any of {len(digests)} institute keys - potentially fraudulent")
+    except Exception as e:
+        print(f"⚠️ Hash verification failed: {e}")
+        document_hash = None
+    
+    # A hash hit is byte-identical to the issued document, so in short-circuit
+    # mode its OCR data is reused and the expensive stages skipped
+    if short_circuit is None:
+        short_circuit = config.VERIFIER_SHORT_CIRCUIT
+    short_circuit = short_circuit and verification_status == "hash_verified"
+    
+    # The verifier record always gets its own stored copy, so deleting it can
+    # never touch the issued document's file. Uploaded in the background
+    # while OCR and analysis run.
+    print(f"📸 Uploading document to storage in the background...")
+    upload = BackgroundUpload(ctx, f"verifiers/{verifier_id}", pipeline)
+    
+    try:
+        # Step 3: Extract OCR text for analysis (from the uploaded bytes, no re-download)
+        if short_circuit:
+            print(f"⚡ Hash verified - reusing OCR data of issued document {existing_doc['_id']}")
+            ocr_result = ocr_result_from_record(existing_doc.get("ocr_data"))
+        else:
+            print(f"🔤 Extracting OCR text from uploaded document...")
+            with stage(pipeline, "ocr"):
+                ocr_result = ocr_document(ctx)
+        ocr_text = ocr_result["text"]
+    
+        # Rescans and re-encoded copies never hash-match: a visually nearest
+        # issued document that stands out from the rest can break ties in the
+        # text lookup. A visual match alone proves nothing (edits too small to
+        # move the page fingerprint), so the full analysis still runs
+        perceptual_match = None
+        layout_matches = 0
+        if verification_status == "hash_not_found" and config.PHASH_ENABLED:
+            with stage(pipeline, "perceptual_lookup"):
+                perceptual_index.refresh(mongo)
+                perceptual_match, candidates = perceptual_index.best_match(fingerprint_document(ctx))
+            layout_matches = len(candidates)
+            if perceptual_match:
+                print(f"🧬 Near-duplicate of issued document {perceptual_match['document_id']} "
+                      f"(distance {perceptual_match['distance']})")
+            elif candidates:
+                print(f"🧬 Page layout matches {len(candidates)} issued documents equally well (template only)")
+    
+        # Which issued text the scan claims to be, and which fields differ from it
+        # (nothing to compare when OCR failed)
+        text_match = None
+        if verification_status == "hash_not_found" and config.MINHASH_ENABLED and not ocr_result.get("error"):
+            try:
+                with stage(pipeline, "text_lookup"):
+                    text_match = _match_issued_text(ocr_text, perceptual_match)
+            except Exception as e:
+                print(f"⚠️ Text similarity lookup failed: {e}")
+            if text_match:
+                print(f"🔎 Closest issued text: {text_match['document_id']} "
+                      f"({len(text_match['altered_fields'])} altered fields, {len(text_match['altered_lines'])} altered "
+                      f"of {len(text_match['changed_lines'])} changed lines)")
+    
+        # Step 4: Determine verification result based on hash check
+        if verification_status == "hash_verified":
+            # Document exists in DB - GUARANTEED AUTHENTIC
+            suspicion_score = 0.0  # Zero suspicion for hash-verified docs
+            status = "verified"
+            verdict = "authentic"
+            analysis_explanation = f"✅ AUTHENTIC: Document hash verified in database. Originally issued by issuer ID: {existing_doc.get('issuer_id')}"
+        
+        elif verification_status == "hash_not_found":
+            # Hash not found - run detailed analysis
+            print(f"🔍 Hash not found - running detailed analysis: {ctx.filename}")
+            with stage(pipeline, "analysis"):
+                doc_analysis = process_document(ctx, ocr_text)
+            suspicion_score = min(0.8, doc_analysis.get('suspicion_score', 0.5) + 0.3)  # Increase suspicion for unknown hash
+            verdict = "hash_not_verified"
+            analysis_explanation = f"Document hash not found in database. Visual analysis: {doc_analysis.get('explanation', 'Document analyzed')}"
+            if perceptual_match:
+                analysis_explanation += (f" Pages visually resemble issued document {perceptual_match['document_id']} "
+                                         f"(mean distance {perceptual_match['distance']}/64 bits)")
+            elif layout_matches:
+                analysis_explanation += " Page layout matches a known issued template."
+        
+            # Status based on combined analysis
+            if suspicion_score < 0.4:
+                status = "pending_review"  # Even if analysis looks good, hash missing is concerning
+            else:
+                status = "suspicious"
+            
+        else:
+            # Hash generation failed - run analysis only
+            print(f"🔍 Hash generation failed - running visual analysis only: {ctx.filename}")
+            with stage(pipeline, "analysis"):
+                doc_analysis = process_document(ctx, ocr_text)
+            suspicion_score = doc_analysis.get('suspicion_score', 0.5)
+            verdict = doc_analysis.get('verdict', 'requires_review')
+            analysis_explanation = f"Hash verification unavailable. Visual analysis: {doc_analysis.get('explanation', 'Document analyzed')}"
+        
+            # Standard status determination
+            if verdict == "likely_authentic":
+                status = "pending_review"  # Downgrade since no hash verification
+            elif verdict == "requires_review":
+                status = "pending_review"
+            else:
+                status = "suspicious"
+    
+        # Issued field values missing from the scan localize the tampering, as
+        # long as the scan's text really is that document's
+        text_confirmed = bool(text_match and text_match.get("similarity") is not None
+                              and text_match["similarity"] >= config.MINHASH_MIN_SIMILARITY)
+        if text_confirmed and text_match["altered_fields"]:
+            suspicion_score = max(suspicion_score, 0.8)
+            status = "suspicious"
+            verdict = "altered_copy"
+            analysis_explanation += (f" Fields differing from issued document {text_match['document_id']}: "
+                                     f"{', '.join(field['field'] for field in text_match['altered_fields'])}")
+        elif text_confirmed and text_match["altered_lines"]:
+            # Rewritten lines are weaker evidence than a named field, but still tampering
+            suspicion_score = max(suspicion_score, 0.6)
+            status = "suspicious"
+            verdict = "altered_copy"
+            analysis_explanation += (f" {len(text_match['altered_lines'])} text lines were rewritten or removed "
+                                     f"compared with issued document {text_match['document_id']}")
+        elif text_confirmed and text_match["changed_lines"]:
+            analysis_explanation += (f" {len(text_match['changed_lines'])} text lines differ slightly (OCR noise) "
+                                     f"from issued document {text_match['document_id']}")
+    
+        if ocr_result.get("error"):
+            analysis_explanation += " OCR failed, so the text could not be checked."
+    
+        # OCR data for the record; create_document moves the full text to side storage
+        if short_circuit and ocr_result.get("text_ref"):
+            # Point at the issued document's stored text instead of copying it
+            ocr_data = {
+                "preview": ocr_text,
+                "text_length": ocr_result.get("text_length") or len(ocr_text),
+                "text_ref": ocr_result["text_ref"],
+                "extraction_method": ocr_result["extraction_method"],
+                "reused_from": existing_doc["_id"]
+            }
+        else:
+            ocr_data = {
+                "extracted_text": ocr_text,
+                "text_length": len(ocr_text),
+                "extraction_method": ocr_result["extraction_method"],
+                "error": ocr_result.get("error"),  # OCR failed: no text stored
+                "reused_from": existing_doc["_id"] if short_circuit else None
+            }
+    
+        # Join the upload; without a stored copy the document is not recorded
+        cloudinary_result = upload.result()
+        if not cloudinary_result["success"]:
+            raise VerificationError("Failed to upload document to cloud storage", cloudinary_result["error"])
+        
+        document_url = cloudinary_result["secure_url"]
+        public_id = cloudinary_result["public_id"]
+        
+        print(f"✅ Document uploaded to {cloudinary_result['storage']}: {document_url}")
+        
+        # Prepare document data as per verifier model requirements
+        document_data = {
+            "source": document_url,  # Cloudinary URL
+            "status": status,
+            "issuer_id": None,  # Unknown issuer for verifier uploads
+            "verified_by": [ObjectId(verifier_id)],  # Verified by this verifier
+            "issue_time": datetime.utcnow(),
+            "ocr_data": ocr_data,
+            "ai_score": suspicion_score,  # Suspicion score from analysis
+            "metaData": {
+                "original_filename": ctx.filename,
+                "file_size": cloudinary_result.get("bytes", 0),
+                "upload_method": "verifier_upload",
+                "verifier_name": verifier.get("name", ""),
+                "verifier_institution": verifier.get("institution", ""),
+                "document_type": document_type,
+                "verification_notes": f"Document uploaded for verification with suspicion score: {suspicion_score}",
+                "matched_institute": matched_institute,
+                "perceptual_match": perceptual_match,
+                "text_match": text_match,
+                "cloudinary_public_id": public_id,  # storage public id (any backend)
+                "storage_type": cloudinary_result["storage"],
+                # Read-only pointer to the issued file whose OCR data was reused
+                "reused_source": existing_doc.get("source") if short_circuit else None
+            },
+            "hash": document_hash  # HMAC hash for document integrity
+        }
+    
+        # Create document in database
+        with stage(pipeline, "db_write"):
+            doc_id = create_document(mongo, document_data)
+        upload = None  # recorded: the stored copy belongs to the document now
+    
+        # Comprehensive response with verification details
+        response_data = {
+            "success": True,
+            "document_id": str(doc_id),
+            "filename": ctx.filename,
+            "document_url": document_url,  # Cloudinary URL
+            "cloudinary_public_id": public_id,
+            "hash": document_hash,
+            "verification_status": verification_status,
+            "suspicion_score": suspicion_score,
+            "status": status,
+            "verdict": verdict,
+            "analysis": {
+                "explanation": analysis_explanation,
+                "hash_verified": verification_status == "hash_verified",
+                "existing_issuer": str(existing_doc.get('issuer_id')) if existing_doc else None,
+                "matched_institute": matched_institute,
+                "perceptual_match": perceptual_match,
+                "text_match": text_match,
+                "ocr_text_preview": ocr_text[:200] + "..." if len(ocr_text) > 200 else ocr_text
+            },
+            "verdict": verdict,
+            "analysis_explanation": analysis_explanation,
+            "upload_timestamp": datetime.utcnow().isoformat(),
+            "ocr_text_preview": ocr_text[:100] + "..." if len(ocr_text) > 100 else ocr_text,
+            "ocr_timings": {
+                "mode": ocr_result["mode"],
+                "workers": ocr_result["workers"],
+                "total_seconds": ocr_result["total_seconds"],
+                "cache": ocr_result["cache"],
+                "pages": ocr_result["pages"]
+            },
+            "verification_notes": f"Analysis completed: {analysis_explanation}"
+        }
+    
+        print(f"✅ Document uploaded and analyzed by verifier: {doc_id} (Score: {suspicion_score})")
+        return response_data
+    
+    finally:
+        # An upload still pending here was not recorded (error during analysis)
+        if upload is not None:
+            upload.discard()
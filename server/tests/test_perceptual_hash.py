@@ -0,0 +1,58 @@
+import cv2
+import numpy as np
+import config
+from services.perceptual_hash import PerceptualIndex, phash, dhash
+
+# Certificates of one template differ only in their fields; whole-page hashes
+# must not attribute a scan of one student's certificate to another's.
+
+def certificate(name, grade, number):
+    page = np.full((1100, 850), 255, np.uint8)
+    cv2.rectangle(page, (40, 40), (810, 1060), 0, 6)
+    cv2.putText(page, "CERTIFICATE OF COMPLETION", (110, 200), cv2.FONT_HERSHEY_SIMPLEX, 1.3, 0, 3)
+    cv2.putText(page, "This certifies that", (290, 360), cv2.FONT_HERSHEY_SIMPLEX, 0.9, 0, 2)
+    cv2.putText(page, name, (230, 460), cv2.FONT_HERSHEY_SIMPLEX, 1.4, 0, 3)
+    cv2.putText(page, f"Grade: {grade}", (330, 600), cv2.FONT_HERSHEY_SIMPLEX, 1.0, 0, 2)
+    cv2.putText(page, f"No. {number}", (330, 900), cv2.FONT_HERSHEY_SIMPLEX, 0.8, 0, 2)
+    return page
+
+def rescan(page, seed=1):
+    """Blur, sensor noise and a smaller resolution, as from a scanner"""
+    noise = np.random.RandomState(seed).randint(-12, 13, page.shape)
+    noisy = np.clip(cv2.GaussianBlur(page, (3, 3), 0).astype(np.int16) + noise, 0, 255).astype(np.uint8)
+    return cv2.resize(noisy, (680, 880), interpolation=cv2.INTER_AREA)
+
+def fingerprints(gray):
+    return [{"page": 0, "phash": f"{phash(gray):016x}", "dhash": f"{dhash(gray):016x}"}]
+
+STUDENT_A = certificate("ANANYA SHARMA", "A+", "2024-00117")
+STUDENT_B = certificate("ROHIT VERMA", "B", "2024-00342")
+
+def test_rescan_is_attributed_to_its_own_certificate():
+    index = PerceptualIndex(config.PHASH_MAX_DISTANCE)
+    index.add("a", fingerprints(STUDENT_A))
+    index.add("b", fingerprints(STUDENT_B))
+
+    match, _ = index.best_match(fingerprints(rescan(STUDENT_A)))
+
+    assert match is not None and match["document_id"] == "a"
+
+def test_other_student_of_the_template_is_not_attributed():
+    index = PerceptualIndex(config.PHASH_MAX_DISTANCE)
+    index.add("a", fingerprints(STUDENT_A))
+
+    match, _ = index.best_match(fingerprints(rescan(STUDENT_B)))
+
+    assert match is None
+
+def test_equally_close_certificates_name_no_document():
+    # Two issued certificates whose page hashes coincide (measured in practice
+    # for one template): the scan can only be placed at the template level
+    index = PerceptualIndex(config.PHASH_MAX_DISTANCE)
+    index.add("a", fingerprints(STUDENT_A))
+    index.add("a_twin", fingerprints(STUDENT_A))
+
+    match, candidates = index.best_match(fingerprints(rescan(STUDENT_A)))
+
+    assert match is None
+    assert {candidate["document_id"] for candidate in candidates} == {"a", "a_twin"}